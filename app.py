@@ -1,58 +1,191 @@
-import base64
+import asyncio
 import datetime
-import io
+import hashlib
 import os
 import re
 import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
-import numpy as np
+import click
 import requests
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from flask import Flask, request, redirect, url_for, render_template, send_file, abort
+from flask import Flask, request, redirect, url_for, render_template, send_file, abort, make_response, jsonify, g
 
+# Before the modules below, which read their settings from the environment when imported
 load_dotenv()
 
+from charts import CHART_FONT_CACHE, CHART_FORMAT, EXTENSIONS, MIMETYPES, prewarm_font_cache, render_histogram
+from cache import BytesCodec, PageCodec, PriceCache, create_backend
+from history import PriceHistory
+from http_client import async_http_get, http_get, recent_request_count, shared_async_client, status_counts
+from jobs import JobQueue, report_progress
+from lazy import lazy_import
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry
+from parsers import iter_amazon_products, iter_mercadolibre_products
+from products import ProductSampler, ProductTable, pick_products
+from rates import ExchangeRates, FixedRateProvider, JSONRateProvider, Rate
+from serialization import SERIALIZERS, compress, dumps_json, negotiate_mimetype
+from singleflight import SingleFlight
+from stats import SketchStats, StreamingStats, compute_stats
+from warming import CacheWarmer, QueryStats
+
+np = lazy_import("numpy")
+
 os.environ['MPLCONFIGDIR'] = '/tmp/matplotlib'
 
 app = Flask(__name__)
-API_URL = "https://fastapiproject-1-eziw.onrender.com/blue"
-prices_cache = {}
+# Send marketplace and exchange-rate requests to a stand-in server instead, such as
+# benchmarks/stub_server.py for load tests: https://listado.mercadolibre.com.ar/... becomes
+# MARKETPLACE_BASE_URL/listado.mercadolibre.com.ar/... and the exchange rate comes from MARKETPLACE_BASE_URL/blue
+MARKETPLACE_BASE_URL = os.getenv("MARKETPLACE_BASE_URL", "").rstrip("/")
+
+
+def site_url(host):
+    """Base URL of `host`, or of its stand-in under MARKETPLACE_BASE_URL."""
+    return f"{MARKETPLACE_BASE_URL}/{host}" if MARKETPLACE_BASE_URL else f"https://{host}"
+
+
+API_URL = f"{MARKETPLACE_BASE_URL}/blue" if MARKETPLACE_BASE_URL else "https://fastapiproject-1-eziw.onrender.com/blue"
+# Maximum number of result pages fetched in parallel (1 fetches them one after another)
+MAX_FETCH_WORKERS = int(os.getenv("MAX_FETCH_WORKERS", "3"))
+
+# Seconds browsers and CDNs may cache a rendered chart; chart URLs change whenever the chart does
+CHART_MAX_AGE = int(os.getenv("CHART_MAX_AGE", "86400"))
+
+# Prices further than this many standard deviations from the mean are shown as outliers
+OUTLIER_THRESHOLD = 3
+
+# Searches of up to MAX_PAGES pages keep every product. With LARGE_SCAN_MAX_PAGES above it, searches of up to
+# that many pages are allowed as large scans: each page is folded into streaming aggregates as it arrives and
+# only a sample of LARGE_SCAN_SAMPLE_SIZE products is kept, so memory does not grow with the page count
+MAX_PAGES = 3
+LARGE_SCAN_MAX_PAGES = int(os.getenv("LARGE_SCAN_MAX_PAGES", "0"))
+LARGE_SCAN_SAMPLE_SIZE = int(os.getenv("LARGE_SCAN_SAMPLE_SIZE", "500"))
+
+# Bytes of a result page handed to the parser at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Searches of a batch run concurrently, shared by every batch on the worker; each search fetches its
+# pages with up to MAX_FETCH_WORKERS threads and the HTTP client caps concurrent requests per host
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "4"))
+BATCH_MAX_SEARCHES = int(os.getenv("BATCH_MAX_SEARCHES", "500"))
+
+# With JOB_MODE=1 the search form runs searches as background jobs and shows their progress
+JOB_MODE = os.getenv("JOB_MODE", "0") == "1"
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "2"))
+JOB_TTL = int(os.getenv("JOB_TTL", "600"))  # Seconds a finished job's status stays available
+
+# Every WARM_INTERVAL seconds (0 disables warming) the WARM_TOP_N most popular searches are refreshed
+# and their charts rendered ahead of time, as long as the warming worker has made fewer than
+# WARM_REQUEST_BUDGET upstream requests in the last minute, live traffic included. Only the worker
+# holding WARM_LOCK_FILE warms (empty to let every worker warm on its own)
+WARM_INTERVAL = int(os.getenv("WARM_INTERVAL", "0"))
+WARM_TOP_N = int(os.getenv("WARM_TOP_N", "10"))
+WARM_REQUEST_BUDGET = int(os.getenv("WARM_REQUEST_BUDGET", "60"))
+WARM_LOCK_FILE = os.getenv("WARM_LOCK_FILE", "/tmp/mercadix-warm.lock")
+
+# Exchange rates are refreshed in the background once older than EXCHANGE_RATE_TTL seconds, and the last
+# ones fetched are kept in EXCHANGE_RATE_FILE (empty to keep them in memory only) for the next start
+EXCHANGE_RATE_TTL = int(os.getenv("EXCHANGE_RATE_TTL", "900"))
+EXCHANGE_RATE_FILE = os.getenv("EXCHANGE_RATE_FILE", "/tmp/mercadix-rates.json")
+
+# SQLite file where every fresh scrape's statistics and prices are appended for /api/history (empty disables it)
+PRICE_HISTORY_PATH = os.getenv("PRICE_HISTORY_PATH", "")
+
+# With METRICS_ENABLED=1 request stages are timed for /metrics and the Server-Timing header
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+
+# "sync" (default) or "async"; async views download pages with httpx (pip install httpx)
+SERVING_MODE = os.getenv("SERVING_MODE", "sync")
 
 # Domain configurations
 COUNTRY_CONFIG = {
     'ar': {
         'domain': 'mercadolibre.com.ar',
+        'search_url': site_url('listado.mercadolibre.com.ar'),
         'currency': 'ARS',
         'country_name': 'Argentina',
         'exchange_rate_api': API_URL,
-        'needs_exchange_rate': True
+        'exchange_rate_field': 'venta',
+        'fixed_usd_rate': 1000,  # Only used until the first rate has been fetched
+        'cache_ttl': 900  # Seconds before cached prices are refreshed; ARS prices move fast
     },
     'br': {
         'domain': 'mercadolivre.com.br',
+        'search_url': site_url('listado.mercadolivre.com.br'),
         'currency': 'BRL',
         'country_name': 'Brasil',
-        'exchange_rate_api': None,
-        'needs_exchange_rate': False,
-        'fixed_usd_rate': 5.0  # Fixed approximate exchange rate for Brazil (1 USD = ~5 BRL)
+        # Live rate API, e.g. https://economia.awesomeapi.com.br/json/last/USD-BRL; the fixed rate is used without one
+        'exchange_rate_api': os.getenv("BRL_EXCHANGE_RATE_API") or None,
+        'exchange_rate_field': os.getenv("BRL_EXCHANGE_RATE_FIELD", "USDBRL.bid"),
+        'fixed_usd_rate': 5.0,  # Fixed approximate exchange rate for Brazil (1 USD = ~5 BRL)
+        'cache_ttl': 1800
     },
     'us': {  # Amazon US
         'domain': 'amazon.com',
+        'search_url': site_url('www.amazon.com'),
         'currency': 'USD',
         'country_name': 'United States',
         'exchange_rate_api': None,
-        'needs_exchange_rate': False,
-        'fixed_usd_rate': 1.0  # USD is the base currency
+        'fixed_usd_rate': 1.0,  # USD is the base currency
+        'cache_ttl': 3600
     }
 }
 
-# Default exchange rates (will be updated by API calls)
-exchange_rates = {
-    'ar': None,
-    'br': None
-}
+# Optional cache tier shared by every worker on the host (CACHE_BACKEND=sqlite or redis)
+cache_backend = create_backend()
+
+# Scraped results, bounded by entry count and approximate size, expiring per country
+prices_cache = PriceCache(
+    max_entries=int(os.getenv("PRICE_CACHE_MAX_ENTRIES", "256")),
+    max_bytes=int(os.getenv("PRICE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttls={code: config['cache_ttl'] for code, config in COUNTRY_CONFIG.items()},
+    stale_ttl=int(os.getenv("PRICE_CACHE_STALE_TTL", "600")),
+    backend=cache_backend,
+)
+
+# Parsed result pages keyed by (domain, item, condition, offset), shared by searches of any page count
+page_cache = PriceCache(
+    max_entries=int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "768")),
+    max_bytes=int(os.getenv("PAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttls={code: config['cache_ttl'] for code, config in COUNTRY_CONFIG.items()},
+    stale_ttl=0,
+    backend=cache_backend,
+    codec=PageCodec,
+    namespace="page",
+)
+
+# Rendered histograms (PNG), keyed by a hash of everything drawn on them
+chart_cache = PriceCache(
+    max_entries=int(os.getenv("CHART_CACHE_MAX_ENTRIES", "128")),
+    max_bytes=int(os.getenv("CHART_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    ttls={code: config['cache_ttl'] for code, config in COUNTRY_CONFIG.items()},
+    stale_ttl=0,
+    backend=cache_backend,
+    codec=BytesCodec,
+    namespace="chart",
+)
+
+# Statistics and prices of every scrape, kept after they leave the caches
+price_history = PriceHistory(PRICE_HISTORY_PATH) if PRICE_HISTORY_PATH else None
+
+metrics = Registry(enabled=METRICS_ENABLED)
+request_seconds = metrics.histogram("request_seconds", "Time spent serving each endpoint.", ["endpoint"])
+failed_pages_total = metrics.counter("failed_pages_total", "Result pages that could not be downloaded.", ["country"])
+
+# Identical searches that arrive together share one upstream fetch
+in_flight = SingleFlight()
+
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix="batch")
+
+job_queue = JobQueue(max_workers=JOB_MAX_WORKERS, ttl=JOB_TTL)
+
+# How often each (item, number_of_pages, country, condition) search is made, for cache warming
+query_stats = QueryStats()
+
 
 
 @app.template_filter("format_number")
@@ -63,30 +196,88 @@ def format_number(value):
         return value
 
 
+def rate_provider(country_config):
+    """The exchange-rate provider of a country: its rate API if it has one, otherwise its fixed rate."""
+    if country_config.get('exchange_rate_api'):
+        return JSONRateProvider(country_config['exchange_rate_api'], country_config['exchange_rate_field'])
+    return FixedRateProvider(country_config['fixed_usd_rate'])
+
+
+rate_providers = {code: rate_provider(config) for code, config in COUNTRY_CONFIG.items()}
+
+
+def fetch_exchange_rate(country_code='ar'):
+    """Request the exchange rate of a country from its provider, raising if it fails."""
+    return rate_providers[country_code].fetch(http_get)
+
+
+# Latest exchange rates, which user requests never wait on; they are fetched in the background from the first lookup
+exchange_rates = ExchangeRates(
+    fetch_exchange_rate,
+    COUNTRY_CONFIG,
+    ttl=EXCHANGE_RATE_TTL,
+    path=EXCHANGE_RATE_FILE or None,
+)
+# Countries whose last lookup fell back to the fixed rate, so the fallback is logged once rather than per request
+fixed_rate_countries = set()
+
+
+def current_rate(country_code='ar'):
+    """The latest Rate of a country, or its fixed rate (fetched_at None) until one is fetched."""
+    rate = exchange_rates.get(country_code)
+    if rate is None:
+        if country_code not in fixed_rate_countries:
+            fixed_rate_countries.add(country_code)
+            app.logger.warning(f"No exchange rate known for {country_code} yet; using the fixed rate.")
+        return Rate(float(COUNTRY_CONFIG[country_code]['fixed_usd_rate']), None)
+    if country_code in fixed_rate_countries:
+        fixed_rate_countries.discard(country_code)
+        app.logger.info(f"Exchange rate for {country_code} fetched; no longer using the fixed rate.")
+    return rate
+
+
 def get_exchange_rate(country_code='ar'):
-    """Fetch the current exchange rate from the API."""
-    global exchange_rates
-    
-    country_config = COUNTRY_CONFIG[country_code]
-    
-    # If we don't need an exchange rate for this country, use the fixed rate
-    if not country_config['needs_exchange_rate']:
-        return f"{country_config['fixed_usd_rate']} {country_config['currency']}"
-    
-    # If we already have a cached rate, return it
-    if exchange_rates[country_code] is not None:
-        return exchange_rates[country_code]
-    
-    # Otherwise fetch from API (for Argentina)
+    """Local currency units per US dollar."""
+    return current_rate(country_code).value
+
+
+def validate_search(item, number_of_pages, country_code, condition):
+    """Validate the search parameters, returning (number_of_pages as int, error message or None)."""
+    # Validate country code
+    if country_code not in COUNTRY_CONFIG:
+        return None, "Invalid country code."
+
+    # Validate item
+    if not item or not re.match(r"^[a-zA-Z0-9\-\s]+$", item):
+        return None, "Invalid item parameter."
+
+    # Validate number_of_pages
+    max_pages = max(MAX_PAGES, LARGE_SCAN_MAX_PAGES)
     try:
-        response = requests.get(country_config['exchange_rate_api'])
-        response.raise_for_status()
-        exchange_rates[country_code] = response.json().get("venta", None)
-        return exchange_rates[country_code]
-    except requests.exceptions.RequestException as e:
-        app.logger.error(f"Error fetching exchange rate for {country_code}: {e}")
-        # Return a fallback value if the API fails
-        return f"1000 {country_config['currency']}"
+        number_of_pages = int(number_of_pages)
+        if number_of_pages < 1 or number_of_pages > max_pages:
+            return None, f"Number of pages must be between 1 and {max_pages}."
+    except ValueError:
+        return None, "Number of pages must be a valid integer."
+
+    # Validate condition
+    if condition not in ["all", "new", "used"]:
+        return None, "Invalid condition parameter."
+
+    return number_of_pages, None
+
+
+def search_prices(item, number_of_pages, country_code, condition, count_query=True):
+    """Fetch prices with the scraper for the country's marketplace.
+
+    The search counts towards its popularity for cache warming unless `count_query` is False.
+    """
+    if count_query:
+        query_stats.record((item, number_of_pages, country_code, condition))
+    with metrics.stage("search"):
+        if country_code == 'us':
+            return get_amazon_prices(item, number_of_pages, country_code)
+        return get_prices(item, number_of_pages, country_code, condition)
 
 
 @app.route("/", methods=["GET", "POST"])
@@ -97,28 +288,15 @@ def index():
         country_code = request.form.get("country", "ar")  # Default to Argentina if not specified
         condition = request.form.get("condition", "all")  # Get the condition parameter with "all" as default
 
-        # Validate country code
-        if country_code not in COUNTRY_CONFIG:
-            return render_template("error.html", error_message="Invalid country code."), 400
-
-        # Validate item
-        if not item or not re.match(r"^[a-zA-Z0-9\-\s]+$", item):
-            return render_template("error.html", error_message="Invalid item parameter."), 400
-
-        # Validate number_of_pages
-        try:
-            number_of_pages = int(number_of_pages)
-            if number_of_pages < 1 or number_of_pages > 3:
-                return render_template("error.html", error_message="Number of pages must be between 1 and 3."), 400
-        except ValueError:
-            return render_template("error.html", error_message="Number of pages must be a valid integer."), 400
-
-        # Validate condition
-        if condition not in ["all", "new", "used"]:
-            return render_template("error.html", error_message="Invalid condition parameter."), 400
+        number_of_pages, error_message = validate_search(item, number_of_pages, country_code, condition)
+        if error_message:
+            return render_template("error.html", error_message=error_message), 400
 
+        if JOB_MODE:
+            job = submit_search_job(item, number_of_pages, country_code, condition)
+            return redirect(url_for("job_page", job_id=job.id))
         return redirect(url_for("show_plot", item=item, number_of_pages=number_of_pages, country=country_code, condition=condition))
-    return render_template("index.html")
+    return render_template("index.html", large_scan_pages=LARGE_SCAN_MAX_PAGES if LARGE_SCAN_MAX_PAGES > MAX_PAGES else None)
 
 
 @app.route('/manifest.json')
@@ -136,238 +314,336 @@ def serve_assetlinks():
     return send_file('assetlinks.json', mimetype='application/json')
 
 
+def fetch_pages(urls, parse_page, headers=None):
+    """Fetch and parse the given result pages, yielding them in the same order as `urls`.
+
+    Each yielded value is either a ProductTable of the products `parse_page`
+    extracted from the page or the RequestException raised while fetching it. Bodies are
+    streamed into the parser chunk by chunk instead of being read whole, and
+    pages are handled concurrently, so the first page can be processed while
+    later ones are still downloading; once the caller stops iterating,
+    requests that have not started are cancelled. At most MAX_FETCH_WORKERS
+    pages are requested ahead of the one being yielded, so pages finished
+    behind a slow one never pile up in memory.
+    """
+    def fetch(url):
+        try:
+            with metrics.stage("fetch"):  # Until the response headers arrive
+                response = http_get(url, headers=headers, stream=True)
+            try:
+                response.raise_for_status()
+                with metrics.stage("parse"):  # Reading the body, which is parsed as it streams in
+                    return ProductTable.from_records(list(parse_page(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))))
+            finally:
+                response.close()
+        except requests.exceptions.RequestException as e:
+            return e
+
+    if MAX_FETCH_WORKERS <= 1 or len(urls) <= 1:
+        # Lazy serial fetch: pages after the one where the caller stops are never requested
+        yield from map(fetch, urls)
+        return
+
+    workers = min(MAX_FETCH_WORKERS, len(urls))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        for url in urls:
+            if len(pending) == workers:
+                yield pending.popleft().result()
+            pending.append(executor.submit(fetch, url))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _prices_loader(cache_key, country_code, scrape, *args):
+    """Return a function that scrapes a search with scrape(*args) and caches the result.
+
+    Concurrent calls for the same search, including background refreshes of a
+    stale entry, share one scrape.
+    """
+    def load():
+        result = scrape(*args)
+        if result[0] is not None:
+            save_result(cache_key, result, country_code)
+        return result
+
+    return lambda: in_flight.do(cache_key, load)
+
+
+def save_result(cache_key, result, country_code):
+    """Cache a freshly scraped search result and append it to the price history."""
+    prices_cache.set(cache_key, result, country_code)
+    if price_history is None:
+        return
+    prices_list, _, _, products = result
+    item, number_of_pages = cache_key[:2]
+    condition = cache_key[3] if len(cache_key) > 3 else 'all'  # Amazon searches have no condition
+    price_history.record(item, number_of_pages, country_code, condition, price_stats(prices_list), products,
+                         exchange_rate=get_exchange_rate(country_code))
+
+
+def price_stats(prices_list, threshold=OUTLIER_THRESHOLD):
+    """Statistics of a search result's prices; a large scan's result carries them already, as SketchStats.
+
+    A large scan no longer has its prices, so its statistics only exist for
+    the outlier threshold it was scanned with; any other raises ValueError.
+    """
+    if isinstance(prices_list, SketchStats):
+        if threshold != prices_list.threshold:
+            raise ValueError(f"Large scans only have statistics for an outlier threshold of {prices_list.threshold}.")
+        return prices_list
+    return compute_stats(prices_list, threshold=threshold)
+
+
+def search_loader(item, number_of_pages, country_code, condition):
+    """Return a search's prices_cache key and a function that scrapes it into the cache.
+
+    The keys are the ones get_prices/get_amazon_prices use.
+    """
+    if country_code == 'us':
+        args = (item, number_of_pages, country_code)
+        return args, _prices_loader(args, country_code, scrape_amazon_prices, *args)
+    args = (item, number_of_pages, country_code, condition)
+    return args, _prices_loader(args, country_code, scrape_prices, *args)
+
+
 def get_prices(item, number_of_pages, country_code='ar', condition='all'):
     """Fetch the prices of the given item from MercadoLibre/MercadoLivre."""
     cache_key = (item, number_of_pages, country_code, condition)
-    if cache_key in prices_cache:
-        return prices_cache[cache_key]
+    refresh = _prices_loader(cache_key, country_code, scrape_prices, item, number_of_pages, country_code, condition)
+
+    cached = prices_cache.get(cache_key, refresh=refresh)
+    if cached is not None:
+        return cached
+    return refresh()
+
+
+def mercadolibre_pages(item, number_of_pages, country_code, condition):
+    """URLs and page-cache keys of the result pages of a MercadoLibre/MercadoLivre search."""
+    config = COUNTRY_CONFIG[country_code]
+    domain = config['domain']
 
-    prices_list = []
-    product_infos = []  # List to store product information (title, price, URL)
-    failed_pages = 0
-    domain = COUNTRY_CONFIG[country_code]['domain']
-    
     # Construct URL with condition filter if specified
     condition_param = ""
     if condition == "new":
         condition_param = "_ITEM*CONDITION_2230284"  # MercadoLibre ID for New condition
     elif condition == "used":
         condition_param = "_ITEM*CONDITION_2230581"  # MercadoLibre ID for Used condition
-    
+
+    urls = []
+    page_keys = []
     for i in range(number_of_pages):
         start_item = i * 50 + 1
-        url = f"https://listado.{domain}/{item}{condition_param}_Desde_{start_item}_NoIndex_True"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, "html.parser")
-            
-            # Find all product containers
-            product_containers = soup.select(".ui-search-result__wrapper")
-            
-            # If no products are found, stop scraping further pages
-            if not product_containers:
-                app.logger.info(f"No more results found after {i} pages.")
-                break
-            
-            # Extract product information for each container
-            for container in product_containers:
-                try:
-                    # Get product title
-                    title_elem = container.select_one(".ui-search-item__title")
-                    title = title_elem.text.strip() if title_elem else "Unknown Product"
-                    
-                    # Get product price
-                    price_elem = container.select_one(".andes-money-amount__fraction")
-                    if price_elem:
-                        price = int(re.sub(r"\D", "", price_elem.text))
-                    else:
-                        continue  # Skip products without a price
-                    
-                    # Get product URL
-                    url_elem = container.select_one(".ui-search-link")
-                    product_url = url_elem['href'] if url_elem else None
-                    
-                    # Add price to the list
-                    prices_list.append(price)
-                    
-                    # Add product info to the list
-                    product_infos.append({
-                        'title': title,
-                        'price': price,
-                        'url': product_url
-                    })
-                except Exception as e:
-                    app.logger.error(f"Error processing product: {e}")
-                    continue
-        except requests.exceptions.RequestException as e:
-            app.logger.error(f"Error fetching prices: {e}")
+        urls.append(f"{config['search_url']}/{item}{condition_param}_Desde_{start_item}_NoIndex_True")
+        page_keys.append((domain, item, condition, start_item))
+    return urls, page_keys
+
+
+def collect_products(pages):
+    """Join the result pages of a search, returning (products, url of the last page read, failed_pages).
+
+    `pages` yields (url, products or None) in page order, as get_result_pages
+    does; reading stops at the first page without products. `products` is
+    None when no page had any.
+    """
+    tables = []
+    failed_pages = 0
+    url = None
+    for i, (url, products) in enumerate(pages):
+        if products is None:
             failed_pages += 1
+            continue
+
+        # If no products are found, stop scraping further pages
+        if not products:
+            app.logger.info(f"No more results found after {i} pages.")
+            break
+
+        tables.append(products)
+
+    if not tables:
+        return None, url, failed_pages
+    return ProductTable.concat(tables), url, failed_pages
 
-    if not prices_list:
+
+def mercadolibre_result(pages, country_code):
+    """Build the (prices, url, failed_pages, products) result of a MercadoLibre search from its pages."""
+    products, url, failed_pages = collect_products(pages)
+    if products is None:
         app.logger.info("No results found for the given search.")
         return None, None, failed_pages, None
 
     # For Brazilian prices, convert from centavos to reais if needed
-    if country_code == 'br' and any(p > 10000 for p in prices_list):
-        # Check if the prices seem to be in centavos (very high numbers)
-        prices_list = [p / 100 for p in prices_list]
-        # Also update product_infos
-        for product in product_infos:
-            product['price'] = product['price'] / 100
+    if country_code == 'br' and (products.prices > 10000).any():
+        # Check if the prices seem to be in centavos (very high numbers); the cached pages are left untouched
+        products = ProductTable(products.prices / 100, products.titles, products.urls)
+
+    return products.prices, url, failed_pages, products
+
+
+def scrape_prices(item, number_of_pages, country_code='ar', condition='all'):
+    """Scrape the prices of the given item from MercadoLibre/MercadoLivre, bypassing the cache.
+
+    Returns (prices, url, failed_pages, products) where `products` is a
+    ProductTable and `prices` is its price array, or as scan_prices returns
+    for searches of more than MAX_PAGES pages.
+    """
+    urls, page_keys = mercadolibre_pages(item, number_of_pages, country_code, condition)
+    if number_of_pages > MAX_PAGES:
+        return scan_prices(urls, page_keys, iter_mercadolibre_products, country_code)
+    pages = get_result_pages(urls, page_keys, iter_mercadolibre_products, country_code)
+    return mercadolibre_result(pages, country_code)
 
-    prices_cache[cache_key] = (prices_list, url, failed_pages, product_infos)
-    return prices_list, url, failed_pages, product_infos
+
+def get_result_pages(urls, page_keys, parse_page, country_code, headers=None, cache_pages=True):
+    """Yield (url, products) for each result page, in order, reusing cached pages.
+
+    Only pages missing from `page_cache` are downloaded; they are parsed with
+    `parse_page` (one of the parsers.iter_*_products generators) and cached under their page key, so a 3-page search reuses the
+    pages of an earlier 1- or 2-page search for the same item. `products` is
+    None for a page that failed to download. With `cache_pages` False,
+    downloaded pages are not cached, so large scans do not evict every other search's pages.
+    """
+    pages = [page_cache.get(key) for key in page_keys]
+    missing = [i for i, products in enumerate(pages) if products is None]
+    fetched = fetch_pages([urls[i] for i in missing], parse_page, headers=headers)
+
+    for i, url in enumerate(urls):
+        products = pages[i]
+        if products is None:
+            products = next(fetched)
+            if isinstance(products, Exception):
+                app.logger.error(f"Error fetching {url}: {products}")
+                failed_pages_total.inc(country_code)
+                yield url, None
+                continue
+            if cache_pages:
+                page_cache.set(page_keys[i], products, country_code)
+        report_progress(i + 1, len(urls))
+        yield url, products
 
 
 def get_amazon_prices(item, number_of_pages, country_code='us'):
     """Fetch the prices of the given item from Amazon."""
     cache_key = (item, number_of_pages, country_code)
-    if cache_key in prices_cache:
-        return prices_cache[cache_key]
+    refresh = _prices_loader(cache_key, country_code, scrape_amazon_prices, item, number_of_pages, country_code)
 
-    prices_list = []
-    product_infos = []  # List to store product information (title, price, URL)
-    failed_pages = 0
+    cached = prices_cache.get(cache_key, refresh=refresh)
+    if cached is not None:
+        return cached
+    return refresh()
+
+
+# Add custom headers to avoid being blocked by Amazon
+AMAZON_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+}
+
+
+def amazon_pages(item, number_of_pages, country_code):
+    """URLs and page-cache keys of the result pages of an Amazon search."""
     domain = COUNTRY_CONFIG[country_code]['domain']
-    
-    # Add custom headers to avoid being blocked by Amazon
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-    }
-    
-    for i in range(number_of_pages):
-        page = i + 1
-        # Amazon uses a different URL format for pagination
-        url = f"https://www.{domain}/s?k={item.replace(' ', '+')}"
-        if page > 1:
-            url += f"&page={page}"
-            
-        try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, "html.parser")
-            
-            # Find all product containers in Amazon search results
-            product_containers = soup.select('.s-result-item:not(.AdHolder)')
-            
-            # If no products are found, stop scraping further pages
-            if not product_containers:
-                app.logger.info(f"No more results found after {i} pages.")
-                break
-                
-            # Process each product container
-            for container in product_containers:
-                try:
-                    # Get product title
-                    title_elem = container.select_one('h2 .a-link-normal')
-                    title = title_elem.text.strip() if title_elem else "Unknown Product"
-                    
-                    # Get product price
-                    price_elem = container.select_one('.a-price .a-offscreen')
-                    if not price_elem:
-                        continue  # Skip products without a price
-                        
-                    price_text = price_elem.text.strip()
-                    price_match = re.search(r'[\d,]+\.?\d*', price_text)
-                    if not price_match:
-                        continue
-                        
-                    price_str = price_match.group().replace(',', '')
-                    try:
-                        # Convert to float for decimal handling
-                        price = float(price_str)
-                        # Convert to cents/pennies for consistency
-                        price_cents = int(price * 100)
-                    except ValueError:
-                        continue
-                    
-                    # Get product URL
-                    url_elem = container.select_one('h2 .a-link-normal')
-                    product_url = None
-                    if url_elem and 'href' in url_elem.attrs:
-                        product_url = 'https://www.amazon.com' + url_elem['href'] if url_elem['href'].startswith('/') else url_elem['href']
-                    
-                    # Add price to the list
-                    prices_list.append(price_cents)
-                    
-                    # Add product info to the list
-                    product_infos.append({
-                        'title': title,
-                        'price': price_cents,
-                        'url': product_url
-                    })
-                except Exception as e:
-                    app.logger.error(f"Error processing Amazon product: {e}")
-                    continue
-                        
-        except requests.exceptions.RequestException as e:
-            app.logger.error(f"Error fetching Amazon prices: {e}")
-            failed_pages += 1
+    # Amazon uses a different URL format for pagination
+    base_url = f"{COUNTRY_CONFIG[country_code]['search_url']}/s?k={item.replace(' ', '+')}"
+    urls = [base_url] + [f"{base_url}&page={page}" for page in range(2, number_of_pages + 1)]
+    page_keys = [(domain, item, 'all', page) for page in range(1, number_of_pages + 1)]
+    return urls, page_keys
+
 
-    if not prices_list:
+def amazon_result(pages):
+    """Build the (prices, url, failed_pages, products) result of an Amazon search from its pages."""
+    products, url, failed_pages = collect_products(pages)
+    if products is None:
         app.logger.info("No results found for the given Amazon search.")
         return None, None, failed_pages, None
 
     # Convert from cents back to dollars for display
-    prices_list = [p / 100 for p in prices_list]
-    
-    # Also update product_infos
-    for product in product_infos:
-        product['price'] = product['price'] / 100
-    
-    prices_cache[cache_key] = (prices_list, url, failed_pages, product_infos)
-    return prices_list, url, failed_pages, product_infos
+    products = ProductTable(products.prices / 100, products.titles, products.urls)
+    return products.prices, url, failed_pages, products
 
 
-def format_x(value, tick_number):
-    """Format the x-axis values."""
-    return f"{int(value):,}"
+def scrape_amazon_prices(item, number_of_pages, country_code='us'):
+    """Scrape the prices of the given item from Amazon, bypassing the cache."""
+    urls, page_keys = amazon_pages(item, number_of_pages, country_code)
+    if number_of_pages > MAX_PAGES:
+        return scan_prices(urls, page_keys, iter_amazon_products, country_code, headers=AMAZON_HEADERS)
+    pages = get_result_pages(urls, page_keys, iter_amazon_products, country_code, headers=AMAZON_HEADERS)
+    return amazon_result(pages)
 
 
-def plot_prices(prices_list, item, url, failed_pages, country_code='ar', filter_outliers=True, threshold=3, condition='all'):
+def scan_prices(urls, page_keys, parse_page, country_code, headers=None):
+    """Scrape a large search, folding each result page into streaming aggregates as it arrives.
+
+    Returns (stats, url, failed_pages, products) like the other scrapers,
+    except that `stats` is the SketchStats of every price found and
+    `products` a ProductTable of at most LARGE_SCAN_SAMPLE_SIZE sampled
+    products, plus the cheapest and most expensive ones. Pages are dropped
+    once folded in, so memory does not grow with their number.
+    """
+    stats = StreamingStats()
+    sampler = ProductSampler(LARGE_SCAN_SAMPLE_SIZE)
+    failed_pages = 0
+    url = None
+    pages = get_result_pages(urls, page_keys, parse_page, country_code, headers=headers, cache_pages=False)
+    for i, (url, products) in enumerate(pages):
+        if products is None:
+            failed_pages += 1
+            continue
+        if not products:
+            app.logger.info(f"No more results found after {i} pages.")
+            break
+        stats.add(products.prices)
+        sampler.add(products)
+
+    if not stats.count:
+        app.logger.info("No results found for the given search.")
+        return None, None, failed_pages, None
+
+    # Amazon prices are scraped in cents, and Brazilian ones are when they look like it, as in mercadolibre_result
+    divisor = 100 if country_code == 'us' or (country_code == 'br' and stats.max > 10000) else 1
+    products = sampler.table(divisor)
+    with metrics.stage("stats"):
+        summary = stats.finish(threshold=OUTLIER_THRESHOLD, divisor=divisor, sample=products.prices)
+    return summary, url, failed_pages, products
+
+
+def plot_prices(prices_list, item, url, failed_pages, country_code='ar', filter_outliers=True, threshold=OUTLIER_THRESHOLD,
+                condition='all', stats=None, number_of_pages=None):
     country_config = COUNTRY_CONFIG[country_code]
     currency = country_config['currency']
     country_name = country_config['country_name']
     
-    venta_dolar_str = get_exchange_rate(country_code)
-    if not venta_dolar_str:
-        app.logger.error(f"Failed to get exchange rate for {country_code}.")
-        return None
-    
-    try:
-        venta_dolar = float(venta_dolar_str.replace(f" {currency}", ""))
-    except (ValueError, TypeError):
-        app.logger.error(f"Failed to parse exchange rate: {venta_dolar_str}")
-        venta_dolar = country_config.get('fixed_usd_rate', 1000)  # Fallback
-
-    # Compute statistics on the full dataset
-    std_dev = np.std(prices_list)
-    avg_price = np.mean(prices_list)
-    median_price = np.median(prices_list)
-    max_price = max(prices_list)
-    min_price = min(prices_list)
-
-    # Filter out outliers if the option is enabled
-    if filter_outliers:
-        lower_bound = avg_price - threshold * std_dev
-        upper_bound = avg_price + threshold * std_dev
-        non_outliers = [p for p in prices_list if lower_bound <= p <= upper_bound]
-        outliers = [p for p in prices_list if p < lower_bound or p > upper_bound]
-    else:
-        non_outliers = prices_list
-        outliers = []
+    venta_dolar = get_exchange_rate(country_code)
+
+    current_date = datetime.date.today().strftime("%d/%m/%Y")
+    if number_of_pages is None:
+        number_of_pages = request.args.get('number_of_pages')
+    # A large scan keeps a summary of its prices instead of the prices, so its chart is keyed on that
+    prices_key = prices_list.to_state() if isinstance(prices_list, SketchStats) else np.asarray(prices_list).tolist()
+    chart_key = hashlib.sha256(json.dumps([
+        prices_key, item, url, failed_pages, country_code, filter_outliers, threshold, condition,
+        current_date, str(number_of_pages), venta_dolar, CHART_FORMAT,
+    ]).encode("utf-8")).hexdigest()
+    if chart_cache.get(chart_key) is not None:
+        return chart_key
 
-    plt.figure(figsize=(10, 5))
-    plt.hist(non_outliers, bins=20, color="lightblue", edgecolor="black")
-    plt.ticklabel_format(style="plain", axis="x")
-    formatter = ticker.FuncFormatter(format_x)
-    plt.gca().xaxis.set_major_formatter(formatter)
+    # Compute statistics on the full dataset, reusing the caller's if they used the same outlier filter
+    threshold = threshold if filter_outliers else None
+    if stats is None or stats.threshold != threshold:
+        stats = price_stats(prices_list, threshold=threshold)
+    std_dev = stats.std
+    avg_price = stats.mean
+    median_price = stats.median
+    max_price = stats.max
+    min_price = stats.min
+    outliers = stats.outliers
 
-    y_position = plt.gca().get_ylim()[1] * 0.05
     # Adjust offset for label text depending on median value
     x_pos_offset = (
         0.5 if median_price <= 10 and country_code == 'us'  # For Amazon USD prices
@@ -378,10 +654,6 @@ def plot_prices(prices_list, item, url, failed_pages, country_code='ar', filter_
         else 10000
     )
 
-    plt.xlabel(f"Price in {currency}")
-    plt.ylabel("Frequency")
-    current_date = datetime.date.today().strftime("%d/%m/%Y")
-    
     # Determine marketplace name based on country code
     if country_code == 'us':
         marketplace_name = "Amazon"
@@ -395,55 +667,88 @@ def plot_prices(prices_list, item, url, failed_pages, country_code='ar', filter_
     elif condition == "used":
         condition_text = " - Usados"
     
-    plt.title(
+    title = (
         f'Histogram of {item.replace("-", " ").upper()} prices in {marketplace_name} {country_name}{condition_text} ({current_date})\n'
-        f"Number of items indexed: {len(prices_list)} ({request.args.get('number_of_pages')} pages)\n"
+        f"Number of items indexed: {stats.count} ({number_of_pages} pages)\n"
         f"URL: {url}\n"
         f"Failed to parse {failed_pages} pages."
     )
 
-    def plot_stat_line(stat_value, color, label, linestyle="solid", linewidth=1):
-        plt.axvline(stat_value, color=color, linestyle=linestyle, linewidth=linewidth)
+    def stat_line(stat_value, color, label, linestyle="solid", linewidth=1):
         # For Amazon (USD), don't show USD conversion since it's already in USD
         if country_code == 'us':
-            plt.text(
-                stat_value + x_pos_offset,
-                y_position,
-                f"{label}: ${stat_value:.2f} {currency}",
-                rotation=90,
-                color=color,
-            )
+            text = f"{label}: ${stat_value:.2f} {currency}"
         else:
-            plt.text(
-                stat_value + x_pos_offset,
-                y_position,
-                f"{label}: {int(stat_value):,} {currency} ({int(stat_value / venta_dolar):,} USD)",
-                rotation=90,
-                color=color,
-            )
-
-    plot_stat_line(median_price, "red", "Median")
-    plot_stat_line(avg_price, "purple", "Avg")
-    plot_stat_line(max_price, "blue", "Max", linestyle="dashed")
-    plot_stat_line(min_price, "blue", "Min", linestyle="dashed")
-    plot_stat_line(avg_price + std_dev, "black", "Std Dev", linestyle="dotted", linewidth=3)
-    plot_stat_line(np.percentile(prices_list, 25), "green", "25th percentile", linestyle="dashed", linewidth=2)
-
-    plt.legend(["Median", "Avg", "Max", "Min", "Std Dev", "25th percentile"], loc="upper right")
-    plt.grid(True)
+            text = f"{label}: {int(stat_value):,} {currency} ({int(stat_value / venta_dolar):,} USD)"
+        return stat_value, color, label, text, linestyle, linewidth
+
+    stat_lines = [
+        stat_line(median_price, "red", "Median"),
+        stat_line(avg_price, "purple", "Avg"),
+        stat_line(max_price, "blue", "Max", linestyle="dashed"),
+        stat_line(min_price, "blue", "Min", linestyle="dashed"),
+        stat_line(avg_price + std_dev, "black", "Std Dev", linestyle="dotted", linewidth=3),
+        stat_line(stats.percentile(25), "green", "25th percentile", linestyle="dashed", linewidth=2),
+    ]
 
     # If outliers were detected, annotate the chart with their values.
-    if outliers:
-        outlier_text = "Outliers: " + ", ".join([f"{p:,}" for p in sorted(outliers)])
-        plt.figtext(0.99, 0.01, outlier_text, horizontalalignment='right', fontsize=8, color='red')
+    outlier_text = None
+    if outliers.size:
+        outlier_text = "Outliers: " + ", ".join([f"{p:,}" for p in sorted(outliers.tolist())])
 
-    plt.tight_layout()
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format="png")
-    plt.close()
-    buffer.seek(0)
-    plot_base64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
-    return plot_base64
+    image = render_histogram(
+        stats.histogram_counts,
+        stats.histogram_edges,
+        title=title,
+        xlabel=f"Price in {currency}",
+        stat_lines=stat_lines,
+        label_offset=x_pos_offset,
+        footnote=outlier_text,
+    )
+    chart_cache.set(chart_key, image, country_code)
+    return chart_key
+
+
+@app.route("/plot/<chart_hash>.<extension>")
+def serve_plot(chart_hash, extension):
+    """Serve a rendered histogram; the URL is derived from the chart's contents, so it never changes."""
+    if extension != EXTENSIONS[CHART_FORMAT]:
+        abort(404)
+    image = chart_cache.get(chart_hash)
+    if image is None:
+        # Rendered by another worker or already evicted: render it again from the search in the query string
+        item = request.args.get("item", "").strip()
+        country_code = request.args.get("country", "ar")
+        condition = request.args.get("condition", "all")
+        number_of_pages, error_message = validate_search(
+            item, request.args.get("number_of_pages", "").strip(), country_code, condition
+        )
+        if error_message:
+            abort(404)
+        # A chart fetch is part of a search already counted when its results page was shown
+        prices_list, url, failed_pages, _ = search_prices(item, number_of_pages, country_code, condition,
+                                                          count_query=False)
+        if prices_list is None:
+            abort(404)
+        rendered_hash = plot_prices(prices_list, item, url, failed_pages, country_code, condition=condition,
+                                    number_of_pages=number_of_pages)
+        image = chart_cache.get(rendered_hash) if rendered_hash else None
+        if image is None:
+            abort(404)
+        if rendered_hash != chart_hash:
+            # The prices changed since the page was rendered, so this image must not be cached under the old URL
+            response = make_response(image)
+            response.mimetype = MIMETYPES[CHART_FORMAT]
+            response.cache_control.no_cache = True
+            return response
+
+    response = make_response(image)
+    response.mimetype = MIMETYPES[CHART_FORMAT]
+    response.set_etag(chart_hash)
+    response.cache_control.public = True
+    response.cache_control.max_age = CHART_MAX_AGE
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
 
 
 @app.route("/show_plot")
@@ -453,103 +758,51 @@ def show_plot():
     country_code = request.args.get("country", "ar")  # Default to Argentina if not specified
     condition = request.args.get("condition", "all")  # Get the condition parameter with "all" as default
 
-    # Validate country code
-    if country_code not in COUNTRY_CONFIG:
-        return render_template("error.html", error_message="Invalid country code."), 400
+    number_of_pages, error_message = validate_search(item, number_of_pages, country_code, condition)
+    if error_message:
+        return render_template("error.html", error_message=error_message), 400
 
-    # Validate item
-    if not item or not re.match(r"^[a-zA-Z0-9\-\s]+$", item):
-        return render_template("error.html", error_message="Invalid item parameter."), 400
+    result = search_prices(item, number_of_pages, country_code, condition)
+    return render_results(item, number_of_pages, country_code, condition, result)
 
-    # Validate number_of_pages
-    try:
-        number_of_pages = int(number_of_pages)
-        if number_of_pages < 1 or number_of_pages > 3:
-            return render_template("error.html", error_message="Number of pages must be between 1 and 3."), 400
-    except ValueError:
-        return render_template("error.html", error_message="Number of pages must be a valid integer."), 400
 
-    # Choose the appropriate price fetching function based on country code
-    if country_code == 'us':
-        prices_list, url, failed_pages, product_infos = get_amazon_prices(item, number_of_pages, country_code)
-    else:
-        prices_list, url, failed_pages, product_infos = get_prices(item, number_of_pages, country_code, condition)
-        
-    if prices_list is None or url is None or product_infos is None:
+def render_results(item, number_of_pages, country_code, condition, result):
+    """Render the results page of a validated search from its search_prices() result."""
+    prices_list, url, failed_pages, products = result
+
+    if prices_list is None or url is None or products is None:
         error_message = "Failed to fetch prices. Please try searching fewer pages or check the item name."
         return render_template("error.html", error_message=error_message), 500
 
-    median_price = float(np.median(prices_list))
-    avg_price = float(np.mean(prices_list))
-    max_price = float(max(prices_list))
-    min_price = float(min(prices_list))
-    std_dev = float(np.std(prices_list))
-    percentile_25 = float(np.percentile(prices_list, 25))
+    # Every summary below, the outlier split and the histogram come from one pass over the prices
+    with metrics.stage("stats"):
+        stats = price_stats(prices_list)
+    median_price = stats.median
+    avg_price = stats.mean
+    max_price = stats.max
+    min_price = stats.min
+    std_dev = stats.std
+    percentile_25 = stats.percentile(25)
     current_date = datetime.date.today().strftime("%d/%m/%Y")
     
     country_config = COUNTRY_CONFIG[country_code]
-    currency = country_config['currency']
-    
-    # Get exchange rate - use fixed rate for non-Argentina countries
-    if country_config['needs_exchange_rate']:
-        exchange_rate_str = get_exchange_rate(country_code)
-        exchange_rate = float(exchange_rate_str.replace(f" {currency}", ""))
-    else:
-        exchange_rate = country_config['fixed_usd_rate']
+    exchange_rate = get_exchange_rate(country_code)
     
     # Generate the plot for backward compatibility and image download
-    plot_base64 = plot_prices(prices_list, item, url, failed_pages, country_code, condition=condition)
-    if plot_base64 is None:
+    with metrics.stage("chart"):
+        chart_hash = plot_prices(prices_list, item, url, failed_pages, country_code, condition=condition, stats=stats,
+                                 number_of_pages=number_of_pages)
+    if chart_hash is None:
         error_message = "Failed to generate plot. Please try again later."
         return render_template("error.html", error_message=error_message), 500
 
-    # Filter outliers for the interactive chart (same logic as in plot_prices)
-    threshold = 3
-    lower_bound = avg_price - threshold * std_dev
-    upper_bound = avg_price + threshold * std_dev
-    non_outliers = [p for p in prices_list if lower_bound <= p <= upper_bound]
-    outliers = [p for p in prices_list if p < lower_bound or p > upper_bound]
-    
-    # Find products near the median (±5%)
-    median_range_min = median_price * 0.95  # 5% below median
-    median_range_max = median_price * 1.05  # 5% above median
-    
-    # Find products close to median, cheapest, and most expensive
-    products_near_median = []
-    cheapest_product = None
-    most_expensive_product = None
-    
-    # First scan to find cheapest and most expensive products
-    min_price_found = float('inf')
-    max_price_found = float('-inf')
-    
-    for product in product_infos:
-        price = product['price']
-        
-        # Check for cheapest product
-        if price < min_price_found:
-            min_price_found = price
-            cheapest_product = product
-            
-        # Check for most expensive product
-        if price > max_price_found:
-            max_price_found = price
-            most_expensive_product = product
-            
-        # Check if product is within ±5% of median
-        if median_range_min <= price <= median_range_max:
-            # Include price percentage difference from median
-            product_copy = product.copy()
-            percentage_diff = ((price - median_price) / median_price) * 100
-            product_copy['percentage_diff'] = round(percentage_diff, 2)
-            products_near_median.append(product_copy)
-
-    # Limit to reasonable number of products to display (at most 10)
-    if len(products_near_median) > 10:
-        # Sort by how close they are to the median
-        products_near_median.sort(key=lambda x: abs(x['percentage_diff']))
-        products_near_median = products_near_median[:10]
-    
+    # Outliers for the interactive chart (the same split plot_prices used)
+    non_outliers = stats.non_outliers.tolist()
+    outliers = stats.outliers.tolist()
+
+    # Products near the median (±5%, at most 10), cheapest and most expensive
+    products_near_median, cheapest_product, most_expensive_product = pick_products(products, median_price)
+
     # Convert to JSON for the frontend
     products_near_median_json = json.dumps(products_near_median)
     cheapest_product_json = json.dumps(cheapest_product) if cheapest_product else None
@@ -562,36 +815,591 @@ def show_plot():
     # Additional template variables for Amazon (US)
     marketplace_name = "Amazon" if country_code == 'us' else f"MercadoLi{'v' if country_code == 'br' else 'b'}re"
     
-    return render_template(
-        "show_plot.html",
-        plot_base64=plot_base64,
-        prices_json=prices_json,
-        outliers_json=outliers_json,
-        url=url,
-        median_price=median_price,
-        avg_price=avg_price,
-        max_price=max_price,
-        min_price=min_price,
-        std_dev=std_dev,
-        percentile_25=percentile_25,
-        item=item,
-        number_of_pages=number_of_pages,
-        current_date=current_date,
-        exchange_rate=exchange_rate,
-        avg_price_usd=int(avg_price / exchange_rate),
-        median_price_usd=int(median_price / exchange_rate),
-        max_price_usd=int(max_price / exchange_rate),
-        min_price_usd=int(min_price / exchange_rate),
-        failed_pages=failed_pages,
-        country_code=country_code,
-        currency=country_config['currency'],
-        country_name=country_config['country_name'],
-        marketplace_name=marketplace_name,
-        condition=condition,
-        products_near_median_json=products_near_median_json,
-        cheapest_product_json=cheapest_product_json,
-        most_expensive_product_json=most_expensive_product_json,
-    )
+    with metrics.stage("render"):
+        return render_template(
+            "show_plot.html",
+            plot_url=url_for(
+                "serve_plot",
+                chart_hash=chart_hash,
+                extension=EXTENSIONS[CHART_FORMAT],
+                item=item,
+                number_of_pages=number_of_pages,
+                country=country_code,
+                condition=condition,
+            ),
+            chart_extension=EXTENSIONS[CHART_FORMAT],
+            prices_json=prices_json,
+            outliers_json=outliers_json,
+            url=url,
+            median_price=median_price,
+            avg_price=avg_price,
+            max_price=max_price,
+            min_price=min_price,
+            std_dev=std_dev,
+            percentile_25=percentile_25,
+            item=item,
+            number_of_pages=number_of_pages,
+            current_date=current_date,
+            exchange_rate=exchange_rate,
+            avg_price_usd=int(avg_price / exchange_rate),
+            median_price_usd=int(median_price / exchange_rate),
+            max_price_usd=int(max_price / exchange_rate),
+            min_price_usd=int(min_price / exchange_rate),
+            failed_pages=failed_pages,
+            country_code=country_code,
+            currency=country_config['currency'],
+            country_name=country_config['country_name'],
+            marketplace_name=marketplace_name,
+            condition=condition,
+            products_near_median_json=products_near_median_json,
+            cheapest_product_json=cheapest_product_json,
+            most_expensive_product_json=most_expensive_product_json,
+        )
+
+
+def search_summary(item, number_of_pages, country_code, condition):
+    """Run a validated search and summarize it for the JSON APIs, or return None if no prices were found."""
+    return summarize_result(item, number_of_pages, country_code, condition,
+                            search_prices(item, number_of_pages, country_code, condition))
+
+
+def summarize_result(item, number_of_pages, country_code, condition, result):
+    """Summarize a search_prices() result for the JSON APIs, or return None if it has no prices."""
+    prices_list, url, failed_pages, products = result
+    if prices_list is None:
+        return None
+
+    with metrics.stage("stats"):
+        stats = price_stats(prices_list)
+        products_near_median, cheapest_product, most_expensive_product = pick_products(products, stats.median)
+
+    return {
+        "item": item,
+        "number_of_pages": number_of_pages,
+        "country": country_code,
+        "condition": condition,
+        "currency": COUNTRY_CONFIG[country_code]["currency"],
+        "url": url,
+        "failed_pages": failed_pages,
+        "exchange_rate": current_rate(country_code).to_dict(),
+        "stats": stats.to_dict(),
+        "products": {
+            "near_median": products_near_median,
+            "cheapest": cheapest_product,
+            "most_expensive": most_expensive_product,
+        },
+    }
+
+
+@app.route("/api/prices")
+def api_prices():
+    """Statistics, histogram bins and product picks of a search, without rendering a chart or page.
+
+    Takes the same parameters as /show_plot. The body is JSON, or MessagePack
+    when asked for with `format=msgpack` or the Accept header, and is
+    compressed when the client accepts it.
+    """
+    item = request.args.get("item", "").strip()
+    number_of_pages = request.args.get("number_of_pages", "").strip()
+    country_code = request.args.get("country", "ar")
+    condition = request.args.get("condition", "all")
+
+    mimetype = negotiate_mimetype(request.accept_mimetypes, request.args.get("format"))
+    if mimetype is None:
+        return jsonify(error="Unsupported response format."), 406
+
+    number_of_pages, error_message = validate_search(item, number_of_pages, country_code, condition)
+    if error_message:
+        return jsonify(error=error_message), 400
+
+    return api_response(search_summary(item, number_of_pages, country_code, condition), mimetype)
+
+
+def parse_day(value, days_after=0):
+    """Unix time at which an ISO date such as 2025-01-31 (plus `days_after` days) starts, or None if empty."""
+    if not value:
+        return None
+    day = datetime.date.fromisoformat(value) + datetime.timedelta(days=days_after)
+    return datetime.datetime.combine(day, datetime.time()).timestamp()
+
+
+@app.route("/api/history")
+def api_history():
+    """Recorded statistics of a search over time, read from the price history without scraping.
+
+    Takes `item` and `country` like /api/prices, optional `condition` and
+    `number_of_pages` filters, and `from`/`to` ISO dates (inclusive).
+    """
+    if price_history is None:
+        return jsonify(error="Price history is disabled."), 404
+
+    item = request.args.get("item", "").strip()
+    country_code = request.args.get("country", "ar")
+    condition = request.args.get("condition") or None
+    number_of_pages = request.args.get("number_of_pages", "").strip()
+
+    mimetype = negotiate_mimetype(request.accept_mimetypes, request.args.get("format"))
+    if mimetype is None:
+        return jsonify(error="Unsupported response format."), 406
+
+    pages, error_message = validate_search(item, number_of_pages or "1", country_code, condition or "all")
+    if error_message:
+        return jsonify(error=error_message), 400
+    try:
+        since = parse_day(request.args.get("from"))
+        until = parse_day(request.args.get("to"), days_after=1)  # The whole of the last day
+    except ValueError:
+        return jsonify(error="Dates must be given as YYYY-MM-DD."), 400
+
+    points = price_history.series(item, country_code, condition=condition,
+                                  number_of_pages=pages if number_of_pages else None, since=since, until=until)
+    return api_response({
+        "item": item,
+        "country": country_code,
+        "currency": COUNTRY_CONFIG[country_code]["currency"],
+        "points": points,
+    }, mimetype)
+
+
+def api_response(payload, mimetype):
+    """Encode and compress a search summary for the JSON API, or report that the search failed."""
+    if payload is None:
+        return jsonify(error="Failed to fetch prices. Please try searching fewer pages or check the item name."), 500
+
+    body, content_encoding = compress(SERIALIZERS[mimetype](payload), request.accept_encodings)
+
+    response = make_response(body)
+    response.mimetype = mimetype
+    if content_encoding:
+        response.headers["Content-Encoding"] = content_encoding
+    response.vary.update(("Accept", "Accept-Encoding"))
+    # Pollers revalidate and get a 304 while the cached search result is unchanged
+    response.cache_control.no_cache = True
+    response.set_etag(hashlib.sha256(body).hexdigest())
+    return response.make_conditional(request)
+
+
+def parse_batch(text):
+    """Read batch search specs from a JSON list, a {"searches": [...]} object or JSON lines."""
+    try:
+        specs = json.loads(text)
+    except ValueError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(specs, dict):
+        specs = specs.get("searches", [specs])
+    return specs
+
+
+def run_batch(specs):
+    """Run many searches concurrently, yielding one result per spec as each search completes.
+
+    Each spec is a dict with `item` and optional `number_of_pages` (1),
+    `country` ("ar") and `condition` ("all"). Results carry the spec's
+    `index`, plus either the search summary or an `error`. Identical specs
+    are only searched once, and searches already in `prices_cache` (or being
+    scraped for another request) are not scraped again.
+    """
+    searches = {}  # Validated search -> indexes of the specs asking for it
+    for index, spec in enumerate(specs):
+        if not isinstance(spec, dict):
+            yield {"index": index, "error": "Invalid search."}
+            continue
+        item = str(spec.get("item", "")).strip()
+        country_code = str(spec.get("country", "ar"))
+        condition = str(spec.get("condition", "all"))
+        number_of_pages, error_message = validate_search(item, str(spec.get("number_of_pages", 1)), country_code, condition)
+        if error_message:
+            yield {"index": index, "error": error_message}
+            continue
+        searches.setdefault((item, number_of_pages, country_code, condition), []).append(index)
+
+    futures = {batch_executor.submit(search_summary, *search): search for search in searches}
+    try:
+        for future in as_completed(futures):
+            search = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                app.logger.error(f"Error running batch search {search}: {e}")
+                summary = None
+            for index in searches[search]:
+                if summary is None:
+                    yield {"index": index, "error": "Failed to fetch prices."}
+                else:
+                    yield {"index": index, **summary}
+    finally:
+        # The client went away or the caller stopped reading: drop searches that have not started
+        for future in futures:
+            future.cancel()
+
+
+@app.route("/api/batch", methods=["POST"])
+def api_batch():
+    """Run a batch of searches and stream their summaries back as newline-delimited JSON.
+
+    The body is a JSON list of search specs (see run_batch), a
+    {"searches": [...]} object, or one spec per line. Results are written in
+    completion order, each tagged with the `index` of its spec.
+    """
+    try:
+        specs = parse_batch(request.get_data(as_text=True))
+    except ValueError:
+        return jsonify(error="The request body must be JSON."), 400
+    if not isinstance(specs, list):
+        return jsonify(error="Expected a list of searches."), 400
+    if len(specs) > BATCH_MAX_SEARCHES:
+        return jsonify(error=f"At most {BATCH_MAX_SEARCHES} searches are allowed per batch."), 400
+
+    lines = (dumps_json(result) + b"\n" for result in run_batch(specs))
+    return app.response_class(lines, mimetype="application/x-ndjson")
+
+
+@app.cli.command("batch")
+@click.argument("searches", type=click.File("r"), default="-")
+def batch_command(searches):
+    """Run the searches in SEARCHES (a JSON list or JSON lines, stdin by default) and print NDJSON results."""
+    for result in run_batch(parse_batch(searches.read())):
+        click.echo(dumps_json(result).decode("utf-8"))
+
+
+@app.cli.command("prewarm-charts")
+@click.argument("directory", default=CHART_FONT_CACHE)
+def prewarm_charts_command(directory):
+    """Build matplotlib's font cache in DIRECTORY (CHART_FONT_CACHE by default) so cold starts can reuse it."""
+    for path in prewarm_font_cache(directory):
+        click.echo(path)
+
+
+def run_search_job(item, number_of_pages, country_code, condition):
+    """Job body of a background search; the scraped prices land in prices_cache like any search."""
+    summary = search_summary(item, number_of_pages, country_code, condition)
+    if summary is None:
+        raise RuntimeError("Failed to fetch prices. Please try searching fewer pages or check the item name.")
+    return summary
+
+
+def submit_search_job(item, number_of_pages, country_code, condition):
+    """Queue a validated search as a background job, reusing the job already running it if any."""
+    search = (item, number_of_pages, country_code, condition)
+    return job_queue.submit(search, run_search_job, *search)
+
+
+def job_status(job):
+    """A job's status for polling, with the URL of its results page once it is done."""
+    status = job.to_dict()
+    if job.status == "done":
+        item, number_of_pages, country_code, condition = job.key
+        # The prices are cached by now, so the results page only renders the chart
+        status["result_url"] = url_for(
+            "show_plot", item=item, number_of_pages=number_of_pages, country=country_code, condition=condition
+        )
+    return status
+
+
+@app.route("/api/jobs", methods=["POST"])
+def api_submit_job():
+    """Start a search in the background and return its job ID at once.
+
+    Takes the /show_plot parameters as form fields or a JSON object; poll the
+    returned `status_url` for per-page progress and the search summary.
+    """
+    params = request.get_json(silent=True) or request.form
+    item = str(params.get("item", "")).strip()
+    number_of_pages = str(params.get("number_of_pages", "1")).strip()
+    country_code = str(params.get("country", "ar"))
+    condition = str(params.get("condition", "all"))
+
+    number_of_pages, error_message = validate_search(item, number_of_pages, country_code, condition)
+    if error_message:
+        return jsonify(error=error_message), 400
+
+    job = submit_search_job(item, number_of_pages, country_code, condition)
+    status_url = url_for("api_job_status", job_id=job.id)
+    return jsonify({**job_status(job), "status_url": status_url}), 202, {"Location": status_url}
+
+
+@app.route("/api/jobs/<job_id>")
+def api_job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify(error="Unknown or expired job."), 404
+    return jsonify(job_status(job))
+
+
+@app.route("/jobs/<job_id>")
+def job_page(job_id):
+    """Progress page shown while a search job runs; it moves on to the results page when the job is done."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return render_template("error.html", error_message="La búsqueda expiró o no existe."), 404
+    return render_template("job.html", job=job_status(job), status_url=url_for("api_job_status", job_id=job_id))
+
+
+async def get_result_pages_async(client, urls, page_keys, parse_page, country_code, headers=None):
+    """Async counterpart of get_result_pages, returning the list of (url, products) pairs.
+
+    Missing pages are downloaded concurrently with the async HTTP `client` and
+    parsed in a worker thread, so the event loop is free while they are.
+    Progress is reported as each page is done, in whatever order they finish.
+    """
+    pages = [page_cache.get(key) for key in page_keys]
+    missing = [i for i, products in enumerate(pages) if products is None]
+    pages_done = len(urls) - len(missing)
+    report_progress(pages_done, len(urls))
+
+    async def fetch(url):
+        nonlocal pages_done
+        try:
+            response = await async_http_get(client, url, headers=headers)
+        except requests.exceptions.RequestException as e:
+            app.logger.error(f"Error fetching {url}: {e}")
+            return None
+        products = await asyncio.to_thread(lambda: ProductTable.from_records(list(parse_page([response.content]))))
+        pages_done += 1
+        report_progress(pages_done, len(urls))
+        return products
+
+    fetched = await asyncio.gather(*(fetch(urls[i]) for i in missing))
+    for i, products in zip(missing, fetched):
+        if products is not None:
+            page_cache.set(page_keys[i], products, country_code)
+        else:
+            failed_pages_total.inc(country_code)
+        pages[i] = products
+    return list(zip(urls, pages))
+
+
+async def scrape_prices_async(client, item, number_of_pages, country_code, condition):
+    """Async counterpart of scrape_prices/scrape_amazon_prices, fetching the pages with the async HTTP `client`."""
+    if country_code == 'us':
+        urls, page_keys = amazon_pages(item, number_of_pages, country_code)
+        parse_page, headers = iter_amazon_products, AMAZON_HEADERS
+    else:
+        urls, page_keys = mercadolibre_pages(item, number_of_pages, country_code, condition)
+        parse_page, headers = iter_mercadolibre_products, None
+
+    pages = await get_result_pages_async(client, urls, page_keys, parse_page, country_code, headers=headers)
+    return amazon_result(pages) if country_code == 'us' else mercadolibre_result(pages, country_code)
+
+
+async def search_prices_async(client, item, number_of_pages, country_code, condition):
+    """Async counterpart of search_prices.
+
+    Cached searches are served as search_prices serves them (stale entries
+    are refreshed in a background thread); on a miss the pages are fetched
+    with the async HTTP `client`, in a scrape shared through `in_flight`
+    with identical searches running at the same time, sync or async.
+    """
+    query_stats.record((item, number_of_pages, country_code, condition))
+    with metrics.stage("search"):
+        cache_key, refresh = search_loader(item, number_of_pages, country_code, condition)
+        cached = prices_cache.get(cache_key, refresh=refresh)
+        if cached is not None:
+            return cached
+        if number_of_pages > MAX_PAGES:
+            # Large scans fold pages in as they arrive, which the sync scraper does; keep it off the event loop
+            return await asyncio.to_thread(refresh)
+
+        async def load():
+            result = await scrape_prices_async(client, item, number_of_pages, country_code, condition)
+            if result[0] is not None:
+                save_result(cache_key, result, country_code)
+            return result
+
+        return await in_flight.do_async(cache_key, load)
+
+
+async def show_plot_async():
+    """show_plot for SERVING_MODE=async: the pages download concurrently on the worker's event loop.
+
+    The server thread handling the request still waits for the response, so
+    a worker serves as many requests at once as it has threads, as in sync
+    mode; what changes is that every page comes through one pooled client.
+    """
+    item = request.args.get("item", "").strip()
+    number_of_pages = request.args.get("number_of_pages", "").strip()
+    country_code = request.args.get("country", "ar")
+    condition = request.args.get("condition", "all")
+
+    number_of_pages, error_message = validate_search(item, number_of_pages, country_code, condition)
+    if error_message:
+        return render_template("error.html", error_message=error_message), 400
+
+    result = await search_prices_async(shared_async_client(), item, number_of_pages, country_code, condition)
+    # Statistics, chart rendering and templating are CPU-bound, so they run off the event loop
+    return await asyncio.to_thread(render_results, item, number_of_pages, country_code, condition, result)
+
+
+async def api_prices_async():
+    """api_prices for SERVING_MODE=async."""
+    item = request.args.get("item", "").strip()
+    number_of_pages = request.args.get("number_of_pages", "").strip()
+    country_code = request.args.get("country", "ar")
+    condition = request.args.get("condition", "all")
+
+    mimetype = negotiate_mimetype(request.accept_mimetypes, request.args.get("format"))
+    if mimetype is None:
+        return jsonify(error="Unsupported response format."), 406
+
+    number_of_pages, error_message = validate_search(item, number_of_pages, country_code, condition)
+    if error_message:
+        return jsonify(error=error_message), 400
+
+    result = await search_prices_async(shared_async_client(), item, number_of_pages, country_code, condition)
+    payload = await asyncio.to_thread(summarize_result, item, number_of_pages, country_code, condition, result)
+    return api_response(payload, mimetype)
+
+
+_event_loop = None
+_event_loop_lock = threading.Lock()
+
+
+def event_loop():
+    """The worker's event loop for async views, running in a background thread started on first use."""
+    global _event_loop
+    with _event_loop_lock:
+        if _event_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="async-views", daemon=True).start()
+            _event_loop = loop
+    return _event_loop
+
+
+def run_on_event_loop(func):
+    """Flask's async_to_sync hook: run async views on event_loop() rather than a new loop per request.
+
+    The loop outlives requests, so shared_async_client() keeps its
+    connections alive between them. The calling thread waits for the result.
+    """
+    def run(*args, **kwargs):
+        # run_coroutine_threadsafe copies the caller's context variables, so the request context goes along
+        return asyncio.run_coroutine_threadsafe(func(*args, **kwargs), event_loop()).result()
+    return run
+
+
+app.async_to_sync = run_on_event_loop
+
+if SERVING_MODE == "async":
+    app.view_functions["show_plot"] = show_plot_async
+    app.view_functions["api_prices"] = api_prices_async
+
+
+def refresh_exchange_rates():
+    """Fetch the exchange rate of every country, keeping the last known one where that fails."""
+    exchange_rates.refresh_all()
+
+
+def _needs_warming(cache_key):
+    fresh_for = prices_cache.fresh_for(cache_key)
+    # Refresh anything that would go stale before the next cycle
+    return fresh_for is None or fresh_for < WARM_INTERVAL
+
+
+def search_page_keys(item, number_of_pages, country_code, condition):
+    """Page-cache keys of a search's result pages."""
+    if country_code == 'us':
+        return amazon_pages(item, number_of_pages, country_code)[1]
+    return mercadolibre_pages(item, number_of_pages, country_code, condition)[1]
+
+
+def warm_cost(search):
+    """Upstream requests warming `search` makes: one per result page, none if it is cached long enough."""
+    cache_key, _ = search_loader(*search)
+    return search[1] if _needs_warming(cache_key) else 0
+
+
+def warm_search(search):
+    """Make sure a popular search and its chart are cached until the next warming cycle."""
+    item, number_of_pages, country_code, condition = search
+    cache_key, refresh = search_loader(*search)
+    if _needs_warming(cache_key):
+        # A result is cached as of when it is scraped, so cached pages, which may be nearly as old as the
+        # result being replaced, are downloaded again rather than passed off as fresh
+        for page_key in search_page_keys(*search):
+            page_cache.delete(page_key)
+        result = refresh()
+    else:
+        result = prices_cache.get(cache_key)
+    if result is None or result[0] is None:
+        return
+
+    prices_list, url, failed_pages, _ = result
+    plot_prices(prices_list, item, url, failed_pages, country_code, condition=condition,
+                stats=price_stats(prices_list), number_of_pages=number_of_pages)
+
+
+cache_warmer = CacheWarmer(
+    query_stats,
+    warm_search,
+    cost=warm_cost,
+    recent_requests=recent_request_count,
+    top_n=WARM_TOP_N,
+    request_budget=WARM_REQUEST_BUDGET,
+    before_cycle=refresh_exchange_rates,
+    lock_path=WARM_LOCK_FILE or None,
+)
+if WARM_INTERVAL > 0:
+    cache_warmer.start(WARM_INTERVAL)
+
+
+def _cache_events():
+    for name, cache in (("prices", prices_cache), ("page", page_cache), ("chart", chart_cache)):
+        stats = cache.stats()
+        for event in ("hits", "stale_hits", "shared_hits", "misses", "evictions", "expirations"):
+            yield (name, event), stats[event]
+
+
+def _cache_sizes():
+    for name, cache in (("prices", prices_cache), ("page", page_cache), ("chart", chart_cache)):
+        stats = cache.stats()
+        yield (name, "entries"), stats["entries"]
+        yield (name, "bytes"), stats["bytes"]
+
+
+metrics.collector("cache_events_total", "counter", "Cache lookups by outcome, and entries dropped.",
+                  ["cache", "event"], _cache_events)
+metrics.collector("cache_size", "gauge", "Entries and approximate bytes held by each cache.",
+                  ["cache", "unit"], _cache_sizes)
+metrics.collector("exchange_rate_events_total", "counter",
+                  "Exchange-rate lookups answered with a fetched rate (hits) or the fixed one (misses), and fetch outcomes.",
+                  ["event"], lambda: (((event,), count) for event, count in exchange_rates.stats().items()))
+metrics.collector("upstream_responses_total", "counter", "Upstream responses by host and status code.",
+                  ["host", "status"], lambda: (((host, str(status)), count)
+                                               for (host, status), count in status_counts().items()))
+
+
+@app.before_request
+def start_request_timing():
+    if metrics.enabled:
+        g.metrics_token = metrics.start_request()
+        g.request_started = time.perf_counter()
+
+
+@app.after_request
+def add_server_timing(response):
+    if metrics.enabled and "request_started" in g:
+        request_seconds.observe(time.perf_counter() - g.request_started, request.endpoint or "unknown")
+        server_timing = metrics.server_timing()
+        if server_timing:
+            response.headers["Server-Timing"] = server_timing
+    return response
+
+
+@app.teardown_request
+def end_request_timing(exc):
+    if "metrics_token" in g:
+        metrics.end_request(g.pop("metrics_token"))
+
+
+@app.route("/metrics")
+def serve_metrics():
+    """Stage latencies, cache and upstream counters in the Prometheus text format (with METRICS_ENABLED=1)."""
+    if not metrics.enabled:
+        abort(404)
+    response = make_response(metrics.render())
+    response.headers["Content-Type"] = METRICS_CONTENT_TYPE
+    response.cache_control.no_store = True
+    return response
 
 
 @app.errorhandler(500)
@@ -0,0 +1,270 @@
+"""Offline benchmarks of the scraping, statistics, charting and page-serving paths.
+
+    python benchmarks/bench.py [-k NAME] [--rounds 20] [--save] [--threshold 0.25]
+
+Result pages come from the recorded MercadoLibre, MercadoLivre and Amazon
+fixtures in tests/backend/fixtures. Their result lists are repeated up to
+the size of a real page (RESULTS_PER_PAGE), and every HTTP call is answered
+from them. Opening a socket fails the run, so it never touches the network.
+
+Each benchmark is timed over --rounds runs after a warm-up run, and the
+median is reported. The medians are compared with the baseline in
+benchmarks/baseline.json, and the run fails if any median is more than
+--threshold (25% by default) slower. Baselines depend on the machine, so
+they are not committed: the first run on a machine records its medians as
+the baseline, and --save records a new one.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import socket
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+from unittest.mock import patch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "backend", "fixtures")
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+# Results on a real MercadoLibre page (Amazon shows fewer, but a full page keeps the comparison fair)
+RESULTS_PER_PAGE = 50
+
+# Shortest timed round; quicker benchmarks are run several times per round
+MIN_ROUND_SECONDS = 0.01
+
+# Settings read when the app is imported, keeping benchmark runs off the disk and out of the background threads.
+# They are set for as long as a Suite is open and override the ones in .env, which never replaces set variables
+APP_ENVIRONMENT = {"EXCHANGE_RATE_FILE": "", "PRICE_HISTORY_PATH": "", "CACHE_BACKEND": "memory", "WARM_INTERVAL": "0",
+                   "METRICS_ENABLED": "0"}
+sys.path.insert(0, ROOT)
+
+CACHES = ("prices_cache", "page_cache", "chart_cache")
+
+# Fixture file, first tag of the result list and the text closing it
+PAGES = {
+    "mercadolibre.com.ar": ("mercadolibre_ar.html", r"<ol\b[^>]*>", "</ol>"),
+    "mercadolivre.com.br": ("mercadolivre_br.html", r"<ol\b[^>]*>", "</ol>"),
+    "amazon.com": ("amazon_us.html", r'<div class="s-main-slot[^>]*>', "</div>\n</body>"),
+}
+
+
+def full_page(name, start_pattern, end_marker, results=RESULTS_PER_PAGE):
+    """A recorded fixture with its result list repeated until at least `results` products are parsed from it."""
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        html = f.read()
+    start = re.search(start_pattern, html).end()
+    end = html.rindex(end_marker)
+    listing = html[start:end]
+    copies = -(-results // max(1, _count_products(html)))
+    return (html[:start] + listing * copies + html[end:]).encode("utf-8")
+
+
+def _count_products(html):
+    from parsers import iter_amazon_products, iter_mercadolibre_products
+
+    # Only the parser for the page's own marketplace finds anything in it
+    return max(sum(1 for _ in parse([html.encode("utf-8")]))
+               for parse in (iter_mercadolibre_products, iter_amazon_products))
+
+
+class FixtureResponse:
+    """Just enough of requests.Response for the app's fetch paths."""
+
+    status_code = 200
+
+    def __init__(self, content=b"", payload=None):
+        self.content = content
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def json(self):
+        return self._payload
+
+    def close(self):
+        pass
+
+
+class FixtureServer:
+    """Answers the app's HTTP calls with the scaled-up fixtures."""
+
+    def __init__(self):
+        self.pages = {domain: full_page(*spec) for domain, spec in PAGES.items()}
+        self.requests = 0
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        self.requests += 1
+        for domain, page in self.pages.items():
+            if domain in url:
+                return FixtureResponse(page)
+        return FixtureResponse(payload={"venta": "1000.0 ARS"})  # The exchange-rate API
+
+
+def _refuse_connection(*args, **kwargs):
+    raise RuntimeError("The benchmarks must not use the network.")
+
+
+class Suite:
+    """The benchmarks, as (name, setup, run) cases; setup runs untimed before every round."""
+
+    def __init__(self):
+        import http_client
+
+        self.server = FixtureServer()
+        self._stack = ExitStack()
+        self._stack.enter_context(patch.dict(os.environ, APP_ENVIRONMENT))
+        self._stack.enter_context(patch.object(socket.socket, "connect", _refuse_connection))
+        # Calls made while the app is imported, such as its first exchange-rate fetch, get the fixtures too
+        self._stack.enter_context(patch.object(http_client, "get_session", lambda: self.server))
+
+        import app
+        from cache import PriceCache
+        from rates import ExchangeRates
+
+        self.app = app
+        self.client = app.app.test_client()
+        self._stack.enter_context(patch.object(app, "http_get", self.server.get))
+        for name in CACHES:  # Put the app's own caches back when done
+            self._stack.enter_context(patch.object(app, name, getattr(app, name)))
+        # Rates and history of their own, as the app may have been imported before with settings that keep them on disk
+        self._stack.enter_context(patch.object(app, "exchange_rates",
+                                               ExchangeRates(app.fetch_exchange_rate, app.COUNTRY_CONFIG)))
+        self._stack.enter_context(patch.object(app, "price_history", None))
+        self._new_cache = PriceCache
+
+    def close(self):
+        self._stack.close()
+
+    def clear_caches(self):
+        for name in CACHES:
+            setattr(self.app, name, self._new_cache())
+
+    def cases(self):
+        from parsers import iter_amazon_products, iter_mercadolibre_products
+        from stats import compute_stats
+
+        app = self.app
+        ml_page = self.server.pages["mercadolibre.com.ar"]
+        amazon_page = self.server.pages["amazon.com"]
+
+        def chunks(page):
+            return FixtureResponse(page).iter_content(app.STREAM_CHUNK_SIZE)
+
+        app.exchange_rates.refresh_all()  # Fetched once, as a running server would have
+        self.clear_caches()
+        prices, url, failed_pages, _ = app.get_prices("iphone", 3)
+        many_prices = [float(price) * (1 + i / 1000) for i in range(20) for price in prices]
+
+        def plot():
+            app.plot_prices(prices, "iphone", url, failed_pages, number_of_pages=3)
+
+        def show_plot():
+            response = self.client.get("/show_plot?item=iphone&number_of_pages=3")
+            assert response.status_code == 200, response.status_code
+
+        return [
+            ("extract_mercadolibre_page", None, lambda: list(iter_mercadolibre_products(chunks(ml_page)))),
+            ("extract_amazon_page", None, lambda: list(iter_amazon_products(chunks(amazon_page)))),
+            ("get_prices_3_pages", self.clear_caches, lambda: app.get_prices("iphone", 3)),
+            ("get_prices_br_3_pages", self.clear_caches, lambda: app.get_prices("iphone", 3, "br")),
+            ("get_amazon_prices_3_pages", self.clear_caches, lambda: app.get_amazon_prices("headphones", 3)),
+            ("compute_stats_150_prices", None, lambda: compute_stats(prices, threshold=app.OUTLIER_THRESHOLD)),
+            ("compute_stats_3000_prices", None, lambda: compute_stats(many_prices, threshold=app.OUTLIER_THRESHOLD)),
+            ("plot_prices", self.clear_caches, plot),
+            ("show_plot_cold", self.clear_caches, show_plot),
+            ("show_plot_cached", None, show_plot),
+        ]
+
+
+def time_case(setup, run, rounds):
+    """Median, min and max seconds of one `run` over `rounds` rounds, after one untimed warm-up round.
+
+    Without a setup, a round repeats `run` until it lasts at least MIN_ROUND_SECONDS, the way timeit does,
+    so that sub-millisecond cases are not lost in timer noise.
+    """
+    calls = 1
+    if setup is None:
+        while _timed(run, calls) < MIN_ROUND_SECONDS:
+            calls *= 10
+    times = []
+    for i in range(rounds + 1):
+        if setup is not None:
+            setup()
+        elapsed = _timed(run, calls) / calls
+        if i:
+            times.append(elapsed)
+    return {"median": statistics.median(times), "min": min(times), "max": max(times)}
+
+
+def _timed(run, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        run()
+    return time.perf_counter() - started
+
+
+def run_suite(rounds=20, selected=None):
+    """Run the benchmarks whose names contain `selected` (all by default); returns {name: timings}."""
+    suite = Suite()
+    try:
+        return {name: time_case(setup, run, rounds) for name, setup, run in suite.cases()
+                if selected is None or selected in name}
+    finally:
+        suite.close()
+
+
+def regressions(results, baseline, threshold):
+    """Benchmarks whose median is more than `threshold` (a fraction) slower than in `baseline`."""
+    slower = {}
+    for name, timings in results.items():
+        reference = baseline.get("benchmarks", {}).get(name)
+        if reference and timings["median"] > reference * (1 + threshold):
+            slower[name] = (reference, timings["median"])
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", dest="selected", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--save", action="store_true", help="Store the medians as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown over the baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.rounds, args.selected)
+    for name, timings in results.items():
+        print(f"{name:30} median {timings['median'] * 1000:9.3f} ms"
+              f"  min {timings['min'] * 1000:9.3f} ms  max {timings['max'] * 1000:9.3f} ms")
+
+    if not os.path.exists(args.baseline):
+        print("No baseline on this machine yet; these results become it.")
+        args.save = True
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "machine": f"{platform.machine()} {platform.python_implementation()} {platform.python_version()}",
+                "benchmarks": {name: round(timings["median"], 6) for name, timings in results.items()},
+            }, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved the baseline to {args.baseline}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        slower = regressions(results, json.load(f), args.threshold)
+    for name, (reference, median) in slower.items():
+        print(f"REGRESSION {name}: {median * 1000:.3f} ms, baseline {reference * 1000:.3f} ms")
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Measure what importing the app costs a cold start, module by module.
+
+    python benchmarks/import_time.py [--runs 5] [--top 15] [--max-ms 500]
+
+Every run imports the app in a fresh interpreter with `python -X importtime`
+and the median of the runs is reported for each module. The run fails if a
+module that should only load on first use (HEAVY_MODULES) is imported, or if
+the whole import takes longer than --max-ms.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only the scraping and charting paths need these, so `import app` must not load them
+HEAVY_MODULES = ("matplotlib", "numpy", "bs4", "lxml")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| *(\S+)$")
+
+
+def parse_importtime(output):
+    """Map each module in `python -X importtime` output to its (self, cumulative) import time in µs."""
+    modules = {}
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def import_once(module="app"):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def measure(module="app", runs=5):
+    """Median cumulative import time in ms of every module imported by `import module`, over `runs` runs."""
+    samples = {}
+    for _ in range(runs):
+        for name, (_, cumulative_us) in import_once(module).items():
+            samples.setdefault(name, []).append(cumulative_us / 1000)
+    return {name: statistics.median(times) for name, times in samples.items()}
+
+
+def eager_heavy_modules(timings):
+    return sorted({name.split(".")[0] for name in timings} & set(HEAVY_MODULES))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if the whole import takes longer")
+    args = parser.parse_args(argv)
+
+    timings = measure(args.module, args.runs)
+    total = timings[args.module]
+    for name, ms in sorted(timings.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{ms:9.1f} ms  {name}")
+
+    failed = False
+    eager = eager_heavy_modules(timings)
+    if eager:
+        print(f"Imported eagerly, should load on first use: {', '.join(eager)}")
+        failed = True
+    if args.max_ms is not None and total > args.max_ms:
+        print(f"import {args.module} took {total:.1f} ms, over the {args.max_ms:.1f} ms budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""Drive concurrent search flows against a running app and report how it holds up.
+
+    python benchmarks/load_test.py http://127.0.0.1:8000 [--users 20] [--duration 60] [--server-pid PID]
+
+Each simulated user repeats the flow of a browser: it loads the home page,
+submits the search form, follows the redirect to /show_plot and downloads
+the chart image, then starts over with another item. Items are drawn from
+--items distinct names, so fewer items mean more cache hits.
+
+Point the app at benchmarks/stub_server.py (MARKETPLACE_BASE_URL) rather
+than at the real marketplaces. With --server-pid (the gunicorn master),
+the resident memory of the master and of each worker is sampled every
+second, from /proc, so on Linux only.
+
+The report has the flows and requests per second, the latency
+percentiles of each step and of whole flows, the errors, and the peak and
+last memory of each process.
+"""
+import argparse
+import html
+import os
+import random
+import re
+import sys
+import threading
+import time
+from urllib.parse import urljoin
+
+import requests
+
+STEPS = ("index", "submit", "show_plot", "plot", "flow")
+PLOT_URL = re.compile(r'src="(/plot/[^"]+)"')
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank `q`th percentile of already sorted values."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Recorder:
+    """Latencies and errors of every step, from all users."""
+
+    def __init__(self):
+        self.latencies = {step: [] for step in STEPS}
+        self.errors = dict.fromkeys(STEPS, 0)
+        self._lock = threading.Lock()
+
+    def record(self, step, seconds, ok):
+        with self._lock:
+            if ok:
+                self.latencies[step].append(seconds)
+            else:
+                self.errors[step] += 1
+
+
+def run_flow(session, base_url, item, args, recorder):
+    """One user's visit; returns False as soon as a step fails."""
+    flow_started = time.perf_counter()
+
+    def step(name, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=args.timeout, allow_redirects=False, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        recorder.record(name, time.perf_counter() - started, ok)
+        return response if ok else None
+
+    if step("index", "GET", base_url + "/") is None:
+        return False
+    form = {"item": item, "number_of_pages": str(args.pages), "country": args.country, "condition": "all"}
+    response = step("submit", "POST", base_url + "/", data=form)
+    if response is None or "Location" not in response.headers:
+        return False
+    response = step("show_plot", "GET", urljoin(base_url + "/", response.headers["Location"]))
+    if response is None:
+        return False
+    match = PLOT_URL.search(response.text)
+    if match is None or step("plot", "GET", base_url + html.unescape(match.group(1))) is None:
+        return False
+    recorder.record("flow", time.perf_counter() - flow_started, True)
+    return True
+
+
+def user(base_url, items, args, recorder, deadline):
+    with requests.Session() as session:
+        while time.monotonic() < deadline:
+            if not run_flow(session, base_url, random.choice(items), args, recorder):
+                recorder.record("flow", 0.0, False)
+            if args.think_time:
+                time.sleep(args.think_time)
+
+
+def rss_mb(pid):
+    """Resident memory of a process in MB, or None once it has exited."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The parent pid is the second field after the parenthesised command name
+                if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                    children.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return children
+
+
+class MemorySampler(threading.Thread):
+    """Samples the resident memory of a server process and its workers every `interval` seconds."""
+
+    def __init__(self, pid, interval=1.0):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = {}  # pid -> [peak MB, last MB]
+        self._stop_event = threading.Event()
+
+    def sample(self):
+        for pid in [self.pid, *child_pids(self.pid)]:
+            rss = rss_mb(pid)
+            if rss is not None:
+                peak, _ = self.samples.get(pid, (0.0, 0.0))
+                self.samples[pid] = [max(peak, rss), rss]
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.sample()
+
+
+def report(recorder, elapsed, sampler=None):
+    flows = len(recorder.latencies["flow"])
+    requests_made = sum(len(recorder.latencies[step]) + recorder.errors[step] for step in STEPS if step != "flow")
+    lines = [
+        f"{flows} flows in {elapsed:.1f} s ({flows / elapsed:.2f} flows/s), "
+        f"{requests_made} requests ({requests_made / elapsed:.1f} requests/s), "
+        f"{recorder.errors['flow']} failed flows",
+        f"{'step':10} {'ok':>7} {'errors':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}",
+    ]
+    for step in STEPS:
+        latencies = sorted(recorder.latencies[step])
+        cells = [percentile(latencies, q) for q in (50, 90, 99)] + [latencies[-1] if latencies else None]
+        cells = " ".join(f"{value * 1000:9.1f}" if value is not None else f"{'-':>9}" for value in cells)
+        lines.append(f"{step:10} {len(latencies):7} {recorder.errors[step]:7} {cells}")
+    if sampler is not None:
+        lines.append("Resident memory (MB):")
+        for pid, (peak, last) in sorted(sampler.samples.items()):
+            role = "master" if pid == sampler.pid else "worker"
+            lines.append(f"  {role} {pid:>7}  peak {peak:8.1f}  last {last:8.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base_url", help="Where the app is served, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to keep starting flows")
+    parser.add_argument("--items", type=int, default=50, help="Distinct items searched")
+    parser.add_argument("--pages", type=int, default=3, help="Result pages per search")
+    parser.add_argument("--country", default="ar", choices=("ar", "br", "us"))
+    parser.add_argument("--think-time", type=float, default=0, help="Seconds each user waits between flows")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds before a request counts as failed")
+    parser.add_argument("--server-pid", type=int, help="Pid of the server (the gunicorn master) to sample memory of")
+    args = parser.parse_args(argv)
+
+    base_url = args.base_url.rstrip("/")
+    items = [f"item{i}" for i in range(args.items)]
+    recorder = Recorder()
+    sampler = MemorySampler(args.server_pid) if args.server_pid else None
+    if sampler is not None:
+        sampler.start()
+
+    started = time.monotonic()
+    deadline = started + args.duration
+    users = [threading.Thread(target=user, args=(base_url, items, args, recorder, deadline))
+             for _ in range(args.users)]
+    for thread in users:
+        thread.start()
+    for thread in users:
+        thread.join()
+    elapsed = time.monotonic() - started
+    if sampler is not None:
+        sampler.stop()
+
+    print(report(recorder, elapsed, sampler))
+    return 1 if not recorder.latencies["flow"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""Local stand-in for the marketplaces and the exchange-rate API, for load tests.
+
+    python benchmarks/stub_server.py [--port 8900] [--latency 300] [--jitter 100] [--error-rate 0.02]
+
+Start the app with MARKETPLACE_BASE_URL=http://127.0.0.1:8900 and every
+request it would send to listado.mercadolibre.com.ar, listado.mercadolivre.com.br
+or www.amazon.com arrives here as /<host>/<path> instead, and is answered
+with that marketplace's recorded fixture page, scaled up to a full page of
+results (the same pages as benchmarks/bench.py) whatever the search. /blue
+answers like the dollar-rate API.
+
+Each response waits --latency milliseconds, give or take up to --jitter,
+and --error-rate of them are 503s, which the app retries like real
+upstream failures.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from bench import PAGES, full_page
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real sites, so the app's connection pools are exercised
+
+    def do_GET(self):
+        server = self.server
+        server.delay()
+        if random.random() < server.error_rate:
+            return self.respond(503, b"Service Unavailable", "text/plain")
+
+        path = urlsplit(self.path).path
+        if path == "/blue":
+            body = json.dumps({"venta": f"{server.usd_rate} ARS"}).encode()
+            return self.respond(200, body, "application/json")
+        host = path.lstrip("/").split("/", 1)[0]
+        page = server.pages.get(host.removeprefix("listado.").removeprefix("www."))
+        if page is None:
+            return self.respond(404, b"Not Found", "text/plain")
+        self.respond(200, page, "text/html; charset=utf-8")
+
+    def respond(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, error_rate=0.0, usd_rate=1000.0, verbose=False):
+        super().__init__(address, StubHandler)
+        self.pages = {domain: full_page(*spec) for domain, spec in PAGES.items()}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.usd_rate = usd_rate
+        self.verbose = verbose
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def delay(self):
+        seconds = self.latency + random.uniform(-self.jitter, self.jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0, help="Milliseconds before each response")
+    parser.add_argument("--jitter", type=float, default=0, help="Up to this many milliseconds more or less")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of responses that are 503s")
+    parser.add_argument("--usd-rate", type=float, default=1000.0, help="ARS per dollar served on /blue")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args(argv)
+
+    server = StubServer((args.host, args.port), args.latency / 1000, args.jitter / 1000, args.error_rate,
+                        args.usd_rate, args.verbose)
+    print(f"Serving the marketplaces on {server.base_url}; start the app with MARKETPLACE_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,380 @@
+"""Bounded, TTL-aware cache for scraped search results and rendered charts.
+
+Each worker keeps a local LRU tier; an optional shared backend (SQLite on disk
+or a Redis-compatible server) lets every worker on a host reuse each other's
+results.
+"""
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from products import ProductTable
+from sqlite_connections import ThreadLocalConnection
+from stats import SketchStats
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_size(value, _seen=None):
+    """Roughly estimate the memory used by `value` in bytes, including its contents.
+
+    Objects referenced more than once, such as a search's price array which is
+    also its products' price column, are only counted once.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    size = sys.getsizeof(value)
+    for name in getattr(type(value), "__slots__", ()):
+        size += estimate_size(getattr(value, name), _seen)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(v, _seen) for v in value)
+    return size
+
+
+def _encode_products(products, **fields):
+    payload = dict(fields, **products.to_columns())
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+
+def _decode_products(payload):
+    return ProductTable(payload["prices"], payload["titles"], payload["urls"])
+
+
+def encode_search_result(result):
+    """Serialize a (prices, url, failed_pages, products) search result as compressed columnar JSON."""
+    prices, url, failed_pages, products = result
+    if isinstance(prices, SketchStats):
+        # A large scan's statistics cover more prices than its sampled products hold
+        return _encode_products(products, url=url, failed_pages=failed_pages, stats=prices.to_state())
+    # The prices are the products' own price column, so they are stored only once
+    return _encode_products(products, url=url, failed_pages=failed_pages)
+
+
+def decode_search_result(data):
+    """Inverse of encode_search_result."""
+    payload = json.loads(zlib.decompress(data))
+    products = _decode_products(payload)
+    prices = SketchStats.from_state(payload["stats"]) if "stats" in payload else products.prices
+    return prices, payload["url"], payload["failed_pages"], products
+
+
+class PageCodec:
+    """Codec for the ProductTable parsed from a single result page."""
+
+    @staticmethod
+    def dumps(products):
+        return _encode_products(products)
+
+    @staticmethod
+    def loads(data):
+        return _decode_products(json.loads(zlib.decompress(data)))
+
+
+class BytesCodec:
+    """Codec for raw bytes such as rendered PNG charts, which are already compressed."""
+
+    @staticmethod
+    def dumps(value):
+        return bytes(value)
+
+    @staticmethod
+    def loads(data):
+        return bytes(data)
+
+
+class SearchResultCodec:
+    dumps = staticmethod(encode_search_result)
+    loads = staticmethod(decode_search_result)
+
+
+class SQLiteBackend:
+    """Shared on-disk backend; every worker process on the host opens the same file."""
+
+    PURGE_EVERY = 100  # Writes between sweeps of expired rows
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = ThreadLocalConnection(path)
+        self._writes = itertools.count(1)  # next() on a count is atomic, unlike += across threads
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, sqlite3.Binary(value), time.time() + ttl),
+            )
+            if next(self._writes) % self.PURGE_EVERY == 0:
+                connection.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def delete(self, key):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+
+class RedisBackend:
+    """Backend for any client exposing the Redis get/set(ex=)/delete commands."""
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis package is required for CACHE_BACKEND=redis.")
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl):
+        self.client.set(key, value, ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+
+def create_backend(name=None):
+    """Build the shared backend selected by CACHE_BACKEND, or None for worker-local caching only."""
+    name = (name or os.getenv("CACHE_BACKEND", "memory")).lower()
+    if name == "memory":
+        return None
+    if name == "sqlite":
+        return SQLiteBackend(os.getenv("CACHE_SQLITE_PATH", "/tmp/mercadix-cache.sqlite3"))
+    if name == "redis":
+        return RedisBackend.from_url(os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    raise ValueError(f"Unknown cache backend: {name}")
+
+
+# Shared entries start with the wall-clock time they were stored and the length of their country code
+_SHARED_HEADER = struct.Struct("!dH")
+
+
+class _Entry:
+    __slots__ = ("value", "size", "country_code", "stored_at")
+
+    def __init__(self, value, size, country_code, stored_at):
+        self.value = value
+        self.size = size
+        self.country_code = country_code
+        self.stored_at = stored_at
+
+
+class PriceCache:
+    """LRU cache with a max entry count, a byte budget and per-country TTLs.
+
+    Entries older than their country's TTL are still served for up to
+    `stale_ttl` more seconds while a refresh runs in the background
+    (stale-while-revalidate); past that they count as a miss.
+
+    When a shared `backend` is given, local misses fall through to it and
+    every `set` is written through, serialized with `codec`.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, ttls=None, default_ttl=1800,
+                 stale_ttl=600, clock=time.monotonic, backend=None, codec=SearchResultCodec, namespace="prices"):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self.backend = backend
+        self.codec = codec
+        self.namespace = namespace
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._refreshing = set()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def ttl_for(self, country_code):
+        return self.ttls.get(country_code, self.default_ttl)
+
+    def get(self, key, refresh=None):
+        """Return the cached value for `key`, or None on a miss.
+
+        If the entry is stale but still within the grace period, it is returned
+        and `refresh` (when given) is run in a background thread; `refresh` is
+        responsible for storing the new value with `set`.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None and self.backend is not None:
+            entry = self._load_shared(key)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+
+            age = self.clock() - entry.stored_at
+            ttl = self.ttl_for(entry.country_code)
+            # A shared entry may not have been stored locally (too large), or another thread may have evicted it
+            tracked = self._entries.get(key) is entry
+            if age <= ttl:
+                if tracked:
+                    self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+
+            if age > ttl + self.stale_ttl or refresh is None:
+                if tracked:
+                    self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            if tracked:
+                self._entries.move_to_end(key)
+            self.stale_hits += 1
+            start_refresh = key not in self._refreshing
+            if start_refresh:
+                self._refreshing.add(key)
+
+        if start_refresh:
+            threading.Thread(target=self._run_refresh, args=(key, refresh), daemon=True).start()
+        return entry.value
+
+    def fresh_for(self, key):
+        """Seconds until the entry for `key` goes stale (negative once it has), or None if it is not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None and self.backend is not None:
+            entry = self._load_shared(key)
+        if entry is None:
+            return None
+        return entry.stored_at + self.ttl_for(entry.country_code) - self.clock()
+
+    def set(self, key, value, country_code=None):
+        """Store `value`, evicting least recently used entries to stay within budget."""
+        self._store_local(key, _Entry(value, estimate_size(value), country_code, self.clock()))
+        if self.backend is not None:
+            ttl = self.ttl_for(country_code) + self.stale_ttl
+            try:
+                code = (country_code or "").encode("ascii")
+                data = _SHARED_HEADER.pack(time.time(), len(code)) + code + self.codec.dumps(value)
+                self.backend.set(self._shared_key(key), data, ttl)
+            except Exception as e:
+                logger.error(f"Failed to write {key!r} to the shared cache: {e}")
+
+    def delete(self, key):
+        """Drop the entry for `key`, from the shared tier too."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+        if self.backend is not None:
+            try:
+                self.backend.delete(self._shared_key(key))
+            except Exception as e:
+                logger.error(f"Failed to delete {key!r} from the shared cache: {e}")
+
+    def _store_local(self, key, entry):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if entry.size > self.max_bytes:
+                # Never let a single oversized result flush the whole cache
+                logger.info(f"Not caching {key!r}: {entry.size} bytes exceeds the cache budget.")
+                return
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _shared_key(self, key):
+        return f"{self.namespace}:{json.dumps(key, separators=(',', ':'))}"
+
+    def _load_shared(self, key):
+        """Fetch `key` from the shared backend into the local tier, keeping its original age."""
+        try:
+            data = self.backend.get(self._shared_key(key))
+            if data is None:
+                return None
+            stored_at, code_length = _SHARED_HEADER.unpack_from(data)
+            offset = _SHARED_HEADER.size + code_length
+            country_code = data[_SHARED_HEADER.size:offset].decode("ascii") or None
+            value = self.codec.loads(data[offset:])
+        except Exception as e:
+            logger.error(f"Failed to read {key!r} from the shared cache: {e}")
+            return None
+
+        age = max(0.0, time.time() - stored_at)
+        entry = _Entry(value, estimate_size(value), country_code, self.clock() - age)
+        self._store_local(key, entry)
+        with self._lock:
+            self.shared_hits += 1
+        return entry
+
+    def _run_refresh(self, key, refresh):
+        try:
+            refresh()
+        except Exception as e:
+            logger.error(f"Background refresh of {key!r} failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return the cache counters and current size."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "shared_hits": self.shared_hits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
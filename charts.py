@@ -0,0 +1,157 @@
+"""Histogram rendering on matplotlib's object-oriented Figure/Agg API.
+
+Nothing here touches pyplot's global state. Each thread owns a template
+figure whose axes, formatters and labels are set up once and reused for every
+chart it renders, so charts can be rendered concurrently from several threads.
+
+matplotlib is only imported when the first chart is rendered. Its font cache
+can be built ahead of time with prewarm_font_cache() and shipped in
+CHART_FONT_CACHE, so that first chart does not have to scan the fonts.
+"""
+import glob
+import io
+import os
+import shutil
+import sys
+import threading
+
+# "png", "png8" (256-colour palette PNG, several times smaller) or "svg"
+CHART_FORMAT = os.getenv("CHART_FORMAT", "png")
+CHART_DPI = int(os.getenv("CHART_DPI", "100"))
+
+# Directory with a font cache built by prewarm_font_cache(), copied into MPLCONFIGDIR before matplotlib loads
+CHART_FONT_CACHE = os.getenv("CHART_FONT_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".matplotlib"))
+
+MIMETYPES = {
+    "png": "image/png",
+    "png8": "image/png",
+    "svg": "image/svg+xml",
+}
+EXTENSIONS = {
+    "png": "png",
+    "png8": "png",
+    "svg": "svg",
+}
+
+
+def format_x(value, tick_number):
+    """Format the x-axis values."""
+    return f"{int(value):,}"
+
+
+_font_cache_lock = threading.Lock()
+
+
+def _seed_font_cache():
+    """Copy the prewarmed font cache into matplotlib's config directory, unless matplotlib is already loaded."""
+    with _font_cache_lock:
+        if "matplotlib" in sys.modules or not os.path.isdir(CHART_FONT_CACHE):
+            return
+        config_dir = os.environ.get("MPLCONFIGDIR")
+        if not config_dir or os.path.abspath(config_dir) == os.path.abspath(CHART_FONT_CACHE):
+            return
+        try:
+            os.makedirs(config_dir, exist_ok=True)
+            for path in glob.glob(os.path.join(CHART_FONT_CACHE, "fontlist-*.json")):
+                target = os.path.join(config_dir, os.path.basename(path))
+                if not os.path.exists(target):
+                    shutil.copyfile(path, target)
+        except OSError:
+            pass  # matplotlib builds the cache itself, only slower
+
+
+def prewarm_font_cache(directory=CHART_FONT_CACHE):
+    """Build matplotlib's font cache in `directory` and render a chart, e.g. while building a deployment.
+
+    Must run in a process that has not imported matplotlib yet.
+    """
+    if "matplotlib" in sys.modules:
+        raise RuntimeError("matplotlib is already imported, so its font cache location cannot change.")
+    os.makedirs(directory, exist_ok=True)
+    os.environ["MPLCONFIGDIR"] = directory
+    render_histogram([1, 2, 1], [0, 1, 2, 3], "Mercadix", "Price", [(1.5, "red", "Median", "Median", "--", 1)])
+    return glob.glob(os.path.join(directory, "fontlist-*.json"))
+
+
+class _ChartTemplate:
+    """A pre-configured figure that is cleared and redrawn for each chart."""
+
+    def __init__(self):
+        _seed_font_cache()
+        from matplotlib import ticker
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.figure = Figure(figsize=(10, 5), dpi=CHART_DPI)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        self.ax.ticklabel_format(style="plain", axis="x")
+        self.ax.xaxis.set_major_formatter(ticker.FuncFormatter(format_x))
+        self.ax.set_ylabel("Frequency")
+        self.ax.grid(True)
+
+    def reset(self):
+        """Remove everything drawn by the previous chart, keeping the axes setup."""
+        for artist in [*self.ax.patches, *self.ax.lines, *self.ax.texts, *self.figure.texts]:
+            artist.remove()
+        self.ax.containers.clear()
+        legend = self.ax.get_legend()
+        if legend is not None:
+            legend.remove()
+        self.ax.relim()
+        self.ax.set_autoscale_on(True)
+
+
+_templates = threading.local()
+
+
+def _template():
+    template = getattr(_templates, "chart", None)
+    if template is None:
+        template = _templates.chart = _ChartTemplate()
+    return template
+
+
+def render_histogram(counts, edges, title, xlabel, stat_lines, label_offset=0, footnote=None, fmt=None):
+    """Render a price histogram from precomputed bin `counts`/`edges` and return the encoded image bytes.
+
+    `stat_lines` is a list of (value, color, label, text, linestyle, linewidth)
+    tuples drawn as vertical lines with rotated `text` next to them and
+    `label` in the legend; `footnote` is written in red in the bottom right.
+    """
+    fmt = fmt or CHART_FORMAT
+    template = _template()
+    template.reset()
+    figure, ax = template.figure, template.ax
+
+    ax.hist(edges[:-1], bins=edges, weights=counts, color="lightblue", edgecolor="black")
+    ax.set_xlabel(xlabel)
+    ax.set_title(title)
+
+    y_position = ax.get_ylim()[1] * 0.05
+    handles = []
+    for value, color, label, text, linestyle, linewidth in stat_lines:
+        handles.append(ax.axvline(value, color=color, linestyle=linestyle, linewidth=linewidth))
+        ax.text(value + label_offset, y_position, text, rotation=90, color=color)
+    ax.legend(handles, [line[2] for line in stat_lines], loc="upper right")
+
+    if footnote:
+        figure.text(0.99, 0.01, footnote, horizontalalignment='right', fontsize=8, color='red')
+
+    figure.tight_layout()
+    buffer = io.BytesIO()
+    if fmt == "svg":
+        figure.savefig(buffer, format="svg")
+    elif fmt == "png8":
+        template.canvas.draw()
+        _save_palette_png(template.canvas.buffer_rgba(), buffer)
+    else:
+        figure.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def _save_palette_png(rgba, buffer):
+    from PIL import Image
+
+    image = Image.frombuffer("RGBA", (rgba.shape[1], rgba.shape[0]), rgba, "raw", "RGBA", 0, 1)
+    image.convert("RGB").quantize(colors=256).save(buffer, format="png", optimize=True)
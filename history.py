@@ -0,0 +1,119 @@
+"""Append-only history of scraped searches, for price trends without re-scraping.
+
+Every fresh scrape adds one row of summary statistics and the prices of its
+products to a SQLite file; rows are never updated or deleted. Range queries
+by item, country and time use an index, so a month of history is read in
+milliseconds.
+"""
+import logging
+import sqlite3
+import time
+
+from products import ProductTable
+from sqlite_connections import ThreadLocalConnection
+
+logger = logging.getLogger(__name__)
+
+# Summary columns of each recorded search, in the order they are stored and returned
+STAT_COLUMNS = ("count", "mean", "median", "std", "min", "max", "p25", "exchange_rate")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    id INTEGER PRIMARY KEY,
+    item TEXT NOT NULL,
+    country TEXT NOT NULL,
+    condition TEXT NOT NULL,
+    number_of_pages INTEGER NOT NULL,
+    recorded_at REAL NOT NULL,
+    count INTEGER NOT NULL,
+    mean REAL,
+    median REAL,
+    std REAL,
+    min REAL,
+    max REAL,
+    p25 REAL,
+    exchange_rate REAL
+);
+CREATE INDEX IF NOT EXISTS searches_by_item ON searches (item, country, recorded_at);
+CREATE TABLE IF NOT EXISTS products (
+    search_id INTEGER NOT NULL REFERENCES searches (id),
+    price REAL NOT NULL,
+    title TEXT,
+    url TEXT
+);
+CREATE INDEX IF NOT EXISTS products_by_search ON products (search_id);
+"""
+
+
+def normalize_item(item):
+    """Searches that differ only in case or surrounding spaces share a history."""
+    return " ".join(item.split()).lower()
+
+
+class PriceHistory:
+    """SQLite store of search summaries and product prices; every worker process may open the same file."""
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self._clock = clock
+        self._connection = ThreadLocalConnection(path)
+        with self._connection() as connection:
+            connection.executescript(_SCHEMA)
+
+    def record(self, item, number_of_pages, country_code, condition, stats, products, exchange_rate=None):
+        """Append a scraped search: its PriceStats, its ProductTable and the exchange rate used.
+
+        Returns the id of the new row, or None if it could not be written;
+        losing a history row never fails the search that produced it.
+        """
+        row = (
+            normalize_item(item), country_code, condition, number_of_pages, self._clock(),
+            stats.count, stats.mean, stats.median, stats.std, stats.min, stats.max, stats.percentile(25),
+            exchange_rate,
+        )
+        try:
+            with self._connection() as connection:
+                search_id = connection.execute(
+                    "INSERT INTO searches (item, country, condition, number_of_pages, recorded_at, "
+                    + ", ".join(STAT_COLUMNS) + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    row,
+                ).lastrowid
+                connection.executemany(
+                    "INSERT INTO products (search_id, price, title, url) VALUES (?, ?, ?, ?)",
+                    ((search_id, price, title, url)
+                     for price, title, url in zip(products.prices.tolist(), products.titles, products.urls)),
+                )
+            return search_id
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to record price history of {item!r}: {e}")
+            return None
+
+    def series(self, item, country_code, condition=None, number_of_pages=None, since=None, until=None):
+        """Recorded summaries of a search, oldest first, as dicts.
+
+        Only searches recorded at or after `since` and before `until` (Unix
+        times) are returned; `condition` and `number_of_pages` filter too when given.
+        """
+        query = ("SELECT id, recorded_at, condition, number_of_pages, " + ", ".join(STAT_COLUMNS)
+                 + " FROM searches WHERE item = ? AND country = ?")
+        params = [normalize_item(item), country_code]
+        for clause, value in (("condition = ?", condition), ("number_of_pages = ?", number_of_pages),
+                              ("recorded_at >= ?", since), ("recorded_at < ?", until)):
+            if value is not None:
+                query += f" AND {clause}"
+                params.append(value)
+        query += " ORDER BY recorded_at"
+
+        names = ("id", "recorded_at", "condition", "number_of_pages") + STAT_COLUMNS
+        rows = self._connection().execute(query, params).fetchall()
+        return [dict(zip(names, row)) for row in rows]
+
+    def products(self, search_id):
+        """The products recorded with a search, or None if there is no such search."""
+        connection = self._connection()
+        if connection.execute("SELECT 1 FROM searches WHERE id = ?", (search_id,)).fetchone() is None:
+            return None
+        rows = connection.execute(
+            "SELECT price, title, url FROM products WHERE search_id = ? ORDER BY rowid", (search_id,)
+        ).fetchall()
+        return ProductTable([row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows])
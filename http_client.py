@@ -0,0 +1,191 @@
+"""Shared HTTP session used for every outbound scraping and exchange-rate call."""
+import os
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Timeouts in seconds: (time to establish the connection, time between bytes of the response)
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+
+# Retries for connection errors and 429/5xx responses, with exponential backoff between attempts
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Keep-alive connections kept per host, which is also the number of concurrent requests allowed per host
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "4"))
+
+# Window over which recent_request_count() counts upstream requests, in seconds
+REQUEST_WINDOW = 60
+
+_session = None
+_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()  # Event loop -> its shared httpx.AsyncClient
+_request_times = deque()
+_status_counts = Counter()  # (host, status code or "error") -> responses
+
+
+class _CountedRetry(Retry):
+    """Retry that counts every attempt it makes again as an upstream request, for recent_request_count()."""
+
+    def increment(self, *args, **kwargs):
+        retry = super().increment(*args, **kwargs)  # Raises instead once the retries are used up
+        _record_request()
+        return retry
+
+
+def _build_session():
+    retry = _CountedRetry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # Hand the last response back so callers see it in raise_for_status()
+    )
+    # urllib3 keeps a separate keep-alive pool per host behind a single adapter. With pool_block, a request
+    # waits for one of the host's connections, which a streamed response holds until its body is read, so
+    # this also caps the concurrent downloads per host
+    adapter = HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=MAX_CONNECTIONS_PER_HOST,
+        pool_block=True,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """Return the process-wide session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def _record_request():
+    now = time.monotonic()
+    with _lock:
+        _request_times.append(now)
+        while _request_times[0] < now - REQUEST_WINDOW:
+            _request_times.popleft()
+
+
+def recent_request_count():
+    """Number of upstream requests started by this process in the last REQUEST_WINDOW seconds."""
+    cutoff = time.monotonic() - REQUEST_WINDOW
+    with _lock:
+        while _request_times and _request_times[0] < cutoff:
+            _request_times.popleft()
+        return len(_request_times)
+
+
+def _record_status(host, status):
+    with _lock:
+        _status_counts[host, status] += 1
+
+
+def status_counts():
+    """Upstream responses received by this process so far, keyed by (host, status code or "error")."""
+    with _lock:
+        return dict(_status_counts)
+
+
+def http_get(url, headers=None, timeout=None, stream=False):
+    """GET `url` through the shared session.
+
+    Connections are reused across calls, downloads from the same host are
+    capped at MAX_CONNECTIONS_PER_HOST, and 429/5xx responses are retried with
+    backoff; every attempt counts in recent_request_count().
+    With `stream=True` the body is left unread so it can be consumed with
+    `iter_content`; the caller must close the response.
+    """
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    _record_request()
+    host = urlsplit(url).hostname
+    try:
+        response = get_session().get(url, headers=headers, timeout=timeout, stream=stream)
+    except requests.exceptions.RequestException:
+        _record_status(host, "error")
+        raise
+    _record_status(host, response.status_code)
+    return response
+
+
+def async_client():
+    """Create an httpx.AsyncClient with the same timeouts and per-host connection cap as the shared session.
+
+    Requires the httpx package. Use it as `async with async_client() as client:`
+    so its connections are closed with the event loop that opened them, or
+    shared_async_client() to reuse one for the life of the loop.
+    """
+    try:
+        import httpx
+    except ImportError:
+        raise RuntimeError("The httpx package is required for SERVING_MODE=async.")
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=MAX_CONNECTIONS_PER_HOST, max_keepalive_connections=MAX_CONNECTIONS_PER_HOST),
+        transport=httpx.AsyncHTTPTransport(retries=MAX_RETRIES),  # Connection failures only
+        follow_redirects=True,
+    )
+
+
+def shared_async_client():
+    """The async_client() of the running event loop, opened on first use and kept open while the loop lives.
+
+    Like the shared session, it keeps connections alive between requests, so
+    it is meant for a long-lived loop such as the one the async views run on.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        # Only this loop's own thread gets here, so there is no race to create it
+        client = _async_clients[loop] = async_client()
+    return client
+
+
+async def async_http_get(client, url, headers=None):
+    """GET `url` with an async_client(), returning the response with its body read.
+
+    429/5xx responses are retried with the same backoff as http_get. Failed
+    requests and 4xx/5xx responses raise requests' RequestException
+    subclasses, so callers handle both clients alike.
+    """
+    import asyncio
+    import httpx
+
+    host = urlsplit(url).hostname
+    for attempt in range(MAX_RETRIES + 1):
+        _record_request()
+        try:
+            response = await client.get(url, headers=headers)
+        except httpx.TimeoutException as e:
+            _record_status(host, "error")
+            raise requests.exceptions.Timeout(str(e))
+        except httpx.HTTPError as e:
+            _record_status(host, "error")
+            raise requests.exceptions.ConnectionError(str(e))
+        if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            break
+        await asyncio.sleep(BACKOFF_FACTOR * 2 ** attempt)
+
+    _record_status(host, response.status_code)
+    if response.is_error:
+        raise requests.exceptions.HTTPError(f"{response.status_code} Error for url: {url}")
+    return response
@@ -0,0 +1,109 @@
+"""Background jobs for searches that take longer than a request should wait.
+
+Jobs run on a small in-process thread pool and their status is kept in
+memory for polling, so a job is only visible to the worker process that
+accepted it. Their results are also stored wherever the job's function puts
+them (the price cache for searches), so finished work outlives the job.
+"""
+import contextvars
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_current_job = contextvars.ContextVar("current_job", default=None)
+
+
+def report_progress(pages_done, pages_total):
+    """Record how many result pages the job running in this thread has read, if there is one."""
+    job = _current_job.get()
+    if job is not None:
+        job.pages_done = pages_done
+        job.pages_total = pages_total
+
+
+class Job:
+    """Status of one background job: queued, running, done or failed."""
+
+    def __init__(self, key):
+        self.id = secrets.token_urlsafe(9)
+        self.key = key
+        self.status = "queued"
+        self.pages_done = 0
+        self.pages_total = None
+        self.result = None
+        self.error = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def to_dict(self):
+        status = {
+            "id": self.id,
+            "status": self.status,
+            "pages_done": self.pages_done,
+            "pages_total": self.pages_total,
+        }
+        if self.status == "done":
+            status["result"] = self.result
+        elif self.status == "failed":
+            status["error"] = self.error
+        return status
+
+
+class JobQueue:
+    """Run jobs on a bounded thread pool and keep their status for `ttl` seconds after they finish.
+
+    Submitting a job for a key that is already queued or running returns the
+    existing job instead of starting another.
+    """
+
+    def __init__(self, max_workers=2, ttl=600, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active = {}  # key -> job not finished yet
+
+    def submit(self, key, fn, *args):
+        with self._lock:
+            self._purge()
+            job = self._active.get(key)
+            if job is not None:
+                return job
+            job = Job(key)
+            self._jobs[job.id] = self._active[key] = job
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._purge()
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn, args):
+        token = _current_job.set(job)
+        job.status = "running"
+        try:
+            result, error, status = fn(*args), None, "done"
+        except Exception as e:
+            result, error, status = None, str(e), "failed"
+        finally:
+            _current_job.reset(token)
+        job.result, job.error, job.finished_at = result, error, self._clock()
+        job.status = status  # Last, so pollers never see a finished job without its result
+        with self._lock:
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+
+    def _purge(self):
+        cutoff = self._clock() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._jobs)
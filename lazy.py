@@ -0,0 +1,27 @@
+"""Defer importing heavy dependencies until they are first used.
+
+Serverless cold starts import app.py for every new instance, including the
+ones that only serve the home page or static files, so modules that only the
+scraping and charting paths need are loaded on first use instead.
+"""
+import importlib
+import importlib.util
+import types
+
+
+class _LazyModule(types.ModuleType):
+    """Stand-in for a module that imports it when one of its attributes is first read."""
+
+    def __getattr__(self, attr):
+        # The import system's per-module lock makes concurrent first uses wait for one complete import
+        module = importlib.import_module(self.__name__)
+        # Later lookups find the module's attributes directly, without coming back here
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name):
+    """Return module `name`, which is only imported when one of its attributes is first accessed."""
+    if importlib.util.find_spec(name) is None:
+        raise ImportError(f"No module named {name!r}", name=name)
+    return _LazyModule(name)
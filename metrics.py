@@ -0,0 +1,194 @@
+"""Latency histograms and counters, exposed in the Prometheus text format.
+
+Stages of a request are timed with `with registry.stage("chart"):`; each
+timing goes into the stage histogram and, when the stage runs on the thread
+serving the request, into that request's Server-Timing header. Values other
+modules already count (cache hits, upstream status codes...) are read by
+collectors only when /metrics is scraped.
+
+A disabled registry hands out a shared no-op timer and ignores every
+observation, so instrumentation costs next to nothing when it is off.
+"""
+import contextvars
+import math
+import threading
+import time
+from contextlib import nullcontext
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds of the latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NOOP = nullcontext()
+
+# Stage durations (name -> seconds) of the request being served in this context, or None outside a request
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = [*zip(labelnames, labelvalues), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """A monotonically increasing count per combination of label values."""
+
+    type = "counter"
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labelvalues, value in sorted(values.items()):
+            yield self.name + _format_labels(self.labelnames, labelvalues), value
+
+
+class Histogram:
+    """Counts of observations at or below each bucket bound, plus their sum, per combination of label values."""
+
+    type = "histogram"
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            snapshot = {labelvalues: list(series) for labelvalues, series in self._series.items()}
+        for labelvalues, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, labelvalues, [("le", _format_value(bound))])
+                yield f"{self.name}_bucket{labels}", cumulative
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}_sum{labels}", series[-1]
+            yield f"{self.name}_count{labels}", cumulative
+
+
+class _StageTimer:
+    __slots__ = ("registry", "stage", "started")
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        self.registry.stage_seconds.observe(elapsed, self.stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[self.stage] = timings.get(self.stage, 0.0) + elapsed
+        return False
+
+
+class Registry:
+    """The metrics of one process, rendered together for /metrics."""
+
+    def __init__(self, enabled=False, prefix="mercadix"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._metrics = []
+        self._collectors = []
+        self.stage_seconds = self.histogram("stage_seconds", "Time spent in each stage of a request.", ["stage"])
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(self, f"{self.prefix}_{name}", help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(self, f"{self.prefix}_{name}", help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, name, type, help, labelnames, collect):
+        """Report values counted elsewhere: `collect()` returns (label values, value) pairs when /metrics is read."""
+        self._collectors.append((f"{self.prefix}_{name}", type, help, tuple(labelnames), collect))
+
+    def stage(self, name):
+        """Context manager timing one stage of the current request."""
+        if not self.enabled:
+            return _NOOP
+        return _StageTimer(self, name)
+
+    def start_request(self):
+        """Collect the stages timed from here on in this context for server_timing(); returns a reset token."""
+        if not self.enabled:
+            return None
+        return _request_timings.set({})
+
+    def end_request(self, token):
+        if token is not None:
+            _request_timings.reset(token)
+
+    def server_timing(self):
+        """Server-Timing header value for the stages of the current request, or None if there are none."""
+        timings = _request_timings.get()
+        if not timings:
+            return None
+        return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(f"{name} {_format_value(value)}" for name, value in metric.samples())
+        for name, type, help, labelnames, collect in self._collectors:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type}")
+            for labelvalues, value in sorted(collect()):
+                lines.append(f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
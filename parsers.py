@@ -0,0 +1,246 @@
+"""Extract products from MercadoLibre/MercadoLivre and Amazon result pages.
+
+The extraction logic is written once against a tiny node API, and the HTML
+parser behind it is pluggable (HTML_PARSER):
+
+- "html.parser": BeautifulSoup over the whole document.
+- "strainer": BeautifulSoup restricted with a SoupStrainer so only the result
+  containers are ever turned into tags (default).
+- "lxml": lxml with precompiled XPath queries (requires the lxml package).
+  Pages are parsed incrementally as chunks of the body arrive, and everything
+  outside the result containers is discarded as soon as it has been parsed.
+
+Products are yielded one by one as their containers are parsed.
+"""
+import logging
+import os
+import re
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+HTML_PARSER = os.getenv("HTML_PARSER", "strainer")
+
+
+def _has_class(class_name):
+    """SoupStrainer matcher for multi-valued class attributes, which it sees unsplit while parsing."""
+    def match(value):
+        if not value:
+            return False
+        classes = value.split() if isinstance(value, str) else value
+        return class_name in classes
+    return match
+
+
+class SoupBackend:
+    def __init__(self, strain=False):
+        self.strain = strain
+
+    def iter_containers(self, chunks, container_class, exclude_class=None):
+        # BeautifulSoup cannot parse incrementally, so the body is buffered first
+        return self.containers(b"".join(chunks), container_class, exclude_class)
+
+    def containers(self, content, container_class, exclude_class=None):
+        from bs4 import BeautifulSoup, SoupStrainer  # Imported on first use to keep cold starts fast
+
+        parse_only = SoupStrainer(class_=_has_class(container_class)) if self.strain else None
+        soup = BeautifulSoup(content, "html.parser", parse_only=parse_only)
+        selector = f".{container_class}"
+        if exclude_class:
+            selector += f":not(.{exclude_class})"
+        return soup.select(selector)
+
+    @staticmethod
+    def select_one(node, selector):
+        return node.select_one(selector)
+
+    @staticmethod
+    def text(node):
+        return node.text
+
+    @staticmethod
+    def attr(node, name):
+        return node.get(name)
+
+
+def _class_test(class_name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+@lru_cache(maxsize=None)
+def _compile_xpath(selector):
+    """Compile a descendant-only CSS selector such as "h2 .a-link-normal" into an XPath query."""
+    from lxml import etree
+
+    steps = []
+    for part in selector.split():
+        if part.startswith("."):
+            steps.append(f"//*[{_class_test(part[1:])}]")
+        else:
+            steps.append(f"//{part}")
+    return etree.XPath("." + "".join(steps))
+
+
+class LxmlBackend:
+    def __init__(self):
+        try:
+            from lxml import etree
+        except ImportError:
+            raise RuntimeError("The lxml package is required for HTML_PARSER=lxml.")
+        self._etree = etree
+        self._string = etree.XPath("string()")
+
+    def iter_containers(self, chunks, container_class, exclude_class=None):
+        """Yield result containers in document order while the page is still being fed in."""
+        parser = self._etree.HTMLPullParser(events=("start", "end"))
+        depth = 0  # Result containers open around the current element
+
+        def is_container(elem):
+            classes = (elem.get("class") or "").split()
+            return container_class in classes and exclude_class not in classes
+
+        def read_events():
+            nonlocal depth
+            for event, elem in parser.read_events():
+                if not isinstance(elem.tag, str):
+                    continue  # Comments and processing instructions
+                if event == "start":
+                    depth += is_container(elem)
+                    continue
+                if is_container(elem):
+                    depth -= 1
+                    if depth == 0:
+                        # Outermost container finished: yield it and any nested ones in document order
+                        yield from (node for node in elem.iter() if isinstance(node.tag, str) and is_container(node))
+                if depth == 0:
+                    # Already extracted or outside every container, so free it and its finished siblings
+                    elem.clear(keep_tail=True)
+                    while elem.getprevious() is not None:
+                        del elem.getparent()[0]
+
+        fed = False
+        for chunk in chunks:
+            if chunk:
+                fed = True
+                parser.feed(chunk)
+                yield from read_events()
+        if fed:
+            try:
+                parser.close()
+            except self._etree.XMLSyntaxError:
+                pass
+            yield from read_events()
+
+    def containers(self, content, container_class, exclude_class=None):
+        return list(self.iter_containers([content], container_class, exclude_class))
+
+    @staticmethod
+    def select_one(node, selector):
+        matches = _compile_xpath(selector)(node)
+        return matches[0] if matches else None
+
+    def text(self, node):
+        return self._string(node)
+
+    @staticmethod
+    def attr(node, name):
+        return node.get(name)
+
+
+_backends = {}
+
+
+def get_backend(name=None):
+    """Return the parser backend called `name` (HTML_PARSER by default)."""
+    name = name or HTML_PARSER
+    if name not in _backends:
+        if name == "html.parser":
+            _backends[name] = SoupBackend()
+        elif name == "strainer":
+            _backends[name] = SoupBackend(strain=True)
+        elif name == "lxml":
+            _backends[name] = LxmlBackend()
+        else:
+            raise ValueError(f"Unknown HTML parser: {name}")
+    return _backends[name]
+
+
+def parse_mercadolibre_page(content, parser=None):
+    """Extract the title, price and URL of every product on a MercadoLibre result page."""
+    return list(iter_mercadolibre_products([content], parser))
+
+
+def iter_mercadolibre_products(chunks, parser=None):
+    """Yield the products of a MercadoLibre result page whose body arrives in `chunks`."""
+    backend = get_backend(parser)
+
+    for container in backend.iter_containers(chunks, "ui-search-result__wrapper"):
+        try:
+            # Get product title
+            title_elem = backend.select_one(container, ".ui-search-item__title")
+            title = backend.text(title_elem).strip() if title_elem is not None else "Unknown Product"
+
+            # Get product price
+            price_elem = backend.select_one(container, ".andes-money-amount__fraction")
+            if price_elem is None:
+                continue  # Skip products without a price
+            price = int(re.sub(r"\D", "", backend.text(price_elem)))
+
+            # Get product URL
+            url_elem = backend.select_one(container, ".ui-search-link")
+            product_url = backend.attr(url_elem, "href") if url_elem is not None else None
+
+            yield {
+                'title': title,
+                'price': price,
+                'url': product_url
+            }
+        except Exception as e:
+            logger.error(f"Error processing product: {e}")
+            continue
+
+
+def parse_amazon_page(content, parser=None):
+    """Extract the title, price (in cents) and URL of every product on an Amazon result page."""
+    return list(iter_amazon_products([content], parser))
+
+
+def iter_amazon_products(chunks, parser=None):
+    """Yield the products of an Amazon result page whose body arrives in `chunks`."""
+    backend = get_backend(parser)
+
+    for container in backend.iter_containers(chunks, "s-result-item", exclude_class="AdHolder"):
+        try:
+            # Get product title
+            title_elem = backend.select_one(container, "h2 .a-link-normal")
+            title = backend.text(title_elem).strip() if title_elem is not None else "Unknown Product"
+
+            # Get product price
+            price_elem = backend.select_one(container, ".a-price .a-offscreen")
+            if price_elem is None:
+                continue  # Skip products without a price
+
+            price_match = re.search(r'[\d,]+\.?\d*', backend.text(price_elem).strip())
+            if not price_match:
+                continue
+
+            try:
+                # Convert to cents/pennies for consistency
+                price_cents = int(float(price_match.group().replace(',', '')) * 100)
+            except ValueError:
+                continue
+
+            # Get product URL
+            product_url = None
+            href = backend.attr(title_elem, "href") if title_elem is not None else None
+            if href is not None:
+                product_url = 'https://www.amazon.com' + href if href.startswith('/') else href
+
+            yield {
+                'title': title,
+                'price': price_cents,
+                'url': product_url
+            }
+        except Exception as e:
+            logger.error(f"Error processing Amazon product: {e}")
+            continue
@@ -0,0 +1,252 @@
+"""Column-oriented product records and vectorized product picks.
+
+A search's products are stored as a ProductTable: one NumPy price array plus
+one StringColumn each for titles and URLs, instead of a dict per product. The
+prices array doubles as the search's price list, so prices are held once.
+"""
+import heapq
+
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+class StringColumn:
+    """Immutable list of optional strings packed into one UTF-8 buffer with offsets."""
+
+    __slots__ = ("data", "offsets", "missing")
+
+    def __init__(self, data, offsets, missing=None):
+        self.data = data
+        self.offsets = offsets
+        self.missing = missing  # Boolean mask of None entries, or None when there are none
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [b"" if s is None else s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        missing = np.fromiter((s is None for s in strings), dtype=bool, count=len(encoded))
+        return cls(b"".join(encoded), offsets, missing if missing.any() else None)
+
+    @classmethod
+    def concat(cls, columns):
+        columns = list(columns)
+        if not columns:
+            return cls.from_strings([])
+        # Shift each column's offsets by the size of the buffers before it
+        starts = np.cumsum([0] + [len(column.data) for column in columns[:-1]])
+        offsets = np.concatenate(
+            [columns[0].offsets[:1]] + [column.offsets[1:] + start for column, start in zip(columns, starts)]
+        ).astype(np.uint32)
+        missing = None
+        if any(column.missing is not None for column in columns):
+            missing = np.concatenate([
+                column.missing if column.missing is not None else np.zeros(len(column), dtype=bool)
+                for column in columns
+            ])
+        return cls(b"".join(column.data for column in columns), offsets, missing)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if self.missing is not None and self.missing[i]:
+            return None
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __eq__(self, other):
+        return isinstance(other, StringColumn) and list(self) == list(other)
+
+    def tolist(self):
+        return list(self)
+
+    @property
+    def nbytes(self):
+        return len(self.data) + self.offsets.nbytes + (0 if self.missing is None else self.missing.nbytes)
+
+
+class ProductTable:
+    """Scraped products held column by column: a price array plus title and URL columns."""
+
+    __slots__ = ("prices", "titles", "urls")
+
+    def __init__(self, prices, titles, urls):
+        self.prices = np.asarray(prices)
+        self.titles = titles if isinstance(titles, StringColumn) else StringColumn.from_strings(titles)
+        self.urls = urls if isinstance(urls, StringColumn) else StringColumn.from_strings(urls)
+
+    @classmethod
+    def from_records(cls, product_infos):
+        """Build a table from a list of {'title', 'price', 'url'} dicts."""
+        return cls(
+            [product['price'] for product in product_infos],
+            [product['title'] for product in product_infos],
+            [product['url'] for product in product_infos],
+        )
+
+    @classmethod
+    def concat(cls, tables):
+        """Join tables end to end, e.g. the pages of a search."""
+        tables = list(tables)
+        if not tables:
+            return cls.from_records([])
+        return cls(
+            np.concatenate([table.prices for table in tables]),
+            StringColumn.concat(table.titles for table in tables),
+            StringColumn.concat(table.urls for table in tables),
+        )
+
+    def __len__(self):
+        return len(self.prices)
+
+    def __iter__(self):
+        return (self.record(i) for i in range(len(self)))
+
+    def __eq__(self, other):
+        return (isinstance(other, ProductTable) and np.array_equal(self.prices, other.prices)
+                and self.titles == other.titles and self.urls == other.urls)
+
+    def record(self, i):
+        """The i-th product as a {'title', 'price', 'url'} dict."""
+        return {'title': self.titles[i], 'price': self.prices[i].item(), 'url': self.urls[i]}
+
+    def to_records(self):
+        """Every product as a {'title', 'price', 'url'} dict, ready for JSON."""
+        return list(self)
+
+    def to_columns(self):
+        """JSON-ready {'prices', 'titles', 'urls'} lists."""
+        return {'prices': self.prices.tolist(), 'titles': self.titles.tolist(), 'urls': self.urls.tolist()}
+
+    def cheapest(self):
+        """Index of the first product with the lowest price."""
+        return int(np.argmin(self.prices))
+
+    def most_expensive(self):
+        """Index of the first product with the highest price."""
+        return int(np.argmax(self.prices))
+
+    def nearest(self, target, k, max_relative_diff=None):
+        """Indices of the (at most) `k` products closest to `target`, closest first.
+
+        With `max_relative_diff`, only products within that fraction of
+        `target` are considered. Ties keep the products' original order.
+        """
+        distances = np.abs(self.prices - target)
+        candidates = np.arange(len(self))
+        if max_relative_diff is not None:
+            within = distances <= abs(target) * max_relative_diff
+            candidates = candidates[within]
+            distances = distances[within]
+        return candidates[_k_smallest(distances, k)]
+
+    def nearest_to_percentile(self, q, k, max_relative_diff=None):
+        """Indices of the `k` products closest to the q-th price percentile, closest first."""
+        return self.nearest(np.percentile(self.prices, q), k, max_relative_diff)
+
+
+class ProductSampler:
+    """Uniform random sample of at most `size` products, from tables added one at a time.
+
+    Every product gets a random key and only the `size` with the smallest
+    keys are kept, in a bounded heap (bottom-k sampling), so each product is
+    equally likely to be kept however many tables are added. The cheapest
+    and most expensive products are tracked on their own and always
+    included.
+    """
+
+    def __init__(self, size=500, seed=None):
+        self.size = size
+        self._heap = []  # (-key, position, price, title, url): the largest key kept is on top
+        self._cheapest = None  # (position, price, title, url)
+        self._most_expensive = None
+        self._position = 0  # Products added so far, which gives each its place in listing order
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, table):
+        if len(table) == 0:
+            return
+        cheapest, most_expensive = table.cheapest(), table.most_expensive()
+        # Strict comparisons keep the first product listed at a given price, as ProductTable.cheapest() does
+        if self._cheapest is None or table.prices[cheapest] < self._cheapest[1]:
+            self._cheapest = self._entry(table, cheapest)
+        if self._most_expensive is None or table.prices[most_expensive] > self._most_expensive[1]:
+            self._most_expensive = self._entry(table, most_expensive)
+
+        keys = self._rng.random(len(table))
+        candidates = range(len(table))
+        if len(self._heap) == self.size:
+            candidates = np.flatnonzero(keys < -self._heap[0][0]).tolist()
+        for i in candidates:
+            entry = (-keys[i], *self._entry(table, i))
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, entry)
+            elif entry > self._heap[0]:
+                heapq.heapreplace(self._heap, entry)
+        self._position += len(table)
+
+    def _entry(self, table, i):
+        return self._position + i, table.prices[i].item(), table.titles[i], table.urls[i]
+
+    def table(self, divisor=1):
+        """The sampled products in listing order, with their prices divided by `divisor`."""
+        entries = {entry[1]: entry[1:] for entry in self._heap}
+        for extreme in (self._cheapest, self._most_expensive):
+            if extreme is not None:
+                entries[extreme[0]] = extreme
+        rows = [entries[position] for position in sorted(entries)]
+        prices = np.array([price for _, price, _, _ in rows])
+        return ProductTable(
+            prices / divisor if divisor != 1 else prices,
+            [title for _, _, title, _ in rows],
+            [url for _, _, _, url in rows],
+        )
+
+
+def _k_smallest(keys, k):
+    """Positions of the k smallest keys in ascending order, ties in original order.
+
+    Same result as a stable sort truncated to k, but partitions instead of
+    sorting everything.
+    """
+    if keys.size > k:
+        kth = np.partition(keys, k - 1)[k - 1]
+        below = np.flatnonzero(keys < kth)
+        ties = np.flatnonzero(keys == kth)[:k - below.size]
+        chosen = np.concatenate([below, ties])
+    else:
+        chosen = np.arange(keys.size)
+    return chosen[np.argsort(keys[chosen], kind="stable")]
+
+
+def pick_products(table, median_price, k=10, tolerance=0.05):
+    """Pick the products shown next to the chart.
+
+    Returns (products_near_median, cheapest_product, most_expensive_product).
+    Products near the median are those within ±`tolerance` of it, each with its
+    `percentage_diff` from the median; when there are more than `k`, only the
+    `k` closest are kept, closest first, otherwise they keep listing order.
+    """
+    if len(table) == 0:
+        return [], None, None
+
+    percentage_diffs = np.round((table.prices - median_price) / median_price * 100, 2)
+    in_range = np.flatnonzero(
+        (table.prices >= median_price * (1 - tolerance)) & (table.prices <= median_price * (1 + tolerance))
+    )
+    if in_range.size > k:
+        in_range = in_range[_k_smallest(np.abs(percentage_diffs[in_range]), k)]
+
+    products_near_median = []
+    for i in in_range.tolist():
+        product = table.record(i)
+        product['percentage_diff'] = percentage_diffs[i].item()
+        products_near_median.append(product)
+
+    return products_near_median, table.record(table.cheapest()), table.record(table.most_expensive())
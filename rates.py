@@ -0,0 +1,216 @@
+"""Exchange rates to US dollars, refreshed in the background and remembered across restarts.
+
+Each country has a rate provider; ExchangeRates keeps the latest rate each
+one returned with the time it was fetched. Once a rate is older than its TTL
+it keeps being served while a background thread fetches a new one, and if
+the provider fails the last known good rate stays in use. Rates are saved to
+a JSON file so a restarted worker starts with them instead of the fixed
+approximations it uses until its first fetch.
+"""
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Rate:
+    """Local currency units per US dollar, fetched at `fetched_at` (Unix time)."""
+    value: float
+    fetched_at: float
+
+    def to_dict(self):
+        return {"rate": self.value, "fetched_at": self.fetched_at}
+
+
+def parse_rate(value):
+    """Parse a rate such as 1234.5, "1234.5" or "1234.5 ARS", raising ValueError if it is not a positive number."""
+    if isinstance(value, str):
+        match = re.match(r"\s*(\d+(?:[.,]\d+)?)", value)
+        if match is None:
+            raise ValueError(f"Not an exchange rate: {value!r}")
+        value = match.group(1).replace(",", ".")
+    rate = float(value)
+    if not rate > 0:
+        raise ValueError(f"Not an exchange rate: {value!r}")
+    return rate
+
+
+class FixedRateProvider:
+    """A rate that never changes, such as USD to USD."""
+
+    def __init__(self, rate):
+        self.rate = rate
+
+    def fetch(self, http_get):
+        return self.rate
+
+
+class JSONRateProvider:
+    """A rate read from a JSON API.
+
+    `field` is the dotted path to the rate in the response, e.g. "venta" for
+    {"venta": 1234.5} or "USDBRL.bid" for {"USDBRL": {"bid": "5.1"}}.
+    """
+
+    def __init__(self, url, field="venta"):
+        self.url = url
+        self.field = field
+
+    def fetch(self, http_get):
+        response = http_get(self.url)
+        response.raise_for_status()
+        value = response.json()
+        for name in self.field.split("."):
+            value = value[name]
+        return parse_rate(value)
+
+
+class ExchangeRates:
+    """The latest rate of each of `country_codes`, as returned by `fetch(country_code)`.
+
+    `get` never waits on `fetch`: a country with no known rate, not even
+    from the file at `path`, gets None while its rate is fetched in a
+    background thread, and rates older than `ttl` seconds are served while
+    they are refreshed. The first lookup fetches every country's rate that
+    way, so nothing is fetched until the rates are needed. After a failed
+    fetch, a country is not retried for `retry_interval` seconds.
+    """
+
+    def __init__(self, fetch, country_codes, ttl=900, path=None, clock=time.time, retry_interval=60):
+        self.fetch = fetch
+        self.country_codes = tuple(country_codes)
+        self.ttl = ttl
+        self.path = path
+        self.retry_interval = retry_interval
+        self._clock = clock
+        self._rates = {}
+        self._failed_at = {}  # Country code -> time of its last failed fetch
+        self._refreshing = set()
+        self._looked_up = False
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._in_flight = SingleFlight()
+        self.hits = 0  # Lookups answered with a known rate, fresh or not
+        self.misses = 0  # Lookups made while no rate of the country was known
+        self.refreshes = 0
+        self.failures = 0
+        self._load()
+
+    def get(self, country_code):
+        """The latest known Rate of `country_code`, or None while none has been fetched."""
+        with self._lock:
+            now = self._clock()
+            rate = self._rates.get(country_code)
+            if rate is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            country_codes = [country_code] if self._looked_up else dict.fromkeys((country_code,) + self.country_codes)
+            self._looked_up = True
+            due = [code for code in country_codes if self._due(code, now)]
+            self._refreshing.update(due)
+
+        for code in due:
+            threading.Thread(target=self._run_refresh, args=(code,), daemon=True).start()
+        return rate
+
+    def start(self):
+        """Fetch every country's rate in background threads, as at startup, without waiting for them."""
+        with self._lock:
+            country_codes = [code for code in self.country_codes if code not in self._refreshing]
+            self._refreshing.update(country_codes)
+        for country_code in country_codes:
+            threading.Thread(target=self._run_refresh, args=(country_code,), daemon=True).start()
+
+    def refresh(self, country_code):
+        """Fetch the rate of `country_code` now, returning the last known one if the provider fails."""
+        return self._in_flight.do(country_code, self._fetch, country_code)
+
+    def refresh_all(self):
+        for country_code in self.country_codes:
+            self.refresh(country_code)
+
+    def stats(self):
+        """Return the lookup and fetch counters."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "refreshes": self.refreshes, "failures": self.failures}
+
+    def _due(self, country_code, now):
+        # Whether a lookup at `now` should refresh the rate of `country_code`; called with _lock held
+        rate = self._rates.get(country_code)
+        return ((rate is None or now - rate.fetched_at > self.ttl) and country_code not in self._refreshing
+                and now - self._failed_at.get(country_code, -math.inf) >= self.retry_interval)
+
+    def _run_refresh(self, country_code):
+        try:
+            self.refresh(country_code)
+        finally:
+            with self._lock:
+                self._refreshing.discard(country_code)
+
+    def _fetch(self, country_code):
+        try:
+            value = self.fetch(country_code)
+        except Exception as e:
+            logger.error(f"Error fetching exchange rate for {country_code}: {e}")
+            with self._lock:
+                self.failures += 1
+                self._failed_at[country_code] = self._clock()
+                return self._rates.get(country_code)
+
+        rate = Rate(value, self._clock())
+        with self._lock:
+            self.refreshes += 1
+            self._rates[country_code] = rate
+            self._failed_at.pop(country_code, None)
+        self._save()
+        return rate
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+            self._rates = {
+                country_code: Rate(parse_rate(rate["rate"]), float(rate["fetched_at"]))
+                for country_code, rate in saved.items()
+                if country_code in self.country_codes
+            }
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.warning(f"Ignoring saved exchange rates in {self.path}: {e}")
+
+    def _save(self):
+        if self.path is None:
+            return
+        # Snapshots are taken and written in turn, so the file always ends up with the latest rates,
+        # but lookups only wait for the snapshot, never for the disk
+        with self._save_lock:
+            with self._lock:
+                saved = {country_code: rate.to_dict() for country_code, rate in self._rates.items()}
+            self._write(saved)
+
+    def _write(self, saved):
+        # Write to a temporary file first so a crash never leaves a truncated file behind
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(saved, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save exchange rates to {self.path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
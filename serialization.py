@@ -0,0 +1,96 @@
+"""Response encoding for the JSON API: fast serializers and body compression.
+
+orjson, msgpack and brotli are optional. Without orjson the stdlib json
+module is used; MessagePack output and brotli compression are only offered
+when their packages are installed.
+"""
+import gzip
+import json
+
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+
+# Bodies smaller than this are sent uncompressed; the headers would eat most of the gain
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _default(value):
+    """Convert the NumPy values that the serializers do not handle natively."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def dumps_json(value):
+    """Serialize `value` to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def dumps_msgpack(value):
+    """Serialize `value` to MessagePack bytes (requires the msgpack package)."""
+    if msgpack is None:
+        raise RuntimeError("The msgpack package is required for MessagePack output.")
+    return msgpack.packb(value, default=_default, use_bin_type=True)
+
+
+SERIALIZERS = {JSON_MIMETYPE: dumps_json}
+if msgpack is not None:
+    SERIALIZERS[MSGPACK_MIMETYPE] = dumps_msgpack
+
+# Short names accepted in the `format` query parameter
+FORMATS = {"json": JSON_MIMETYPE, "msgpack": MSGPACK_MIMETYPE}
+
+
+def negotiate_mimetype(accept_mimetypes, requested_format=None):
+    """Pick the response mimetype from a `format` parameter or the Accept header.
+
+    Returns None when the requested format is unknown or its serializer is not
+    installed.
+    """
+    if requested_format:
+        mimetype = FORMATS.get(requested_format)
+        return mimetype if mimetype in SERIALIZERS else None
+    if not accept_mimetypes:
+        return JSON_MIMETYPE
+    return accept_mimetypes.best_match(list(SERIALIZERS), default=None)
+
+
+def compress(body, accept_encodings):
+    """Compress `body` with the best encoding the client accepts.
+
+    Returns (body, content_encoding), with content_encoding None when the
+    body is sent as is.
+    """
+    if len(body) < COMPRESS_MIN_SIZE:
+        return body, None
+    if brotli is not None and accept_encodings["br"]:
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if accept_encodings["gzip"]:
+        # A fixed mtime keeps the output, and so the ETag, stable for identical bodies
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
+    return body, None
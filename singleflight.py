@@ -0,0 +1,63 @@
+"""Coalesce concurrent calls for the same key into a single in-flight call."""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Run at most one call per key at a time.
+
+    Callers arriving while a call for their key is in flight wait for it and
+    receive the same result, or the same exception if it failed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0  # Calls answered by another caller's in-flight call
+
+    def _join(self, key):
+        """Return (future of the call for `key`, whether the caller must run it)."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        return future, leader
+
+    def _done(self, key):
+        with self._lock:
+            del self._calls[key]
+
+    def do(self, key, fn, *args, **kwargs):
+        future, leader = self._join(key)
+        if leader:
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                self._done(key)
+        return future.result()
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        """Like do(), awaiting the coroutine function `fn` instead of calling it.
+
+        Calls made with do() and do_async() for the same key are shared, so a
+        search is scraped once whether the callers are threads or event loops.
+        """
+        future, leader = self._join(key)
+        if leader:
+            try:
+                future.set_result(await fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                self._done(key)
+        return await asyncio.wrap_future(future)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
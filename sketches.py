@@ -0,0 +1,160 @@
+"""Fixed-size summaries of a stream of prices, updated one result page at a time.
+
+Large scans fold every page into these as it arrives instead of keeping its
+prices, so their memory and the cost of their statistics stay the same
+however many pages are scanned.
+"""
+import heapq
+import math
+
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+class Moments:
+    """Count, mean, variance, min and max of every value added, updated a batch at a time.
+
+    Each batch's mean and sum of squared deviations are merged into the
+    running ones (Welford's update, in Chan et al.'s pairwise form), which
+    stays accurate where summing squares would cancel out.
+    """
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared deviations from the mean
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        if values.size == 0:
+            return
+        mean = float(values.mean())
+        m2 = float(np.square(values - mean).sum())
+        total = self.count + values.size
+        delta = mean - self.mean
+        self.mean += delta * values.size / total
+        self.m2 += m2 + delta * delta * self.count * values.size / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    @property
+    def std(self):
+        """Population standard deviation, as numpy's std() computes it."""
+        return math.sqrt(self.m2 / self.count) if self.count else math.nan
+
+
+class QuantileSketch:
+    """Counts of values in logarithmically sized buckets, giving quantiles within a relative accuracy.
+
+    Bucket i counts the values in (gamma**(i-1), gamma**i], with gamma =
+    (1 + a) / (1 - a), so every value is within a relative `a` of its
+    bucket's representative value (the DDSketch scheme). The number of
+    buckets grows with the spread of the values, not with their number, and
+    past `max_buckets` the lowest ones are merged. Values at or below zero
+    are counted as zero.
+    """
+
+    __slots__ = ("relative_accuracy", "max_buckets", "gamma", "_log_gamma", "buckets", "zero_count", "count")
+
+    def __init__(self, relative_accuracy=0.005, max_buckets=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}  # Bucket index -> count
+        self.zero_count = 0
+        self.count = 0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        positive = values[values > 0]
+        self.zero_count += values.size - positive.size
+        self.count += values.size
+        indices, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64), return_counts=True)
+        for index, count in zip(indices.tolist(), counts.tolist()):
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        if len(self.buckets) > self.max_buckets:
+            indices = sorted(self.buckets)
+            merged = sum(self.buckets.pop(index) for index in indices[:-self.max_buckets])
+            self.buckets[indices[-self.max_buckets]] += merged
+
+    def _values_and_counts(self):
+        """Representative value and count of each bucket, in ascending order, zeros first."""
+        indices = sorted(self.buckets)
+        values = 2 * self.gamma ** np.array(indices, dtype=float) / (self.gamma + 1)
+        counts = np.array([self.buckets[index] for index in indices], dtype=np.int64)
+        if self.zero_count:
+            values = np.concatenate([[0.0], values])
+            counts = np.concatenate([[self.zero_count], counts])
+        return values, counts
+
+    def quantile(self, q):
+        """Estimate of the value below which a fraction `q` of the values fall."""
+        if not self.count:
+            raise ValueError("Cannot estimate quantiles of an empty sketch.")
+        values, counts = self._values_and_counts()
+        rank = q * (self.count - 1)
+        # Interpolated between the values of the ranks on either side, as numpy.percentile does
+        below, above = values[np.searchsorted(np.cumsum(counts), [math.floor(rank), math.ceil(rank)], side="right")]
+        return float(below + (above - below) * (rank - math.floor(rank)))
+
+    def count_below(self, value):
+        values, counts = self._values_and_counts()
+        return int(counts[values < value].sum())
+
+    def count_above(self, value):
+        values, counts = self._values_and_counts()
+        return int(counts[values > value].sum())
+
+    def histogram(self, lower, upper, bins):
+        """(counts, edges) of `bins` equal-width bins over [lower, upper], like numpy.histogram.
+
+        Buckets are counted in the bin of their representative value, moved
+        inside [lower, upper] for the buckets that straddle its ends.
+        """
+        if lower == upper:
+            lower, upper = lower - 0.5, upper + 0.5
+        values, counts = self._values_and_counts()
+        # A bucket with representative value v holds values from v / (1 + a) up to v / (1 - a)
+        inside = ((values / (1 - self.relative_accuracy) >= lower)
+                  & (values / (1 + self.relative_accuracy) <= upper))
+        edges = np.linspace(lower, upper, bins + 1)
+        binned, _ = np.histogram(np.clip(values[inside], lower, upper), bins=edges, weights=counts[inside])
+        return binned.astype(np.int64), edges
+
+
+class Extremes:
+    """The `k` smallest and `k` largest values added, kept in two bounded heaps."""
+
+    __slots__ = ("k", "_smallest", "_largest")
+
+    def __init__(self, k=100):
+        self.k = k
+        self._smallest = []  # Min-heap of the negated smallest values, so the largest of them is on top
+        self._largest = []  # Min-heap of the largest values
+
+    def update(self, values):
+        values = np.asarray(values)
+        for heap, candidates in ((self._smallest, -values), (self._largest, values)):
+            if len(heap) == self.k:
+                # Only values beating the weakest one kept can get in
+                candidates = candidates[candidates > heap[0]]
+            for value in candidates.tolist():
+                if len(heap) < self.k:
+                    heapq.heappush(heap, value)
+                elif value > heap[0]:
+                    heapq.heapreplace(heap, value)
+
+    def smallest(self):
+        """The smallest values, in ascending order."""
+        return sorted(-value for value in self._smallest)
+
+    def largest(self):
+        """The largest values, in ascending order."""
+        return sorted(self._largest)
@@ -0,0 +1,26 @@
+"""Per-thread connections to a SQLite file that every worker process on the host may open."""
+import sqlite3
+import threading
+
+
+class ThreadLocalConnection:
+    """Call to get this thread's connection to the SQLite file at `path`, opened on first use.
+
+    sqlite3 connections cannot be shared between threads, so each thread
+    opens its own. They use write-ahead logging, so readers in other
+    processes do not wait for a writer.
+    """
+
+    def __init__(self, path, timeout=5):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __call__(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
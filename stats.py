@@ -0,0 +1,281 @@
+"""Summary statistics of a search's prices, computed once and shared by every consumer."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from lazy import lazy_import
+from sketches import Extremes, Moments, QuantileSketch
+
+np = lazy_import("numpy")
+
+DEFAULT_PERCENTILES = (25,)
+
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+@dataclass(frozen=True)
+class PriceStats:
+    """Immutable summary of a list of prices.
+
+    Outliers are the prices more than `threshold` standard deviations away from
+    the mean (none when `threshold` is None); the histogram covers the
+    remaining prices.
+    """
+    prices: np.ndarray
+    count: int
+    mean: float
+    median: float
+    std: float
+    min: float
+    max: float
+    percentiles: MappingProxyType
+    threshold: float
+    lower_bound: float
+    upper_bound: float
+    outlier_mask: np.ndarray
+    histogram_counts: np.ndarray
+    histogram_edges: np.ndarray
+
+    @property
+    def non_outliers(self):
+        return self.prices[~self.outlier_mask]
+
+    @property
+    def outliers(self):
+        return self.prices[self.outlier_mask]
+
+    def percentile(self, q):
+        return self.percentiles[q]
+
+    def to_dict(self):
+        """JSON-serializable summary, without the per-price arrays."""
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "median": self.median,
+            "std": self.std,
+            "min": self.min,
+            "max": self.max,
+            "percentiles": {str(q): value for q, value in self.percentiles.items()},
+            "threshold": self.threshold,
+            "lower_bound": self.lower_bound,
+            "upper_bound": self.upper_bound,
+            "outliers": int(self.outlier_mask.sum()),
+            "histogram": {
+                "counts": self.histogram_counts.tolist(),
+                "edges": self.histogram_edges.tolist(),
+            },
+        }
+
+
+def compute_stats(prices, threshold=3, percentiles=DEFAULT_PERCENTILES, bins=20):
+    """Summarize `prices` in a single vectorized pass over one NumPy array.
+
+    The array keeps the prices' own dtype, so integer prices stay integers when
+    converted back with `tolist()`.
+    """
+    prices = _read_only(np.array(prices))
+    if prices.size == 0:
+        raise ValueError("Cannot compute statistics of an empty price list.")
+
+    # The median and every requested percentile come from a single partition of the data
+    quantiles = np.percentile(prices, [50, *percentiles])
+    mean = float(prices.mean())
+    std = float(prices.std())
+
+    if threshold is None:
+        lower_bound, upper_bound = float("-inf"), float("inf")
+        outlier_mask = np.zeros(prices.shape, dtype=bool)
+    else:
+        lower_bound = mean - threshold * std
+        upper_bound = mean + threshold * std
+        outlier_mask = (prices < lower_bound) | (prices > upper_bound)
+
+    counts, edges = np.histogram(prices[~outlier_mask], bins=bins)
+
+    return PriceStats(
+        prices=prices,
+        count=int(prices.size),
+        mean=mean,
+        median=float(quantiles[0]),
+        std=std,
+        min=float(prices.min()),
+        max=float(prices.max()),
+        percentiles=MappingProxyType({q: float(value) for q, value in zip(percentiles, quantiles[1:])}),
+        threshold=threshold,
+        lower_bound=lower_bound,
+        upper_bound=upper_bound,
+        outlier_mask=_read_only(outlier_mask),
+        histogram_counts=_read_only(counts),
+        histogram_edges=_read_only(edges),
+    )
+
+
+@dataclass(frozen=True)
+class SketchStats:
+    """Summary of a large scan's prices, from the streaming aggregates of StreamingStats.
+
+    Offers what PriceStats offers, except the full price array: the count,
+    mean, standard deviation, min and max are exact, the median,
+    percentiles and histogram approximate. `outliers` holds the outlier
+    prices that were kept (at most StreamingStats' `extremes` on each side)
+    and `outlier_count` how many there were; `non_outliers` is the part of
+    `sample`, the scan's sampled prices, within the outlier bounds.
+    """
+    count: int
+    mean: float
+    median: float
+    std: float
+    min: float
+    max: float
+    percentiles: MappingProxyType
+    threshold: float
+    lower_bound: float
+    upper_bound: float
+    outliers: np.ndarray
+    outlier_count: int
+    histogram_counts: np.ndarray
+    histogram_edges: np.ndarray
+    sample: np.ndarray
+    relative_accuracy: float
+
+    @property
+    def non_outliers(self):
+        return self.sample[(self.sample >= self.lower_bound) & (self.sample <= self.upper_bound)]
+
+    def percentile(self, q):
+        return self.percentiles[q]
+
+    def to_dict(self):
+        """JSON-serializable summary, like PriceStats.to_dict(), flagged as approximate."""
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "median": self.median,
+            "std": self.std,
+            "min": self.min,
+            "max": self.max,
+            "percentiles": {str(q): value for q, value in self.percentiles.items()},
+            "threshold": self.threshold,
+            "lower_bound": self.lower_bound,
+            "upper_bound": self.upper_bound,
+            "outliers": self.outlier_count,
+            "histogram": {
+                "counts": self.histogram_counts.tolist(),
+                "edges": self.histogram_edges.tolist(),
+            },
+            "approximate": True,
+            "relative_accuracy": self.relative_accuracy,
+        }
+
+    def to_state(self):
+        """Every field as JSON-ready values, for from_state()."""
+        state = {name: getattr(self, name) for name in self.__dataclass_fields__}
+        state["percentiles"] = {str(q): value for q, value in self.percentiles.items()}
+        for name in ("outliers", "histogram_counts", "histogram_edges", "sample"):
+            state[name] = state[name].tolist()
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        state = dict(state)
+        state["percentiles"] = MappingProxyType({int(q): value for q, value in state["percentiles"].items()})
+        for name in ("outliers", "histogram_counts", "histogram_edges", "sample"):
+            state[name] = _read_only(np.array(state[name]))
+        return cls(**state)
+
+
+class StreamingStats:
+    """Summary of prices added a page at a time, in memory that does not grow with their number.
+
+    The mean and standard deviation come from running moments and are exact;
+    the median, percentiles and histogram come from a QuantileSketch and are
+    within `relative_accuracy` of the exact ones. The `extremes` smallest and
+    largest prices are kept, so outliers are known exactly unless there are
+    more than that on one side.
+    """
+
+    def __init__(self, relative_accuracy=0.005, extremes=100):
+        self.moments = Moments()
+        self.sketch = QuantileSketch(relative_accuracy)
+        self.extremes = Extremes(extremes)
+
+    def add(self, prices):
+        prices = np.asarray(prices)
+        if prices.size == 0:
+            return
+        self.moments.update(prices)
+        self.sketch.update(prices)
+        self.extremes.update(prices)
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    @property
+    def max(self):
+        return self.moments.max
+
+    def finish(self, threshold=3, percentiles=DEFAULT_PERCENTILES, bins=20, divisor=1, sample=()):
+        """SketchStats of the prices added so far, divided by `divisor` (e.g. 100 for prices scraped in cents).
+
+        `sample` is a sample of the prices, already divided, for SketchStats.non_outliers.
+        """
+        if not self.count:
+            raise ValueError("Cannot compute statistics of an empty price list.")
+        moments = self.moments
+        mean, std = moments.mean / divisor, moments.std / divisor
+        minimum, maximum = moments.min / divisor, moments.max / divisor
+
+        def scaled(values):
+            values = np.array(values)
+            return values / divisor if divisor != 1 else values
+
+        def quantile(q):
+            # Estimates are within the sketch's accuracy, but never beyond the exact extremes
+            return min(max(self.sketch.quantile(q / 100) / divisor, minimum), maximum)
+
+        if threshold is None:
+            lower_bound, upper_bound = float("-inf"), float("inf")
+        else:
+            lower_bound = mean - threshold * std
+            upper_bound = mean + threshold * std
+
+        smallest, largest = scaled(self.extremes.smallest()), scaled(self.extremes.largest())
+        below, above = smallest[smallest < lower_bound], largest[largest > upper_bound]
+        outlier_count = below.size + above.size
+        # When every price kept on a side is an outlier there may be more of them, which only the sketch has counted
+        if below.size == self.extremes.k:
+            outlier_count += max(0, self.sketch.count_below(lower_bound * divisor) - below.size)
+        if above.size == self.extremes.k:
+            outlier_count += max(0, self.sketch.count_above(upper_bound * divisor) - above.size)
+
+        # The histogram spans the prices within the bounds, like compute_stats' does
+        inside_smallest = smallest[smallest >= lower_bound]
+        inside_largest = largest[largest <= upper_bound]
+        low = float(inside_smallest[0]) if inside_smallest.size else max(lower_bound, minimum)
+        high = float(inside_largest[-1]) if inside_largest.size else min(upper_bound, maximum)
+        counts, edges = self.sketch.histogram(low * divisor, high * divisor, bins)
+
+        return SketchStats(
+            count=self.count,
+            mean=mean,
+            median=quantile(50),
+            std=std,
+            min=minimum,
+            max=maximum,
+            percentiles=MappingProxyType({q: quantile(q) for q in percentiles}),
+            threshold=threshold,
+            lower_bound=lower_bound,
+            upper_bound=upper_bound,
+            outliers=_read_only(np.array(below.tolist() + above.tolist())),  # Keeps integer prices integers
+            outlier_count=int(outlier_count),
+            histogram_counts=_read_only(counts),
+            histogram_edges=_read_only(edges / divisor),
+            sample=_read_only(np.asarray(sample)),
+            relative_accuracy=self.sketch.relative_accuracy,
+        )
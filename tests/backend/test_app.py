@@ -2,7 +2,12 @@ import pytest
 import sys
 import os
 import re
+import asyncio
+import datetime
+import gzip
 import json
+import threading
+import time
 import requests
 from unittest.mock import patch, MagicMock
 import numpy as np
@@ -12,7 +17,15 @@ from flask import Flask, request
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 import app as app_module
-from app import app, get_prices, plot_prices, get_exchange_rate, format_number
+import http_client
+from app import app, get_prices, plot_prices, get_exchange_rate, format_number, COUNTRY_CONFIG
+from cache import PriceCache
+from history import PriceHistory
+from products import ProductTable
+from rates import ExchangeRates
+from singleflight import SingleFlight
+from stats import StreamingStats
+from warming import QueryStats
 
 
 @pytest.fixture
@@ -27,12 +40,16 @@ class TestApp:
     @pytest.fixture(autouse=True)
     def mock_exchange_rate(self):
         """Mock the exchange rate API response."""
-        with patch('app.requests.get') as mock_get:
+        with patch('app.http_get') as mock_get:
             mock_response = MagicMock()
             mock_response.json.return_value = {"venta": "400.0 ARS"}
             mock_response.raise_for_status.return_value = None
             mock_get.return_value = mock_response
-            yield mock_get
+            # Rates fetched by a test are neither kept for the next one nor saved to disk
+            rates = ExchangeRates(app_module.fetch_exchange_rate, COUNTRY_CONFIG)
+            rates.refresh_all()  # As if the startup fetch had finished
+            with patch.object(app_module, 'exchange_rates', rates):
+                yield mock_get
 
     def test_index_get(self, client):
         """Test the index page GET route."""
@@ -90,22 +107,24 @@ class TestApp:
     def test_show_plot_success(self, mock_exchange, mock_plot, mock_get_prices, client):
         """Test the show_plot route with successful data retrieval."""
         # Mock data
-        prices = [100000, 150000, 200000]
-        mock_get_prices.return_value = (prices, "https://example.com", 0)
-        mock_plot.return_value = "base64_encoded_image"
-        mock_exchange.return_value = "400.0 ARS"
+        products = ProductTable.from_records(
+            [{'title': f'Item {p}', 'price': p, 'url': None} for p in (100000, 150000, 200000)]
+        )
+        mock_get_prices.return_value = (products.prices, "https://example.com", 0, products)
+        mock_plot.return_value = "abc123"
+        mock_exchange.return_value = 400.0
         
         response = client.get('/show_plot?item=iphone&number_of_pages=1')
         
         assert response.status_code == 200
-        assert b'base64_encoded_image' in response.data
-        mock_get_prices.assert_called_once_with("iphone", 1)
+        assert b'/plot/abc123.png' in response.data
+        mock_get_prices.assert_called_once_with("iphone", 1, "ar", "all")
         mock_plot.assert_called_once()
 
     @patch('app.get_prices')
     def test_show_plot_no_prices(self, mock_get_prices, client):
         """Test the show_plot route when no prices are found."""
-        mock_get_prices.return_value = (None, None, 0)
+        mock_get_prices.return_value = (None, None, 0, None)
         
         response = client.get('/show_plot?item=nonexistentitem&number_of_pages=1')
         
@@ -123,50 +142,69 @@ class TestApp:
         assert format_number(1000) == "1,000"
         assert format_number("not a number") == "not a number"
 
-    @patch('app.requests.get')
+    @patch('app.http_get')
     def test_get_exchange_rate(self, mock_get):
         """Test the get_exchange_rate function."""
         mock_response = MagicMock()
         mock_response.json.return_value = {"venta": "400.0 ARS"}
         mock_response.raise_for_status.return_value = None
         mock_get.return_value = mock_response
-        
-        rate = get_exchange_rate()
-        assert rate == "400.0 ARS"
-        mock_get.assert_called_once_with("https://fastapiproject-1-eziw.onrender.com/blue")
 
-    @patch('app.exchange_rate', None)
-    @patch('app.requests.get')
+        with patch.object(app_module, 'exchange_rates', ExchangeRates(app_module.fetch_exchange_rate, COUNTRY_CONFIG)):
+            # Nothing fetched yet: the fixed approximation is used while the rate is fetched in the background
+            assert get_exchange_rate() == 1000
+            for _ in range(500):
+                if app_module.current_rate().fetched_at is not None:
+                    break
+                time.sleep(0.01)
+            rate = get_exchange_rate()
+            assert rate == 400.0
+            mock_get.assert_called_once_with("https://fastapiproject-1-eziw.onrender.com/blue")
+
+            # Later lookups use the remembered rate
+            assert get_exchange_rate() == 400.0
+            mock_get.assert_called_once()
+
+    @patch('app.http_get')
     def test_get_exchange_rate_error(self, mock_get):
         """Test the get_exchange_rate function when an error occurs."""
         # Configure mock to raise an exception
         mock_get.side_effect = requests.exceptions.RequestException("API error")
         
+        rates = ExchangeRates(app_module.fetch_exchange_rate, COUNTRY_CONFIG)
         # Mock the logger to prevent error logs in test output
-        with patch('app.app.logger.error'):
-            rate = get_exchange_rate()
-            assert rate is None
+        with patch('app.app.logger.warning') as mock_warning, patch.object(app_module, 'exchange_rates', rates), \
+                patch.object(app_module, 'fixed_rate_countries', set()):
+            # No rate was ever fetched: the fixed approximation is used
+            assert get_exchange_rate() == 1000
+            for _ in range(500):
+                if rates.stats()['failures']:
+                    break
+                time.sleep(0.01)
+            assert app_module.current_rate().fetched_at is None
+            # The failed fetch is not retried on every lookup while the API is down
+            assert get_exchange_rate() == 1000
+            assert mock_get.call_count == 1
+            # The fallback is logged once, not on every lookup
+            mock_warning.assert_called_once()
+            # Brazil and the US have fixed rates, which need no API
+            assert get_exchange_rate('br') == 5.0
+            assert get_exchange_rate('us') == 1.0
 
-    @patch('app.requests.get')
-    @patch('app.BeautifulSoup')
-    def test_get_prices(self, mock_bs, mock_get):
+    @patch('app.http_get')
+    def test_get_prices(self, mock_get):
         """Test the get_prices function."""
-        # Mock the BeautifulSoup response
-        mock_soup = MagicMock()
-        mock_price_span1 = MagicMock()
-        mock_price_span1.text = "100,000"
-        mock_price_span2 = MagicMock()
-        mock_price_span2.text = "150,000"
-        mock_soup.find_all.return_value = [mock_price_span1, mock_price_span2]
-        mock_bs.return_value = mock_soup
-        
-        # Mock the requests response
+        # Mock the requests response with a listing page, parsed by the configured parser backend
         mock_response = MagicMock()
+        mock_response.iter_content.return_value = self._ml_page([100000, 150000])
+        mock_response.raise_for_status.return_value = None
         mock_get.return_value = mock_response
-        
-        prices, url, failed_pages = get_prices("iphone", 1)
-        
-        assert prices == [100000, 150000]
+
+        with patch.object(app_module, 'prices_cache', PriceCache()), patch.object(app_module, 'page_cache', PriceCache()):
+            prices, url, failed_pages, products = get_prices("iphone", 1)
+
+        assert prices.tolist() == [100000, 150000]
+        assert products.titles.tolist() == ["Item 100000", "Item 150000"]
         assert url == "https://listado.mercadolibre.com.ar/iphone_Desde_1_NoIndex_True"
         assert failed_pages == 0
 
@@ -180,25 +218,656 @@ class TestApp:
         
         # Set up mocks
         with patch('app.get_exchange_rate') as mock_exchange, \
-             patch('app.plt') as mock_plt, \
-             patch('app.io.BytesIO') as mock_bytesio, \
-             patch('app.base64.b64encode') as mock_b64, \
+             patch('app.render_histogram', wraps=app_module.render_histogram) as mock_render, \
+             patch.object(app_module, 'chart_cache', PriceCache()) as chart_cache, \
              app.test_request_context('/?number_of_pages=1'):  # Create a request context
             
             # Configure mocks
-            mock_exchange.return_value = "400.0 ARS"
-            
-            mock_buffer = MagicMock()
-            mock_buffer.getvalue.return_value = b"image_data"
-            mock_bytesio.return_value = mock_buffer
-            
-            mock_b64.return_value = b"base64_encoded_image"
+            mock_exchange.return_value = 400.0
             
             # Call the function
             result = plot_prices(prices, item, url, failed_pages)
             
-            # Verify results
-            assert result == "base64_encoded_image"
-            mock_plt.figure.assert_called_once()
-            mock_plt.hist.assert_called_once()
-            mock_plt.savefig.assert_called_once()
+            # Verify results: the PNG is cached under the returned content hash
+            assert re.fullmatch(r"[0-9a-f]{64}", result)
+            assert chart_cache.get(result).startswith(b"\x89PNG")
+            mock_render.assert_called_once()
+            assert [line[2] for line in mock_render.call_args.kwargs['stat_lines']] == [
+                "Median", "Avg", "Max", "Min", "Std Dev", "25th percentile"
+            ]
+
+            # Rendering the same chart again is served from the chart cache
+            assert plot_prices(prices, item, url, failed_pages) == result
+            mock_render.assert_called_once()
+
+    @staticmethod
+    def _ml_page(prices):
+        """Build a minimal MercadoLibre listing page with the given prices."""
+        containers = "".join(
+            f'<li class="ui-search-result__wrapper">'
+            f'<h2 class="ui-search-item__title">Item {price}</h2>'
+            f'<a class="ui-search-link" href="https://example.com/{price}"></a>'
+            f'<span class="andes-money-amount__fraction">{price:,}</span></li>'
+            for price in prices
+        )
+        # Served in small chunks, the way a streamed response body arrives
+        page = f"<html><body><ol>{containers}</ol></body></html>".encode()
+        return [page[i:i + 64] for i in range(0, len(page), 64)]
+
+    def test_get_prices_concurrent_pages_keep_order(self):
+        """Pages fetched concurrently are merged in page order."""
+        pages = {
+            1: [300, 100],
+            51: [500],
+            101: [200, 400],
+        }
+
+        def fake_get(url, headers=None, stream=False):
+            start_item = int(re.search(r"_Desde_(\d+)_", url).group(1))
+            response = MagicMock()
+            response.iter_content.return_value = self._ml_page(pages[start_item])
+            response.raise_for_status.return_value = None
+            return response
+
+        with patch('app.http_get', side_effect=fake_get), patch.object(app_module, 'prices_cache', PriceCache()), \
+                patch.object(app_module, 'page_cache', PriceCache()):
+            prices, url, failed_pages, product_infos = get_prices("concurrent", 3)
+
+        assert prices.tolist() == [300, 100, 500, 200, 400]
+        assert product_infos.titles.tolist() == ["Item 300", "Item 100", "Item 500", "Item 200", "Item 400"]
+        # The price list is the products' own price column, not a copy
+        assert prices is product_infos.prices
+        assert url.endswith("_Desde_101_NoIndex_True")
+        assert failed_pages == 0
+
+    def test_fetch_pages_bounds_pages_in_flight(self):
+        """Pages behind a slow one are not all fetched ahead of it: at most MAX_FETCH_WORKERS are requested."""
+        release = threading.Event()
+        requested = []
+
+        def fake_get(url, headers=None, stream=False):
+            requested.append(url)
+            if url.endswith("/0"):
+                release.wait(5)
+            response = MagicMock()
+            response.iter_content.return_value = self._ml_page([100])
+            return response
+
+        urls = [f"https://example.com/{i}" for i in range(10)]
+        with patch('app.http_get', side_effect=fake_get), patch.object(app_module, 'MAX_FETCH_WORKERS', 3):
+            pages = app_module.fetch_pages(urls, app_module.iter_mercadolibre_products)
+            first = threading.Thread(target=next, args=(pages,))
+            first.start()
+            time.sleep(0.1)
+            assert len(requested) == 3
+            release.set()
+            first.join()
+            assert len(list(pages)) == 9
+        assert len(requested) == 10
+
+    def test_get_prices_concurrent_stops_at_empty_page(self):
+        """An empty page ends the search and later pages are ignored."""
+        def fake_get(url, headers=None, stream=False):
+            start_item = int(re.search(r"_Desde_(\d+)_", url).group(1))
+            if start_item == 101:
+                raise requests.exceptions.RequestException("late failure")
+            response = MagicMock()
+            response.iter_content.return_value = self._ml_page([100, 200] if start_item == 1 else [])
+            response.raise_for_status.return_value = None
+            return response
+
+        with patch('app.http_get', side_effect=fake_get), patch.object(app_module, 'prices_cache', PriceCache()), \
+                patch.object(app_module, 'page_cache', PriceCache()):
+            prices, url, failed_pages, product_infos = get_prices("emptypage", 3)
+
+        assert prices.tolist() == [100, 200]
+        assert url.endswith("_Desde_51_NoIndex_True")
+        # The failure on the page after the empty one is never counted
+        assert failed_pages == 0
+
+    def test_get_prices_reuses_cached_pages(self):
+        """A larger page count only downloads the pages not fetched before."""
+        requested = []
+
+        def fake_get(url, headers=None, stream=False):
+            start_item = int(re.search(r"_Desde_(\d+)_", url).group(1))
+            requested.append(start_item)
+            response = MagicMock()
+            response.iter_content.return_value = self._ml_page([start_item * 10, start_item * 10 + 1])
+            response.raise_for_status.return_value = None
+            return response
+
+        with patch('app.http_get', side_effect=fake_get), patch.object(app_module, 'prices_cache', PriceCache()), \
+                patch.object(app_module, 'page_cache', PriceCache()):
+            get_prices("notebook", 1)
+            assert requested == [1]
+            prices, url, failed_pages, product_infos = get_prices("notebook", 3)
+
+        assert sorted(requested) == [1, 51, 101]
+        assert prices.tolist() == [10, 11, 510, 511, 1010, 1011]
+        assert url.endswith("_Desde_101_NoIndex_True")
+
+    def test_serve_plot_cached_chart(self, client):
+        """Cached charts are served as PNG with an ETag and long-lived caching headers."""
+        with patch.object(app_module, 'chart_cache', PriceCache()) as chart_cache:
+            chart_cache.set("abc123", b"\x89PNG fake", "ar")
+            response = client.get('/plot/abc123.png')
+            assert response.status_code == 200
+            assert response.mimetype == 'image/png'
+            assert response.data == b"\x89PNG fake"
+            assert response.headers['ETag'] == '"abc123"'
+            assert 'immutable' in response.headers['Cache-Control']
+
+            revalidated = client.get('/plot/abc123.png', headers={'If-None-Match': '"abc123"'})
+            assert revalidated.status_code == 304
+
+    def test_serve_plot_rerenders_missing_chart(self, client):
+        """A chart missing from this worker's cache is rendered again from the search parameters."""
+        with patch.object(app_module, 'chart_cache', PriceCache()) as chart_cache, \
+                patch('app.get_prices', return_value=([1, 2, 3], "https://example.com", 0, [])), \
+                patch('app.plot_prices') as mock_plot:
+            def render(*args, **kwargs):
+                chart_cache.set("fresh", b"png", "ar")
+                return "fresh"
+            mock_plot.side_effect = render
+
+            with patch.object(app_module, 'query_stats', QueryStats()) as query_stats:
+                response = client.get('/plot/fresh.png?item=iphone&number_of_pages=1&country=ar&condition=all')
+            assert response.status_code == 200
+            assert response.data == b"png"
+            # Re-rendering a chart does not make its search more popular for warming
+            assert len(query_stats) == 0
+
+            # Prices changed since the page was rendered: served, but not cacheable under the old hash
+            response = client.get('/plot/stale.png?item=iphone&number_of_pages=1&country=ar&condition=all')
+            assert response.status_code == 200
+            assert 'no-cache' in response.headers['Cache-Control']
+
+    @patch('app.get_prices')
+    @patch('app.plot_prices')
+    def test_show_plot_links_chart_url(self, mock_plot, mock_get_prices, client):
+        """The results page references the chart endpoint instead of inlining the PNG."""
+        products = ProductTable.from_records(
+            [{'title': f'Item {p}', 'price': p, 'url': None} for p in (100000, 150000, 200000)]
+        )
+        mock_get_prices.return_value = (products.prices, "https://example.com", 0, products)
+        mock_plot.return_value = "abc123"
+
+        response = client.get('/show_plot?item=iphone&number_of_pages=1')
+
+        assert response.status_code == 200
+        assert b'/plot/abc123.png?' in response.data
+        assert b'data:image/png;base64' not in response.data
+
+        # The download keeps the extension of the configured chart format
+        with patch.object(app_module, 'CHART_FORMAT', 'svg'):
+            response = client.get('/show_plot?item=iphone&number_of_pages=1')
+        assert b'/plot/abc123.svg?' in response.data
+        assert b'_1_pages.svg"' in response.data
+
+    def test_serve_plot_unknown_chart(self, client):
+        """Without search parameters an unknown chart is a 404."""
+        with patch.object(app_module, 'chart_cache', PriceCache()):
+            assert client.get('/plot/missing.png').status_code == 404
+
+    @patch('app.get_prices')
+    def test_api_prices(self, mock_get_prices, client):
+        """The API returns stats, histogram bins and product picks as JSON."""
+        prices = [100000 + i * 1000 for i in range(40)]
+        products = ProductTable.from_records([{'title': f'Item {p}', 'price': p, 'url': None} for p in prices])
+        mock_get_prices.return_value = (products.prices, "https://example.com", 0, products)
+
+        response = client.get('/api/prices?item=iphone&number_of_pages=1', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/json'
+        assert response.headers['Content-Encoding'] == 'gzip'
+        data = json.loads(gzip.decompress(response.data))
+        assert data['stats']['median'] == float(np.median(prices))
+        assert sum(data['stats']['histogram']['counts']) == len(prices)
+        assert data['products']['cheapest']['price'] == 100000
+        assert data['products']['most_expensive']['price'] == 139000
+        assert len(data['products']['near_median']) == 10
+        assert data['exchange_rate']['rate'] == 400.0
+
+        # Polling with the ETag is answered with a 304 while the result is unchanged
+        revalidated = client.get('/api/prices?item=iphone&number_of_pages=1',
+                                 headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+        assert revalidated.status_code == 304
+
+    def test_api_prices_invalid_search(self, client):
+        response = client.get('/api/prices?item=invalid@item&number_of_pages=1')
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Invalid item parameter.'}
+
+    def test_api_prices_unknown_format(self, client):
+        assert client.get('/api/prices?item=iphone&number_of_pages=1&format=xml').status_code == 406
+
+    def test_api_batch_streams_ndjson(self, client):
+        """Batch results stream back one JSON line per spec, identical searches scraped once."""
+        searched = []
+
+        def fake_summary(item, number_of_pages, country_code, condition):
+            searched.append((item, number_of_pages, country_code, condition))
+            return None if item == "nothing" else {"item": item, "number_of_pages": number_of_pages}
+
+        specs = [
+            {"item": "iphone"},
+            {"item": "iphone", "number_of_pages": 1, "country": "ar", "condition": "all"},
+            {"item": "invalid@item"},
+            {"item": "nothing", "number_of_pages": 2, "country": "br"},
+        ]
+        with patch('app.search_summary', side_effect=fake_summary):
+            response = client.post('/api/batch', json=specs)
+            lines = [json.loads(line) for line in response.data.splitlines()]
+
+        assert response.mimetype == 'application/x-ndjson'
+        assert sorted(searched) == [("iphone", 1, "ar", "all"), ("nothing", 2, "br", "all")]
+        results = {line['index']: line for line in lines}
+        assert sorted(results) == [0, 1, 2, 3]
+        assert results[0]['item'] == results[1]['item'] == "iphone"
+        assert results[2]['error'] == "Invalid item parameter."
+        assert results[3]['error'] == "Failed to fetch prices."
+
+    def test_api_batch_rejects_invalid_body(self, client):
+        assert client.post('/api/batch', data='not json').status_code == 400
+        assert client.post('/api/batch', json={"searches": "iphone"}).status_code == 400
+
+    def test_batch_cli(self, tmp_path):
+        """The CLI reads JSON lines and prints the same NDJSON results."""
+        searches = tmp_path / "searches.jsonl"
+        searches.write_text('{"item": "iphone"}\n{"item": "mate", "country": "br"}\n')
+
+        with patch('app.search_summary', side_effect=lambda item, *args: {"item": item}):
+            result = app.test_cli_runner().invoke(args=['batch', str(searches)])
+
+        assert result.exit_code == 0
+        lines = [json.loads(line) for line in result.output.splitlines()]
+        assert sorted((line['index'], line['item']) for line in lines) == [(0, "iphone"), (1, "mate")]
+
+    def test_get_amazon_prices(self):
+        """Amazon prices are parsed in cents and reported in dollars."""
+        with open(os.path.join(os.path.dirname(__file__), 'fixtures', 'amazon_us.html'), 'rb') as f:
+            page = f.read()
+        response = MagicMock()
+        response.iter_content.return_value = [page]
+
+        with patch('app.http_get', return_value=response), patch.object(app_module, 'prices_cache', PriceCache()), \
+                patch.object(app_module, 'page_cache', PriceCache()):
+            prices, url, failed_pages, products = app_module.get_amazon_prices("headphones", 1)
+
+        assert prices.tolist() == [248.0, 1189.5, 29.99, 169.95]
+        assert url == "https://www.amazon.com/s?k=headphones"
+        assert failed_pages == 0
+
+    def test_scrape_amazon_prices_pages(self):
+        """Amazon searches read their pages through get_result_pages, caching each one and counting failures."""
+        with open(os.path.join(os.path.dirname(__file__), 'fixtures', 'amazon_us.html'), 'rb') as f:
+            page = f.read()
+
+        def fake_get(url, headers=None, stream=False):
+            if url.endswith("&page=3"):
+                raise requests.exceptions.RequestException("blocked")
+            response = MagicMock()
+            response.iter_content.return_value = [page]
+            return response
+
+        with patch('app.http_get', side_effect=fake_get) as mock_get, \
+                patch.object(app_module, 'page_cache', PriceCache()) as page_cache:
+            prices, url, failed_pages, products = app_module.scrape_amazon_prices("headphones", 3)
+
+        assert prices.tolist() == [248.0, 1189.5, 29.99, 169.95] * 2
+        assert products.prices is prices
+        assert url == "https://www.amazon.com/s?k=headphones&page=3"
+        assert failed_pages == 1
+        assert mock_get.call_args.kwargs['headers'] == app_module.AMAZON_HEADERS
+        assert ("amazon.com", "headphones", "all", 2) in page_cache
+        assert ("amazon.com", "headphones", "all", 3) not in page_cache
+
+    def test_price_history(self, client, tmp_path):
+        """Fresh scrapes are appended to the price history, which /api/history serves without scraping."""
+        response = MagicMock()
+        response.iter_content.return_value = self._ml_page([100000, 150000, 200000])
+        response.json.return_value = {"venta": "400.0 ARS"}
+
+        with patch('app.http_get', return_value=response) as mock_get, \
+                patch.object(app_module, 'price_history', PriceHistory(str(tmp_path / "history.sqlite3"))), \
+                patch.object(app_module, 'prices_cache', PriceCache()), \
+                patch.object(app_module, 'page_cache', PriceCache()):
+            get_prices("Notebook", 1)
+            get_prices("Notebook", 1)  # Served from the cache, so not recorded again
+            requests_made = mock_get.call_count
+
+            today = datetime.date.today().isoformat()
+            history = client.get(f'/api/history?item=notebook&from={today}&to={today}').get_json()
+            assert mock_get.call_count == requests_made
+            assert [point['median'] for point in history['points']] == [150000]
+            assert history['points'][0]['condition'] == 'all'
+            assert history['points'][0]['exchange_rate'] == 400.0
+
+            assert client.get('/api/history?item=notebook&from=2025-13-01').status_code == 400
+            assert client.get('/api/history?item=notebook&to=2000-01-01').get_json()['points'] == []
+
+        assert client.get('/api/history?item=notebook').status_code == 404  # Disabled by default
+
+    def test_large_scan(self, client):
+        """Searches of more than MAX_PAGES pages are folded page by page into streaming statistics."""
+        requested = []
+
+        def fake_get(url, headers=None, stream=False):
+            start_item = int(re.search(r"_Desde_(\d+)_", url).group(1))
+            requested.append(start_item)
+            response = MagicMock()
+            response.iter_content.return_value = self._ml_page([1000 * (start_item + i) for i in range(50)])
+            return response
+
+        with patch('app.http_get', side_effect=fake_get), \
+                patch.object(app_module, 'LARGE_SCAN_MAX_PAGES', 20), \
+                patch.object(app_module, 'LARGE_SCAN_SAMPLE_SIZE', 300), \
+                patch.object(app_module, 'prices_cache', PriceCache()), \
+                patch.object(app_module, 'page_cache', PriceCache()), \
+                patch.object(app_module, 'chart_cache', PriceCache()):
+            data = client.get('/api/prices?item=iphone&number_of_pages=20').get_json()
+            assert client.get('/show_plot?item=iphone&number_of_pages=20').status_code == 200
+            assert b'page-option-large' in client.get('/').data
+            assert b'between 1 and 20' in client.get('/show_plot?item=iphone&number_of_pages=21').data
+            # Large scans do not fill the page cache with their pages
+            assert len(app_module.page_cache) == 0
+
+        prices = [1000 * (start_item + i) for start_item in range(1, 1000, 50) for i in range(50)]
+        assert sorted(requested) == list(range(1, 1000, 50))  # Scraped once, then served from the cache
+        assert data["stats"]["approximate"] is True
+        assert data["stats"]["count"] == 1000
+        assert data["stats"]["mean"] == pytest.approx(np.mean(prices))
+        assert data["stats"]["median"] == pytest.approx(np.median(prices), rel=0.01)
+        assert sum(data["stats"]["histogram"]["counts"]) == 1000
+        assert data["products"]["cheapest"]["price"] == min(prices)
+        assert data["products"]["most_expensive"]["price"] == max(prices)
+        assert 0 < len(data["products"]["near_median"]) <= 10
+        assert b'page-option-large' not in client.get('/').data  # Off by default
+
+    def test_price_stats_of_large_scans(self):
+        """A large scan's statistics are only available for the outlier threshold it was scanned with."""
+        streaming = StreamingStats()
+        streaming.add([100, 200, 300, 400])
+        sketch = streaming.finish(threshold=app_module.OUTLIER_THRESHOLD)
+
+        assert app_module.price_stats(sketch) is sketch
+        with pytest.raises(ValueError, match="outlier threshold"):
+            app_module.price_stats(sketch, threshold=2)
+        with pytest.raises(ValueError):
+            app_module.price_stats(sketch, threshold=None)
+
+    def test_metrics(self, client):
+        """With metrics enabled, /show_plot reports its stages in Server-Timing and /metrics exposes them."""
+        def fake_get(url, headers=None, stream=False):
+            response = MagicMock()
+            if "_Desde_51_" in url:
+                response.raise_for_status.side_effect = requests.exceptions.HTTPError("503 Server Error")
+            response.iter_content.return_value = self._ml_page([100000, 150000, 200000])
+            response.json.return_value = {"venta": "400.0 ARS"}
+            return response
+
+        with patch('app.http_get', side_effect=fake_get), \
+                patch.object(app_module.metrics, 'enabled', True), \
+                patch.object(app_module, 'prices_cache', PriceCache()), \
+                patch.object(app_module, 'page_cache', PriceCache()), \
+                patch.object(app_module, 'chart_cache', PriceCache()):
+            response = client.get('/show_plot?item=metrics&number_of_pages=2')
+            assert response.status_code == 200
+            stages = [entry.split(";")[0] for entry in response.headers['Server-Timing'].split(", ")]
+            assert stages == ["search", "stats", "chart", "render"]
+
+            exposition = client.get('/metrics')
+            assert exposition.mimetype == 'text/plain'
+            lines = exposition.get_data(as_text=True).splitlines()
+            for stage in ("fetch", "parse", "search", "chart"):
+                assert any(line.startswith(f'mercadix_stage_seconds_count{{stage="{stage}"}}') for line in lines)
+            assert 'mercadix_failed_pages_total{country="ar"} 1' in lines
+            assert 'mercadix_cache_events_total{cache="prices",event="misses"} 1' in lines
+            assert any(line.startswith('mercadix_request_seconds_count{endpoint="show_plot"}') for line in lines)
+
+        # Disabled by default: no header, no endpoint
+        assert 'Server-Timing' not in client.get('/').headers
+        assert client.get('/metrics').status_code == 404
+
+    def _async_client(self, pages, failures=None, attempts=None, delays=None):
+        """An httpx.AsyncClient whose transport serves MercadoLibre pages keyed by start item.
+
+        `failures` holds, per page, status codes to answer and exceptions to
+        raise before serving it, `delays` seconds to wait before answering;
+        requests are counted in `attempts`.
+        """
+        httpx = pytest.importorskip("httpx")
+
+        async def handler(request):
+            start_item = int(re.search(r"_Desde_(\d+)_", str(request.url)).group(1))
+            if attempts is not None:
+                attempts[start_item] = attempts.get(start_item, 0) + 1
+            await asyncio.sleep((delays or {}).get(start_item, 0))
+            pending = (failures or {}).get(start_item)
+            if pending:
+                failure = pending.pop(0)
+                if isinstance(failure, Exception):
+                    raise failure
+                return httpx.Response(failure)
+            return httpx.Response(200, content=b"".join(self._ml_page(pages[start_item])))
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    def test_search_prices_async(self):
+        """The async path fetches pages concurrently, keeps their order, retries 5xx and caches the result."""
+        attempts = {}
+        # The first page answers last, and the second one only after a 503
+        pages = {1: [300, 100], 51: [500], 101: [200, 400]}
+
+        async def search():
+            async with self._async_client(pages, failures={51: [503]}, attempts=attempts, delays={1: 0.05}) as client:
+                return await app_module.search_prices_async(client, "concurrent", 3, "ar", "all")
+
+        with patch('http_client.BACKOFF_FACTOR', 0), \
+                patch.object(app_module, 'prices_cache', PriceCache()) as prices_cache, \
+                patch.object(app_module, 'page_cache', PriceCache()):
+            prices, url, failed_pages, products = asyncio.run(search())
+
+            assert prices.tolist() == [300, 100, 500, 200, 400]
+            assert url.endswith("_Desde_101_NoIndex_True")
+            assert failed_pages == 0
+            assert ("concurrent", 3, "ar", "all") in prices_cache
+            # The sync path now serves the same search from the cache
+            assert get_prices("concurrent", 3)[3] is products
+        assert attempts == {1: 1, 51: 2, 101: 1}
+
+    def test_search_prices_async_failed_pages(self):
+        """Pages that keep failing, time out or cannot connect are counted as failed, like in the sync path."""
+        httpx = pytest.importorskip("httpx")
+        attempts = {}
+        pages = {1: [300, 100], 51: [500], 101: [200, 400]}
+        failures = {51: [500] * (http_client.MAX_RETRIES + 1), 101: [httpx.ReadTimeout("slow")]}
+
+        async def search():
+            async with self._async_client(pages, failures, attempts) as client:
+                return await app_module.search_prices_async(client, "flaky", 3, "ar", "all")
+
+        with patch('http_client.BACKOFF_FACTOR', 0), patch.object(app_module, 'prices_cache', PriceCache()), \
+                patch.object(app_module, 'page_cache', PriceCache()) as page_cache:
+            prices, url, failed_pages, _ = asyncio.run(search())
+
+            assert prices.tolist() == [300, 100]
+            assert failed_pages == 2
+            assert len(page_cache) == 1
+        # 5xx responses are retried, timeouts are not (httpx only retries failed connections)
+        assert attempts == {1: 1, 51: http_client.MAX_RETRIES + 1, 101: 1}
+
+    def test_search_prices_async_coalesces(self):
+        """Identical searches running at once, from different event loops, scrape the marketplace once."""
+        attempts = {}
+        pages = {1: [300, 100]}
+
+        async def search():
+            async with self._async_client(pages, attempts=attempts, delays={1: 0.1}) as client:
+                return await app_module.search_prices_async(client, "shared", 1, "ar", "all")
+
+        with patch.object(app_module, 'prices_cache', PriceCache()), \
+                patch.object(app_module, 'page_cache', PriceCache()), \
+                patch.object(app_module, 'in_flight', SingleFlight()) as in_flight:
+            results = [None] * 3
+            threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, asyncio.run(search())))
+                       for i in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert attempts == {1: 1}
+        assert in_flight.shared == 2
+        assert all(result[0].tolist() == [300, 100] for result in results)
+
+    def test_async_serving_mode(self, client):
+        """With SERVING_MODE=async, the views are served on one event loop through one pooled client."""
+        pages = {1: [100000, 150000, 200000]}
+        attempts = {}
+        async_client = self._async_client(pages, attempts=attempts)
+        views = {"show_plot": app_module.show_plot_async, "api_prices": app_module.api_prices_async}
+
+        with patch.dict(app.view_functions, views), \
+                patch('app.shared_async_client', return_value=async_client), \
+                patch.object(app_module, 'prices_cache', PriceCache()), \
+                patch.object(app_module, 'page_cache', PriceCache()), \
+                patch('app.plot_prices', return_value="abc123"):
+            response = client.get('/show_plot?item=iphone&number_of_pages=1')
+            api_response = client.get('/api/prices?item=iphone&number_of_pages=1')
+
+        assert response.status_code == 200
+        assert '/plot/abc123.png?' in response.get_data(as_text=True)
+        assert 'Item 150000' in response.get_data(as_text=True)
+        assert api_response.status_code == 200
+        assert api_response.get_json()["stats"]["median"] == 150000
+        # The second request is served from the cache
+        assert attempts == {1: 1}
+        assert app_module.event_loop() is app_module.event_loop()
+
+    def test_search_job(self, client):
+        """A search job returns at once, reports page progress and ends with the summary and results URL."""
+        pages = {1: [300, 100], 51: [500], 101: [200, 400]}
+        release = threading.Event()
+
+        def fake_get(url, headers=None, stream=False):
+            start_item = int(re.search(r"_Desde_(\d+)_", url).group(1))
+            if start_item == 101:
+                release.wait(5)
+            response = MagicMock()
+            response.iter_content.return_value = self._ml_page(pages[start_item])
+            response.raise_for_status.return_value = None
+            return response
+
+        with patch('app.http_get', side_effect=fake_get), patch.object(app_module, 'MAX_FETCH_WORKERS', 1), \
+                patch.object(app_module, 'prices_cache', PriceCache()) as prices_cache, \
+                patch.object(app_module, 'page_cache', PriceCache()):
+            response = client.post('/api/jobs', json={"item": "notebook", "number_of_pages": 3})
+            assert response.status_code == 202
+            status_url = response.get_json()['status_url']
+            assert response.headers['Location'] == status_url
+
+            for _ in range(500):
+                status = client.get(status_url).get_json()
+                if status['pages_done'] == 2:
+                    break
+                time.sleep(0.01)
+            assert status['status'] == 'running'
+            assert status['pages_total'] == 3
+
+            release.set()
+            for _ in range(500):
+                status = client.get(status_url).get_json()
+                if status['status'] == 'done':
+                    break
+                time.sleep(0.01)
+
+            assert status['result']['stats']['count'] == 5
+            assert status['result_url'].startswith('/show_plot?item=notebook&number_of_pages=3')
+            # The scraped prices are cached for the results page
+            assert ("notebook", 3, "ar", "all") in prices_cache
+
+    def test_index_post_job_mode(self, client):
+        """With JOB_MODE the search form starts a job and shows its progress page."""
+        with patch.object(app_module, 'JOB_MODE', True), \
+                patch('app.search_summary', return_value={"item": "iphone"}):
+            response = client.post('/', data={"item": "iphone", "number_of_pages": "1"})
+            assert response.status_code == 302
+            assert "/jobs/" in response.location
+
+            page = client.get(response.location)
+            assert page.status_code == 200
+            assert b'/api/jobs/' in page.data
+
+    def test_unknown_job(self, client):
+        assert client.get('/api/jobs/missing').status_code == 404
+        assert client.get('/jobs/missing').status_code == 404
+
+    def test_warm_search(self):
+        """Warming scrapes a popular search that is not cached and renders its chart ahead of time."""
+        def fake_get(url, headers=None, stream=False):
+            response = MagicMock()
+            response.iter_content.return_value = self._ml_page([100000, 150000, 200000])
+            response.raise_for_status.return_value = None
+            return response
+
+        with patch('app.http_get', side_effect=fake_get) as mock_get, \
+                patch('app.get_exchange_rate', return_value=400.0), \
+                patch.object(app_module, 'prices_cache', PriceCache()) as prices_cache, \
+                patch.object(app_module, 'page_cache', PriceCache()), \
+                patch.object(app_module, 'chart_cache', PriceCache()) as chart_cache:
+            search = ("notebook", 1, "ar", "all")
+            assert app_module.warm_cost(search) == 1
+            app_module.warm_search(search)
+
+            assert search in prices_cache
+            assert len(chart_cache) == 1
+            # Cached long enough: the next cycle costs nothing and makes no request
+            assert app_module.warm_cost(search) == 0
+            app_module.warm_search(search)
+            assert mock_get.call_count == 1
+
+            # The results page finds the chart already rendered
+            with patch('app.render_histogram') as mock_render, \
+                    app.test_request_context('/show_plot?item=notebook&number_of_pages=1'):
+                prices, url, failed_pages, _ = get_prices(*search)
+                plot_prices(prices, "notebook", url, failed_pages, condition="all", number_of_pages="1")
+            mock_render.assert_not_called()
+
+    def test_warm_search_refetches_cached_pages(self):
+        """Warming does not pass pages cached a while ago off as a freshly scraped result."""
+        now = [0.0]
+        clock = lambda: now[0]
+        page_cache = PriceCache(ttls={"ar": 600}, stale_ttl=0, clock=clock)
+        prices_cache = PriceCache(ttls={"ar": 600}, stale_ttl=0, clock=clock)
+        search = ("notebook", 1, "ar", "all")
+        page_cache.set(app_module.search_page_keys(*search)[0], ProductTable.from_records([]), "ar")
+        now[0] = 590.0
+
+        def fake_get(url, headers=None, stream=False):
+            response = MagicMock()
+            response.iter_content.return_value = self._ml_page([100000, 150000, 200000])
+            response.raise_for_status.return_value = None
+            return response
+
+        with patch('app.http_get', side_effect=fake_get) as mock_get, \
+                patch.object(app_module, 'prices_cache', prices_cache), \
+                patch.object(app_module, 'page_cache', page_cache), \
+                patch.object(app_module, 'chart_cache', PriceCache()):
+            assert app_module.warm_cost(search) == 1
+            app_module.warm_search(search)
+
+        assert mock_get.call_count == 1
+        assert prices_cache.get(search)[0].tolist() == [100000, 150000, 200000]
+        assert prices_cache.fresh_for(search) == 600
+
+    def test_searches_are_counted_for_warming(self, client):
+        with patch('app.get_prices', return_value=(None, None, 0, None)), \
+                patch.object(app_module, 'query_stats', QueryStats()) as query_stats:
+            client.get('/api/prices?item=iphone&number_of_pages=2&country=br')
+            client.get('/api/prices?item=iphone&number_of_pages=2&country=br')
+            client.get('/api/prices?item=mate&number_of_pages=1')
+
+        assert query_stats.top(2) == [("iphone", 2, "br", "all"), ("mate", 1, "ar", "all")]
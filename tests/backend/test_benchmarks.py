@@ -0,0 +1,58 @@
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+# Add the parent directory to the Python path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from bench import PAGES, RESULTS_PER_PAGE, FixtureResponse, full_page, main, regressions, run_suite
+from parsers import iter_amazon_products, iter_mercadolibre_products
+
+
+def test_fixture_pages_hold_a_full_page_of_results():
+    for domain, spec in PAGES.items():
+        parse = iter_amazon_products if domain == "amazon.com" else iter_mercadolibre_products
+        products = list(parse(FixtureResponse(full_page(*spec)).iter_content(1024)))
+        assert len(products) >= RESULTS_PER_PAGE, domain
+
+
+def test_regressions():
+    baseline = {"benchmarks": {"plot_prices": 0.2, "compute_stats_150_prices": 0.001}}
+    results = {
+        "plot_prices": {"median": 0.26},
+        "compute_stats_150_prices": {"median": 0.0012},
+        "show_plot_cold": {"median": 9.0},  # Not in the baseline yet
+    }
+    assert regressions(results, baseline, threshold=0.25) == {"plot_prices": (0.2, 0.26)}
+
+
+def test_suite_runs_offline():
+    results = run_suite(rounds=1, selected="compute_stats")
+    assert sorted(results) == ["compute_stats_150_prices", "compute_stats_3000_prices"]
+    assert all(timings["min"] <= timings["median"] <= timings["max"] for timings in results.values())
+
+
+def test_suite_keeps_off_the_app_files(tmp_path):
+    """A run imports the app with its own settings, not the ones it is given, and puts them back afterwards."""
+    history = tmp_path / "history.sqlite3"
+    code = ("import os, sys; sys.path.insert(0, 'benchmarks'); from bench import run_suite\n"
+            "run_suite(rounds=1, selected='compute_stats_150')\n"
+            "print(os.environ['PRICE_HISTORY_PATH'])")
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True,
+                            env={**os.environ, "PRICE_HISTORY_PATH": str(history)}).stdout
+    assert output.strip() == str(history)
+    assert not history.exists()
+
+
+def test_first_run_records_the_baseline(tmp_path):
+    baseline = str(tmp_path / "baseline.json")
+    with patch.dict(os.environ):
+        assert main(["-k", "compute_stats_150", "--rounds", "1", "--baseline", baseline]) == 0
+        with open(baseline) as f:
+            assert list(json.load(f)["benchmarks"]) == ["compute_stats_150_prices"]
+        # Later runs compare with it; a huge threshold keeps machine noise out of the test
+        assert main(["-k", "compute_stats_150", "--rounds", "1", "--baseline", baseline, "--threshold", "100"]) == 0
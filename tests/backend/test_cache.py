@@ -0,0 +1,233 @@
+import os
+import sys
+import struct
+import threading
+import time
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from conftest import FakeClock
+from cache import (PageCodec, PriceCache, RedisBackend, SQLiteBackend, decode_search_result, encode_search_result,
+                   estimate_size)
+from products import ProductTable
+from stats import StreamingStats
+
+
+def test_lru_eviction_by_entry_count():
+    """The least recently used entry is evicted once the cache is full."""
+    cache = PriceCache(max_entries=2)
+    cache.set("a", [1])
+    cache.set("b", [2])
+    assert cache.get("a") == [1]  # "a" is now the most recently used
+    cache.set("c", [3])
+
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_eviction_by_byte_budget():
+    """Entries are evicted until the cache fits its byte budget."""
+    cache = PriceCache(max_entries=100, max_bytes=3000)
+    for key in range(10):
+        cache.set(key, list(range(50)))
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 3000
+    assert stats["evictions"] > 0
+    assert 9 in cache and 0 not in cache
+
+
+def test_per_country_ttl():
+    """Entries expire according to their country's TTL."""
+    clock = FakeClock()
+    cache = PriceCache(ttls={"ar": 10, "us": 100}, stale_ttl=0, clock=clock)
+    cache.set("ar-key", [1], "ar")
+    cache.set("us-key", [2], "us")
+
+    clock.now = 50
+    assert cache.get("ar-key") is None
+    assert cache.get("us-key") == [2]
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["expirations"] == 1
+
+
+def test_fresh_for():
+    """fresh_for reports how long an entry stays fresh."""
+    clock = FakeClock()
+    cache = PriceCache(ttls={"ar": 100}, clock=clock)
+    cache.set("key", [1], "ar")
+
+    clock.now = 30
+    assert cache.fresh_for("key") == 70
+    clock.now = 130
+    assert cache.fresh_for("key") == -30
+    assert cache.fresh_for("missing") is None
+
+
+def test_stale_while_revalidate():
+    """A stale entry is served while a single background refresh replaces it."""
+    clock = FakeClock()
+    cache = PriceCache(ttls={"ar": 10}, stale_ttl=30, clock=clock)
+    cache.set("key", "old", "ar")
+    refreshed = threading.Event()
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        cache.set("key", "new", "ar")
+        refreshed.set()
+
+    clock.now = 20
+    assert cache.get("key", refresh=refresh) == "old"
+    assert refreshed.wait(5)
+    assert cache.get("key") == "new"
+    assert len(calls) == 1
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_too_stale_entry_is_a_miss():
+    """Past the stale grace period the entry is dropped and reloaded by the caller."""
+    clock = FakeClock()
+    cache = PriceCache(ttls={"ar": 10}, stale_ttl=30, clock=clock)
+    cache.set("key", "old", "ar")
+
+    clock.now = 100
+    assert cache.get("key", refresh=lambda: None) is None
+    assert "key" not in cache
+
+
+PRODUCTS = ProductTable.from_records([
+    {"title": "Phone A", "price": 1000, "url": "https://example.com/a"},
+    {"title": "Teléfono B", "price": 2500.5, "url": None},
+])
+SEARCH_RESULT = (
+    PRODUCTS.prices,
+    "https://listado.mercadolibre.com.ar/iphone_Desde_1_NoIndex_True",
+    1,
+    PRODUCTS,
+)
+
+
+class FakeRedis:
+    """In-memory stand-in for a Redis client."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def assert_same_result(result, expected):
+    prices, url, failed_pages, products = result
+    assert prices.tolist() == expected[0].tolist()
+    assert (url, failed_pages, products) == expected[1:]
+    assert prices is products.prices
+
+
+def test_search_result_codec_round_trip():
+    """Search results survive the compact columnar encoding unchanged."""
+    data = encode_search_result(SEARCH_RESULT)
+    assert isinstance(data, bytes)
+    assert_same_result(decode_search_result(data), SEARCH_RESULT)
+
+
+def test_large_scan_result_codec_round_trip():
+    """A large scan's streaming statistics are stored next to its sampled products."""
+    streaming = StreamingStats()
+    streaming.add([1000, 2500, 4000, 1200])
+    stats = streaming.finish(sample=PRODUCTS.prices)
+    prices, url, failed_pages, products = decode_search_result(
+        encode_search_result((stats, SEARCH_RESULT[1], 0, PRODUCTS))
+    )
+
+    assert prices.to_state() == stats.to_state()
+    assert (url, failed_pages, products) == (SEARCH_RESULT[1], 0, PRODUCTS)
+
+
+def test_sqlite_backend_is_shared_between_workers(tmp_path):
+    """A result cached by one worker is served to another from the same file."""
+    path = str(tmp_path / "cache.sqlite3")
+    worker_a = PriceCache(backend=SQLiteBackend(path))
+    worker_b = PriceCache(backend=SQLiteBackend(path))
+
+    worker_a.set(("iphone", 3, "ar", "all"), SEARCH_RESULT, "ar")
+
+    assert_same_result(worker_b.get(("iphone", 3, "ar", "all")), SEARCH_RESULT)
+    assert worker_b.stats()["shared_hits"] == 1
+    # The result is now in worker_b's local tier too
+    assert ("iphone", 3, "ar", "all") in worker_b
+
+
+def test_shared_entries_keep_their_age():
+    """An entry loaded from the shared tier expires based on when it was first stored."""
+    redis = FakeRedis()
+    writer = PriceCache(backend=RedisBackend(redis))
+    writer.set("key", SEARCH_RESULT, "ar")
+    # Pretend the entry was written an hour ago
+    stored_key, data = next(iter(redis.data.items()))
+    redis.data[stored_key] = struct.pack("!d", time.time() - 3600) + data[8:]
+
+    reader = PriceCache(ttls={"ar": 60}, stale_ttl=0, backend=RedisBackend(redis))
+    assert reader.get("key") is None
+
+
+def test_oversized_shared_entry_is_served():
+    """A shared entry too large for the local tier is still returned, just not kept locally."""
+    redis = FakeRedis()
+    PriceCache(backend=RedisBackend(redis)).set("key", SEARCH_RESULT, "ar")
+
+    reader = PriceCache(max_bytes=10, backend=RedisBackend(redis))
+    assert_same_result(reader.get("key"), SEARCH_RESULT)
+    assert "key" not in reader
+
+
+def test_sqlite_backend_purges_expired_rows(tmp_path):
+    """Every PURGE_EVERY writes, rows past their expiry are deleted."""
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+    backend.set("old", b"value", -1)
+    for i in range(SQLiteBackend.PURGE_EVERY - 1):
+        backend.set(f"key{i}", b"value", 60)
+
+    rows = backend._connection().execute("SELECT key FROM cache").fetchall()
+    assert ("old",) not in rows
+    assert len(rows) == SQLiteBackend.PURGE_EVERY - 1
+
+
+def test_delete_drops_the_shared_entry():
+    """A deleted entry is gone from both tiers."""
+    redis = FakeRedis()
+    cache = PriceCache(backend=RedisBackend(redis))
+    cache.set("key", SEARCH_RESULT, "ar")
+    cache.delete("key")
+    cache.delete("missing")
+
+    assert "key" not in cache
+    assert redis.data == {}
+    assert cache.get("key") is None
+
+
+def test_page_codec_round_trip():
+    """Cached result pages survive the compact encoding unchanged."""
+    products = SEARCH_RESULT[3]
+    assert PageCodec.loads(PageCodec.dumps(products)) == products
+
+
+def test_search_result_prices_are_counted_once():
+    """A search's price list is its products' price column, so the size estimate counts it once."""
+    products = ProductTable.from_records([{"title": "Phone", "price": p, "url": None} for p in range(1000)])
+    with_prices = estimate_size((products.prices, "url", 0, products))
+    without_prices = estimate_size((None, "url", 0, products))
+
+    assert with_prices - without_prices < products.prices.nbytes
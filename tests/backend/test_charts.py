@@ -0,0 +1,60 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from charts import format_x, render_histogram
+
+PRICES = [100000, 120000, 125000, 150000, 180000, 200000, 210000, 450000]
+STAT_LINES = [
+    (150000, "red", "Median", "Median: 150,000 ARS", "solid", 1),
+    (180000, "blue", "Max", "Max: 180,000 ARS", "dashed", 1),
+]
+
+
+def render(values=PRICES, fmt="png", title="Histogram"):
+    counts, edges = np.histogram(values, bins=20)
+    return render_histogram(
+        counts,
+        edges,
+        title=title,
+        xlabel="Price in ARS",
+        stat_lines=STAT_LINES,
+        label_offset=500,
+        footnote="Outliers: 900,000",
+        fmt=fmt,
+    )
+
+
+def test_format_x():
+    assert format_x(1234567.8, 0) == "1,234,567"
+
+
+@pytest.mark.parametrize("fmt, signature", [("png", b"\x89PNG"), ("png8", b"\x89PNG"), ("svg", b"<?xml")])
+def test_render_formats(fmt, signature):
+    assert render(fmt=fmt).startswith(signature)
+
+
+def test_palette_png_is_smaller():
+    assert len(render(fmt="png8")) < len(render(fmt="png"))
+
+
+def test_template_is_reset_between_charts():
+    """Reusing the template figure gives the same image as the first render."""
+    first = render()
+    render(values=[1, 2, 3], title="Something else")
+    assert render() == first
+
+
+def test_concurrent_rendering():
+    """Threads render independently without interfering with each other."""
+    expected = {title: render(title=title) for title in ("A", "B", "C", "D")}
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda title: (title, render(title=title)), list(expected) * 3))
+    for title, image in results:
+        assert image == expected[title]
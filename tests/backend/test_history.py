@@ -0,0 +1,58 @@
+import os
+import sys
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from conftest import FakeClock
+from history import PriceHistory
+from products import ProductTable
+from stats import compute_stats
+
+DAY = 86400
+
+
+def record(history, item, prices, country_code="ar", condition="all", number_of_pages=1):
+    products = ProductTable.from_records([{'title': f'Item {p}', 'price': p, 'url': None} for p in prices])
+    return history.record(item, number_of_pages, country_code, condition, compute_stats(prices), products,
+                          exchange_rate=1000.0)
+
+
+def test_series_range_queries(tmp_path):
+    clock = FakeClock(1_700_000_000.0)
+    history = PriceHistory(str(tmp_path / "history.sqlite3"), clock=clock)
+    start = clock.now
+    for day, median in enumerate((100, 110, 120)):
+        record(history, "iPhone", [median - 10, median, median + 10])
+        record(history, "notebook", [5, 6, 7])
+        record(history, "iphone", [1, 2, 3], country_code="br")
+        clock.now += DAY
+
+    series = history.series("  iphone ", "ar")  # Case and spacing do not matter
+    assert [point["median"] for point in series] == [100, 110, 120]
+    assert series[0]["recorded_at"] == start
+    assert series[0]["exchange_rate"] == 1000.0
+    assert series[0]["count"] == 3
+
+    between = history.series("iphone", "ar", since=start + DAY, until=start + 2 * DAY)
+    assert [point["median"] for point in between] == [110]
+    assert history.series("iphone", "ar", condition="new") == []
+    assert history.series("iphone", "ar", number_of_pages=1) == series
+
+
+def test_products_are_kept(tmp_path):
+    history = PriceHistory(str(tmp_path / "history.sqlite3"))
+    search_id = record(history, "iphone", [300, 100, 200])
+
+    assert history.products(search_id).to_records() == [
+        {'title': 'Item 300', 'price': 300, 'url': None},
+        {'title': 'Item 100', 'price': 100, 'url': None},
+        {'title': 'Item 200', 'price': 200, 'url': None},
+    ]
+    assert history.products(search_id + 1) is None
+
+
+def test_history_is_shared_by_every_connection(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    record(PriceHistory(path), "iphone", [1, 2, 3])
+    assert len(PriceHistory(path).series("iphone", "ar")) == 1
@@ -0,0 +1,147 @@
+import asyncio
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch, MagicMock
+
+import pytest
+import requests
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import http_client
+
+
+def test_session_is_shared():
+    """All callers get the same pooled session."""
+    assert http_client.get_session() is http_client.get_session()
+
+
+def test_session_retries_rate_limits_and_server_errors():
+    """The mounted adapter retries 429/5xx responses with backoff."""
+    adapter = http_client.get_session().get_adapter("https://listado.mercadolibre.com.ar/")
+    retry = adapter.max_retries
+    assert retry.total == http_client.MAX_RETRIES
+    assert 429 in retry.status_forcelist
+    assert 503 in retry.status_forcelist
+    assert retry.backoff_factor == http_client.BACKOFF_FACTOR
+
+
+def test_http_get_applies_default_timeouts():
+    """Requests always carry a connect/read timeout."""
+    session = MagicMock()
+    with patch('http_client.get_session', return_value=session):
+        http_client.http_get("https://example.com/page", headers={"X": "1"})
+
+    session.get.assert_called_once_with(
+        "https://example.com/page",
+        headers={"X": "1"},
+        timeout=(http_client.CONNECT_TIMEOUT, http_client.READ_TIMEOUT),
+        stream=False,
+    )
+
+
+def test_session_caps_connections_per_host():
+    """Requests to one host wait for one of its MAX_CONNECTIONS_PER_HOST pooled connections."""
+    adapter = http_client.get_session().get_adapter("https://listado.mercadolibre.com.ar/")
+    assert adapter._pool_block
+    assert adapter._pool_maxsize == http_client.MAX_CONNECTIONS_PER_HOST
+
+
+def test_retries_count_as_requests():
+    """Every attempt the session retries counts in recent_request_count()."""
+    statuses = [503, 200]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(statuses.pop(0))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with patch('http_client.BACKOFF_FACTOR', 0):
+            session = http_client._build_session()
+        http_client._request_times.clear()
+        with patch('http_client.get_session', return_value=session):
+            response = http_client.http_get(f"http://127.0.0.1:{server.server_port}/")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert response.status_code == 200
+    assert http_client.recent_request_count() == 2
+
+
+def test_recent_request_count():
+    """Requests are counted for REQUEST_WINDOW seconds after they start."""
+    with patch('http_client.get_session', return_value=MagicMock()), patch('http_client.time') as mock_time:
+        mock_time.monotonic.return_value = 1000.0
+        http_client._request_times.clear()
+        http_client.http_get("https://example.com/a")
+        http_client.http_get("https://example.com/b")
+        assert http_client.recent_request_count() == 2
+
+        mock_time.monotonic.return_value = 1000.0 + http_client.REQUEST_WINDOW + 1
+        assert http_client.recent_request_count() == 0
+
+
+def test_status_counts():
+    """Responses are counted per host and status code, and failed requests as errors."""
+    session = MagicMock()
+    session.get.side_effect = [MagicMock(status_code=200), MagicMock(status_code=503),
+                               requests.exceptions.ConnectionError("refused")]
+    before = http_client.status_counts()
+    with patch('http_client.get_session', return_value=session):
+        http_client.http_get("https://status.example.com/1")
+        http_client.http_get("https://status.example.com/2")
+        with pytest.raises(requests.exceptions.ConnectionError):
+            http_client.http_get("https://status.example.com/3")
+
+    after = http_client.status_counts()
+    for status in (200, 503, "error"):
+        key = ("status.example.com", status)
+        assert after[key] == before.get(key, 0) + 1
+
+
+def test_async_http_get_maps_errors():
+    """The async client retries 429/5xx and raises requests' exceptions, like http_get."""
+    httpx = pytest.importorskip("httpx")
+    answers = {"/flaky": [503, 200], "/down": [500] * (http_client.MAX_RETRIES + 1), "/missing": [404]}
+    failures = {"/slow": httpx.ReadTimeout("slow"), "/refused": httpx.ConnectError("refused")}
+
+    def handler(request):
+        if request.url.path in failures:
+            raise failures[request.url.path]
+        return httpx.Response(answers[request.url.path].pop(0), content=b"ok")
+
+    async def get(path):
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await http_client.async_http_get(client, "https://async.example.com" + path)
+
+    with patch('http_client.BACKOFF_FACTOR', 0):
+        assert asyncio.run(get("/flaky")).content == b"ok"
+        for path, error in (("/down", requests.exceptions.HTTPError), ("/missing", requests.exceptions.HTTPError),
+                            ("/slow", requests.exceptions.Timeout), ("/refused", requests.exceptions.ConnectionError)):
+            with pytest.raises(error):
+                asyncio.run(get(path))
+    assert answers == {"/flaky": [], "/down": [], "/missing": []}
+
+
+def test_shared_async_client_per_event_loop():
+    """Each event loop reuses one async client; another loop gets its own."""
+    pytest.importorskip("httpx")
+
+    async def clients():
+        return http_client.shared_async_client(), http_client.shared_async_client()
+
+    first, again = asyncio.run(clients())
+    other, _ = asyncio.run(clients())
+    assert first is again
+    assert other is not first
@@ -0,0 +1,86 @@
+import os
+import sys
+import threading
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from conftest import FakeClock
+from jobs import JobQueue, report_progress
+
+
+def wait_for(queue, job):
+    for _ in range(500):
+        if job.finished:
+            return job
+        threading.Event().wait(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_job_reports_progress_and_result():
+    release = threading.Event()
+    progress_seen = threading.Event()
+
+    def work():
+        report_progress(1, 3)
+        progress_seen.set()
+        release.wait(5)
+        report_progress(3, 3)
+        return "summary"
+
+    queue = JobQueue()
+    job = queue.submit("search", work)
+    assert progress_seen.wait(5)
+    assert queue.get(job.id).to_dict() == {"id": job.id, "status": "running", "pages_done": 1, "pages_total": 3}
+
+    release.set()
+    wait_for(queue, job)
+    assert job.to_dict() == {"id": job.id, "status": "done", "pages_done": 3, "pages_total": 3, "result": "summary"}
+
+
+def test_duplicate_submissions_share_a_job():
+    """A search that is already queued or running is not started twice."""
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+
+    queue = JobQueue()
+    first = queue.submit("search", work)
+    assert queue.submit("search", work) is first
+    release.set()
+    wait_for(queue, first)
+
+    # Once finished, the same key starts a new job
+    second = queue.submit("search", work)
+    wait_for(queue, second)
+    assert second is not first
+    assert len(calls) == 2
+
+
+def test_failed_job_keeps_the_error():
+    def work():
+        raise RuntimeError("upstream down")
+
+    queue = JobQueue()
+    job = wait_for(queue, queue.submit("search", work))
+    assert job.to_dict()["status"] == "failed"
+    assert job.to_dict()["error"] == "upstream down"
+
+
+def test_finished_jobs_expire():
+    clock = FakeClock()
+    queue = JobQueue(ttl=60, clock=clock)
+    job = wait_for(queue, queue.submit("search", lambda: 1))
+
+    clock.now = 59
+    assert queue.get(job.id) is job
+    clock.now = 61
+    assert queue.get(job.id) is None
+    assert len(queue) == 0
+
+
+def test_progress_outside_a_job_is_ignored():
+    report_progress(1, 2)
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import threading
+from unittest.mock import patch
+
+import pytest
+import requests
+
+# Add the parent directory to the Python path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import app as app_module
+from bench import RESULTS_PER_PAGE
+from load_test import percentile
+from stub_server import StubServer
+
+
+@pytest.fixture
+def stub():
+    server = StubServer(("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_stub_server_responses(stub):
+    page = requests.get(f"{stub.base_url}/listado.mercadolibre.com.ar/iphone_Desde_51_NoIndex_True")
+    assert page.status_code == 200
+    assert page.content == stub.pages["mercadolibre.com.ar"]
+    assert requests.get(f"{stub.base_url}/blue").json() == {"venta": "1000.0 ARS"}
+    assert requests.get(f"{stub.base_url}/www.example.com/").status_code == 404
+
+    stub.error_rate = 1.0
+    assert requests.get(f"{stub.base_url}/blue").status_code == 503
+
+
+def test_searches_go_through_the_stub_server(stub):
+    search_url = f"{stub.base_url}/listado.mercadolibre.com.ar"
+    with patch.dict(app_module.COUNTRY_CONFIG['ar'], search_url=search_url):
+        prices, url, failed_pages, _ = app_module.get_prices("stub-server-item", 2)
+
+    assert url == f"{search_url}/stub-server-item_Desde_51_NoIndex_True"
+    assert failed_pages == 0
+    assert len(prices) >= 2 * RESULTS_PER_PAGE
+
+
+def test_marketplace_base_url_switch():
+    code = ("import app; print(app.mercadolibre_pages('iphone', 1, 'br', 'all')[0][0]); "
+            "print(app.amazon_pages('headphones', 1, 'us')[0][0]); print(app.API_URL)")
+    env = {**os.environ, "MARKETPLACE_BASE_URL": "http://127.0.0.1:8900/", "EXCHANGE_RATE_FILE": ""}
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True,
+                            env=env).stdout
+
+    assert output.splitlines() == [
+        "http://127.0.0.1:8900/listado.mercadolivre.com.br/iphone_Desde_1_NoIndex_True",
+        "http://127.0.0.1:8900/www.amazon.com/s?k=headphones",
+        "http://127.0.0.1:8900/blue",
+    ]
+
+
+def test_percentile():
+    latencies = [i / 100 for i in range(1, 101)]
+    assert percentile(latencies, 50) == 0.5
+    assert percentile(latencies, 99) == 0.99
+    assert percentile([0.2], 90) == 0.2
+    assert percentile([], 50) is None
@@ -0,0 +1,69 @@
+import os
+import sys
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from metrics import Registry
+
+
+def test_histogram_exposition():
+    registry = Registry(enabled=True)
+    latency = registry.histogram("fetch_seconds", "Fetch time.", ["host"], buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 5.0):
+        latency.observe(seconds, "example.com")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE mercadix_fetch_seconds histogram" in lines
+    assert 'mercadix_fetch_seconds_bucket{host="example.com",le="0.1"} 1' in lines
+    assert 'mercadix_fetch_seconds_bucket{host="example.com",le="1.0"} 2' in lines
+    assert 'mercadix_fetch_seconds_bucket{host="example.com",le="+Inf"} 3' in lines
+    assert 'mercadix_fetch_seconds_sum{host="example.com"} 5.55' in lines
+    assert 'mercadix_fetch_seconds_count{host="example.com"} 3' in lines
+
+
+def test_counters_and_collectors():
+    registry = Registry(enabled=True)
+    failures = registry.counter("failures_total", "Failures.", ["reason"])
+    failures.inc('said "no"')
+    failures.inc('said "no"', amount=2)
+    registry.collector("cache_hits_total", "counter", "Cache hits.", ["cache"], lambda: [(("prices",), 7)])
+
+    lines = registry.render().splitlines()
+    assert 'mercadix_failures_total{reason="said \\"no\\""} 3' in lines
+    assert "# TYPE mercadix_cache_hits_total counter" in lines
+    assert 'mercadix_cache_hits_total{cache="prices"} 7' in lines
+
+
+def test_server_timing_covers_the_stages_of_a_request():
+    registry = Registry(enabled=True)
+    with registry.stage("outside"):
+        pass  # Not part of any request: only the histogram sees it
+
+    token = registry.start_request()
+    with registry.stage("search"):
+        pass
+    with registry.stage("chart"):
+        pass
+    with registry.stage("chart"):
+        pass
+    header = registry.server_timing()
+    registry.end_request(token)
+
+    assert [entry.split(";")[0] for entry in header.split(", ")] == ["search", "chart"]
+    assert registry.server_timing() is None
+    assert 'mercadix_stage_seconds_count{stage="chart"} 2' in registry.render().splitlines()
+    assert 'mercadix_stage_seconds_count{stage="outside"} 1' in registry.render().splitlines()
+
+
+def test_disabled_registry_records_nothing():
+    registry = Registry(enabled=False)
+    counter = registry.counter("failures_total", "Failures.")
+    counter.inc()
+    token = registry.start_request()
+    with registry.stage("search"):
+        pass
+
+    assert token is None
+    assert registry.server_timing() is None
+    assert [line for line in registry.render().splitlines() if not line.startswith("#")] == []
@@ -0,0 +1,87 @@
+import os
+import sys
+
+import pytest
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import parsers
+from parsers import iter_amazon_products, iter_mercadolibre_products, parse_amazon_page, parse_mercadolibre_page
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+PAGES = [
+    ("mercadolibre_ar.html", parse_mercadolibre_page),
+    ("mercadolivre_br.html", parse_mercadolibre_page),
+    ("amazon_us.html", parse_amazon_page),
+]
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("parser", ["strainer", "lxml"])
+@pytest.mark.parametrize("fixture, parse_page", PAGES)
+def test_backends_match_full_parse(fixture, parse_page, parser):
+    """Every parser backend extracts exactly what a full html.parser parse does."""
+    if parser == "lxml":
+        pytest.importorskip("lxml")
+    content = read_fixture(fixture)
+    assert parse_page(content, parser) == parse_page(content, "html.parser")
+
+
+@pytest.mark.parametrize("parser", ["strainer", "lxml"])
+@pytest.mark.parametrize("fixture, iter_products", [
+    ("mercadolibre_ar.html", iter_mercadolibre_products),
+    ("amazon_us.html", iter_amazon_products),
+])
+@pytest.mark.parametrize("chunk_size", [7, 1024])
+def test_streamed_chunks_match_whole_page(fixture, iter_products, parser, chunk_size):
+    """Feeding the body in chunks, even splitting multi-byte characters, gives the same products."""
+    if parser == "lxml":
+        pytest.importorskip("lxml")
+    content = read_fixture(fixture)
+    chunks = (content[i:i + chunk_size] for i in range(0, len(content), chunk_size))
+    assert list(iter_products(chunks, parser)) == list(iter_products([content], "html.parser"))
+
+
+def test_mercadolibre_extraction():
+    """Titles, prices and URLs are extracted and products without a price are skipped."""
+    products = parse_mercadolibre_page(read_fixture("mercadolibre_ar.html"), "html.parser")
+
+    assert [p["price"] for p in products] == [1149999, 999999, 549000, 4599, 1899999]
+    assert products[0] == {
+        "title": "Apple iPhone 13 (128 GB) - Azul",
+        "price": 1149999,
+        "url": "https://articulo.mercadolibre.com.ar/MLA-1111111111-apple-iphone-13-128-gb-azul-_JM",
+    }
+    assert products[1]["title"] == "iPhone 12 64GB Negro & Funda"
+    assert products[2]["url"] is None
+    assert products[3]["title"] == "Unknown Product"
+
+
+def test_amazon_extraction():
+    """Ads are skipped, prices are in cents and relative URLs are made absolute."""
+    products = parse_amazon_page(read_fixture("amazon_us.html"), "html.parser")
+
+    assert [p["price"] for p in products] == [24800, 118950, 2999, 16995]
+    assert products[0]["url"].startswith("https://www.amazon.com/Sony-WH-1000XM4")
+    assert products[1]["url"] == "https://www.amazon.com/Apple-AirPods-Pro-2nd-Generation/dp/B0BDHWDR12"
+    assert all(p["title"] != "Sponsored speaker" for p in products)
+
+
+@pytest.mark.parametrize("parser", ["html.parser", "strainer", "lxml"])
+def test_empty_page(parser):
+    """A page without result containers yields no products."""
+    if parser == "lxml":
+        pytest.importorskip("lxml")
+    assert parse_mercadolibre_page(b"<html><body><p>Sin resultados</p></body></html>", parser) == []
+    assert parse_amazon_page(b"", parser) == []
+
+
+def test_unknown_parser():
+    with pytest.raises(ValueError):
+        parsers.get_backend("regex")
@@ -0,0 +1,135 @@
+import os
+import random
+import sys
+
+import numpy as np
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from products import ProductSampler, ProductTable, pick_products
+
+
+def _records(prices):
+    return [{'title': f'Product {i}', 'price': price, 'url': f'https://example.com/{i}'}
+            for i, price in enumerate(prices)]
+
+
+def _reference_picks(product_infos, median_price):
+    """The original loop over product dicts that pick_products replaces."""
+    products_near_median = []
+    cheapest_product = most_expensive_product = None
+    min_price_found, max_price_found = float('inf'), float('-inf')
+    for product in product_infos:
+        price = product['price']
+        if price < min_price_found:
+            min_price_found, cheapest_product = price, product
+        if price > max_price_found:
+            max_price_found, most_expensive_product = price, product
+        if median_price * 0.95 <= price <= median_price * 1.05:
+            product_copy = product.copy()
+            product_copy['percentage_diff'] = round(((price - median_price) / median_price) * 100, 2)
+            products_near_median.append(product_copy)
+    if len(products_near_median) > 10:
+        products_near_median.sort(key=lambda x: abs(x['percentage_diff']))
+        products_near_median = products_near_median[:10]
+    return products_near_median, cheapest_product, most_expensive_product
+
+
+def test_matches_reference_loop():
+    rng = random.Random(1)
+    for size in (1, 5, 40, 300):
+        # Few distinct prices so ties at the cut-off are exercised
+        prices = [rng.choice(range(9500, 10600, 50)) for _ in range(size)]
+        records = _records(prices)
+        median_price = float(np.median(prices))
+
+        assert pick_products(ProductTable.from_records(records), median_price) == \
+            _reference_picks(records, median_price)
+
+
+def test_few_candidates_keep_listing_order():
+    records = _records([104, 50, 100, 97, 300])
+    near, cheapest, most_expensive = pick_products(ProductTable.from_records(records), 100)
+
+    assert [p['price'] for p in near] == [104, 100, 97]
+    assert [p['percentage_diff'] for p in near] == [4.0, 0.0, -3.0]
+    assert cheapest == records[1]
+    assert most_expensive == records[4]
+    # Integer prices stay integers for JSON
+    assert isinstance(cheapest['price'], int)
+
+
+def test_nearest_and_percentile_queries():
+    table = ProductTable.from_records(_records([10, 20, 30, 40, 50, 60]))
+
+    assert table.nearest(33, 2).tolist() == [2, 3]
+    assert table.nearest(33, 3, max_relative_diff=0.1).tolist() == [2]
+    assert table.nearest_to_percentile(100, 1).tolist() == [5]
+
+
+def test_empty_table():
+    assert pick_products(ProductTable.from_records([]), 100) == ([], None, None)
+
+
+def test_table_round_trips_records():
+    records = [
+        {'title': 'Celular Motorola', 'price': 150000, 'url': 'https://example.com/a'},
+        {'title': 'Teléfono ñandú', 'price': 99000, 'url': None},
+        {'title': '', 'price': 120000, 'url': 'https://example.com/c'},
+    ]
+    table = ProductTable.from_records(records)
+
+    assert len(table) == 3
+    assert table.to_records() == records
+    assert table.to_columns() == {
+        'prices': [150000, 99000, 120000],
+        'titles': ['Celular Motorola', 'Teléfono ñandú', ''],
+        'urls': ['https://example.com/a', None, 'https://example.com/c'],
+    }
+
+
+def test_concat_joins_pages_in_order():
+    first = ProductTable.from_records(_records([1, 2]))
+    second = ProductTable.from_records([{'title': 'Único', 'price': 3, 'url': None}])
+    joined = ProductTable.concat([first, second])
+
+    assert joined.to_records() == first.to_records() + second.to_records()
+
+
+def test_table_is_smaller_than_dicts():
+    from cache import estimate_size
+
+    records = [{'title': f'Apple iPhone 13 (128 GB) - Azul medianoche {i}', 'price': 1500000 + i,
+                'url': f'https://articulo.mercadolibre.com.ar/MLA-{1000000 + i}-apple-iphone-13'}
+               for i in range(150)]
+
+    assert estimate_size(ProductTable.from_records(records)) * 3 < estimate_size(records)
+
+
+def test_sampler_keeps_a_bounded_sample_in_listing_order():
+    prices = random.Random(3).sample(range(1000, 100000), 2000)
+    sampler = ProductSampler(size=100, seed=1)
+    for i in range(0, len(prices), 50):
+        sampler.add(ProductTable.from_records(_records(prices[i:i + 50])[:50]))
+    sample = sampler.table()
+
+    # The sample, plus the cheapest and most expensive products when they were not drawn
+    assert 100 <= len(sample) <= 102
+    assert min(prices) in sample.prices.tolist() and max(prices) in sample.prices.tolist()
+    positions = [prices.index(price) for price in sample.prices.tolist()]
+    assert positions == sorted(positions)
+    # Drawn from the whole listing, not just its first pages
+    assert max(positions) > 1500
+    _, cheapest, most_expensive = pick_products(sample, float(np.median(sample.prices)))
+    assert (cheapest['price'], most_expensive['price']) == (min(prices), max(prices))
+
+
+def test_sampler_with_fewer_products_than_its_size():
+    sampler = ProductSampler(size=10)
+    sampler.add(ProductTable.from_records(_records([300, 100])))
+    sampler.add(ProductTable.from_records(_records([200])))
+
+    assert sampler.table().prices.tolist() == [300, 100, 200]
+    assert sampler.table(divisor=100).prices.tolist() == [3.0, 1.0, 2.0]
+    assert len(ProductSampler().table()) == 0
@@ -0,0 +1,193 @@
+import os
+import sys
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from conftest import FakeClock
+from rates import ExchangeRates, FixedRateProvider, JSONRateProvider, parse_rate
+
+
+def test_parse_rate():
+    assert parse_rate(1234.5) == 1234.5
+    assert parse_rate("1234.5 ARS") == 1234.5
+    assert parse_rate("5,12") == 5.12
+    for value in ("ARS", "", 0, -1):
+        with pytest.raises(ValueError):
+            parse_rate(value)
+
+
+def test_providers():
+    response = MagicMock()
+    response.json.return_value = {"USDBRL": {"bid": "5.1"}}
+    http_get = MagicMock(return_value=response)
+
+    assert JSONRateProvider("https://rates.example/usd-brl", field="USDBRL.bid").fetch(http_get) == 5.1
+    http_get.assert_called_once_with("https://rates.example/usd-brl")
+    assert FixedRateProvider(1.0).fetch(http_get) == 1.0
+
+
+def test_stale_rates_are_refreshed_in_the_background():
+    """Once a rate is known, lookups return it at once, even while its refresh waits on the API."""
+    clock = FakeClock(1000.0)
+    values = iter([1000.0, 1100.0])
+    release = threading.Event()
+    refreshed = threading.Event()
+
+    def fetch(country_code):
+        value = next(values)
+        if value == 1100.0:
+            release.wait(5)
+            refreshed.set()
+        return value
+
+    rates = ExchangeRates(fetch, ["ar"], ttl=60, clock=clock)
+    first = rates.refresh("ar")
+    assert (first.value, first.fetched_at) == (1000.0, 1000.0)
+
+    clock.now = 1061.0
+    assert rates.get("ar") is first  # Stale, so its refresh starts but the old rate is served
+    assert rates.get("ar") is first
+    release.set()
+    assert refreshed.wait(5)
+    for _ in range(500):
+        if rates.get("ar").value == 1100.0:
+            break
+        threading.Event().wait(0.01)
+    assert rates.get("ar").fetched_at == 1061.0
+
+
+def test_failed_refresh_keeps_the_last_known_rate():
+    calls = []
+
+    def fetch(country_code):
+        calls.append(country_code)
+        if len(calls) > 1:
+            raise RuntimeError("exchange rate API down")
+        return 1000.0
+
+    rates = ExchangeRates(fetch, ["ar"])
+    known = rates.refresh("ar")
+    assert rates.refresh("ar") is known
+    assert rates.get("ar") is known
+    assert rates.stats() == {"hits": 1, "misses": 0, "refreshes": 1, "failures": 1}
+
+    # With no rate ever fetched there is nothing to fall back on
+    assert ExchangeRates(fetch, ["ar"]).get("ar") is None
+
+
+def test_rates_are_remembered_across_restarts(tmp_path):
+    path = str(tmp_path / "rates.json")
+    clock = FakeClock(1000.0)
+    ExchangeRates(lambda country_code: 1000.0, ["ar", "us"], path=path, clock=clock).refresh_all()
+
+    def unavailable(country_code):
+        raise RuntimeError("exchange rate API down")
+
+    restarted = ExchangeRates(unavailable, ["ar"], path=path, clock=clock)
+    assert restarted.get("ar").value == 1000.0
+    assert restarted.get("ar").fetched_at == 1000.0
+
+
+def test_unreadable_saved_rates_are_ignored(tmp_path):
+    path = tmp_path / "rates.json"
+    path.write_text("{not json")
+    rates = ExchangeRates(lambda country_code: 1000.0, ["ar"], path=str(path))
+    assert rates.refresh("ar").value == 1000.0
+
+
+def test_lookups_never_wait_on_the_api():
+    """With no rate known, lookups get None at once while the rate is fetched in the background."""
+    release = threading.Event()
+
+    def fetch(country_code):
+        release.wait(5)
+        return 1000.0
+
+    rates = ExchangeRates(fetch, ["ar", "br"])
+    rates.start()
+    assert rates.get("ar") is None
+    assert rates.get("br") is None
+    release.set()
+    for _ in range(500):
+        if rates.get("ar") is not None and rates.get("br") is not None:
+            break
+        threading.Event().wait(0.01)
+    assert rates.get("ar").value == 1000.0
+    assert rates.stats()["refreshes"] == 2
+
+
+def test_rates_are_fetched_from_the_first_lookup():
+    """Nothing is fetched until a rate is looked up; the first lookup fetches every country's."""
+    fetched = []
+    done = threading.Event()
+
+    def fetch(country_code):
+        fetched.append(country_code)
+        if len(fetched) == 2:
+            done.set()
+        return 1000.0
+
+    rates = ExchangeRates(fetch, ["ar", "br"])
+    assert fetched == []
+    assert rates.get("br") is None
+    assert done.wait(5)
+    assert sorted(fetched) == ["ar", "br"]
+
+
+def test_failed_fetches_are_retried_after_an_interval():
+    clock = FakeClock(1000.0)
+    calls = []
+
+    def fetch(country_code):
+        calls.append(clock.now)
+        raise RuntimeError("exchange rate API down")
+
+    rates = ExchangeRates(fetch, ["ar"], clock=clock, retry_interval=60)
+    rates.refresh("ar")
+    for _ in range(3):
+        assert rates.get("ar") is None
+    assert calls == [1000.0]
+
+    clock.now = 1060.0
+    rates.get("ar")
+    for _ in range(500):
+        if len(calls) == 2:
+            break
+        threading.Event().wait(0.01)
+    assert calls == [1000.0, 1060.0]
+
+
+def test_lookups_do_not_wait_for_the_rates_file(tmp_path):
+    """Saving the rates to disk happens outside the lock that lookups take."""
+    writing = threading.Event()
+    release = threading.Event()
+    rates = ExchangeRates(lambda country_code: 1000.0, ["ar"], path=str(tmp_path / "rates.json"))
+    write = rates._write
+
+    def slow_write(saved):
+        writing.set()
+        release.wait(5)
+        write(saved)
+
+    rates._write = slow_write
+    thread = threading.Thread(target=rates.refresh, args=("ar",))
+    thread.start()
+    assert writing.wait(5)
+    assert rates.get("ar").value == 1000.0  # Answered while the file is still being written
+    release.set()
+    thread.join()
+    assert ExchangeRates(None, ["ar"], path=str(tmp_path / "rates.json")).get("ar").value == 1000.0
+
+
+def test_failed_save_leaves_no_temporary_file(tmp_path):
+    rates = ExchangeRates(lambda country_code: 1000.0, ["ar"], path=str(tmp_path / "missing" / "rates.json"))
+    (tmp_path / "missing").mkdir()
+    (tmp_path / "missing" / "rates.json").mkdir()  # os.replace cannot overwrite a directory
+
+    assert rates.refresh("ar").value == 1000.0
+    assert os.listdir(tmp_path / "missing") == ["rates.json"]
@@ -0,0 +1,55 @@
+import gzip
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+from werkzeug.datastructures import MIMEAccept
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import serialization
+from serialization import JSON_MIMETYPE, MSGPACK_MIMETYPE, compress, dumps_json, negotiate_mimetype
+
+
+def test_dumps_json_handles_numpy_values():
+    value = {"prices": np.array([1, 2, 3]), "median": np.float64(2.5), "title": "Teléfono"}
+    assert json.loads(dumps_json(value)) == {"prices": [1, 2, 3], "median": 2.5, "title": "Teléfono"}
+
+
+def test_dumps_json_without_orjson(monkeypatch):
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert json.loads(dumps_json({"count": np.int64(3)})) == {"count": 3}
+
+
+def test_negotiate_mimetype():
+    assert negotiate_mimetype(MIMEAccept()) == JSON_MIMETYPE
+    assert negotiate_mimetype(MIMEAccept([("*/*", 1)])) == JSON_MIMETYPE
+    assert negotiate_mimetype(MIMEAccept([("text/html", 1)])) is None
+    assert negotiate_mimetype(MIMEAccept(), "json") == JSON_MIMETYPE
+    assert negotiate_mimetype(MIMEAccept(), "xml") is None
+
+
+@pytest.mark.skipif(serialization.msgpack is None, reason="msgpack is not installed")
+def test_msgpack_round_trip():
+    assert negotiate_mimetype(MIMEAccept(), "msgpack") == MSGPACK_MIMETYPE
+    data = serialization.dumps_msgpack({"prices": np.array([1.5, 2.5])})
+    assert serialization.msgpack.unpackb(data) == {"prices": [1.5, 2.5]}
+
+
+def test_compress_prefers_accepted_encoding(monkeypatch):
+    from werkzeug.datastructures import Accept
+
+    monkeypatch.setattr(serialization, "brotli", None)
+    body = b'{"prices":[' + b",".join(b"100000" for _ in range(500)) + b"]}"
+
+    compressed, encoding = compress(body, Accept([("gzip", 1)]))
+    assert encoding == "gzip"
+    assert gzip.decompress(compressed) == body
+    # Identical bodies compress identically, so ETags stay stable
+    assert compress(body, Accept([("gzip", 1)]))[0] == compressed
+
+    assert compress(body, Accept()) == (body, None)
+    assert compress(b"{}", Accept([("gzip", 1)])) == (b"{}", None)
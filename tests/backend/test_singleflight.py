@@ -0,0 +1,95 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from singleflight import SingleFlight
+
+
+def _run_concurrently(group, fn, callers=5):
+    """Start `callers` calls for the same key while the first one is still running."""
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        leader = executor.submit(group.do, "key", slow)
+        started.wait(5)
+        followers = [executor.submit(group.do, "key", slow) for _ in range(callers - 1)]
+        while group.shared < callers - 1:
+            time.sleep(0.001)
+        release.set()
+        return [leader] + followers
+
+
+def test_concurrent_callers_share_one_call():
+    """Only one call runs and every caller receives its result."""
+    group = SingleFlight()
+    calls = []
+
+    futures = _run_concurrently(group, lambda: calls.append(1) or "result")
+
+    assert [f.result() for f in futures] == ["result"] * 5
+    assert len(calls) == 1
+    assert group.in_flight() == 0
+
+
+def test_concurrent_callers_share_the_failure():
+    """An exception from the in-flight call is raised to every waiting caller."""
+    group = SingleFlight()
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    futures = _run_concurrently(group, fail)
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="upstream down"):
+            future.result()
+
+
+def test_sequential_calls_are_not_coalesced():
+    """Once a call finishes, the next caller runs a fresh one."""
+    group = SingleFlight()
+    calls = []
+    group.do("key", calls.append, 1)
+    group.do("key", calls.append, 2)
+    assert calls == [1, 2]
+
+
+def test_async_calls_share_with_threads():
+    """A coroutine call in flight is shared with do() callers in other threads and do_async() in other loops."""
+    group = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        started.set()
+        await asyncio.to_thread(release.wait, 5)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        leader = executor.submit(asyncio.run, group.do_async("key", slow))
+        started.wait(5)
+        followers = [executor.submit(group.do, "key", lambda: "other"),
+                     executor.submit(asyncio.run, group.do_async("key", slow))]
+        while group.shared < 2:
+            time.sleep(0.001)
+        release.set()
+
+        assert [f.result() for f in [leader] + followers] == ["result"] * 3
+    assert len(calls) == 1
+    assert group.in_flight() == 0
@@ -0,0 +1,72 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from sketches import Extremes, Moments, QuantileSketch
+
+rng = np.random.default_rng(7)
+PRICES = np.round(rng.lognormal(12, 0.5, 5000)).astype(int)
+
+
+def _pages(values, size=50):
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+def test_moments_match_numpy():
+    moments = Moments()
+    for page in _pages(PRICES):
+        moments.update(page)
+
+    assert moments.count == PRICES.size
+    assert moments.mean == pytest.approx(PRICES.mean())
+    assert moments.std == pytest.approx(PRICES.std())
+    assert (moments.min, moments.max) == (PRICES.min(), PRICES.max())
+
+
+def test_quantiles_within_relative_accuracy():
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for page in _pages(PRICES):
+        sketch.update(page)
+
+    ranked = np.sort(PRICES)
+    for q in (0, 0.1, 0.25, 0.5, 0.75, 0.99, 1):
+        exact = ranked[int(q * (PRICES.size - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.01)
+    # Buckets depend on the spread of the prices, not on how many there are
+    assert len(sketch.buckets) < 500
+
+
+def test_bucket_count_is_capped():
+    sketch = QuantileSketch(relative_accuracy=0.01, max_buckets=50)
+    sketch.update(np.geomspace(1, 1e9, 10000))
+
+    assert len(sketch.buckets) == 50
+    assert sketch.count == 10000
+    assert sketch.quantile(1) == pytest.approx(1e9, rel=0.01)
+
+
+def test_histogram_matches_numpy():
+    sketch = QuantileSketch()
+    sketch.update(PRICES)
+    low, high = np.percentile(PRICES, [5, 95])
+    counts, edges = sketch.histogram(low, high, 10)
+    expected, expected_edges = np.histogram(PRICES, bins=10, range=(low, high))
+
+    assert np.allclose(edges, expected_edges)
+    # Only prices near bin edges can land in a neighbouring bin
+    assert np.abs(counts - expected).max() <= 0.05 * expected.max()
+
+
+def test_extremes():
+    extremes = Extremes(k=3)
+    for page in _pages(PRICES, 7):
+        extremes.update(page)
+
+    ranked = np.sort(PRICES).tolist()
+    assert extremes.smallest() == ranked[:3]
+    assert extremes.largest() == ranked[-3:]
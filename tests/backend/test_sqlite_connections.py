@@ -0,0 +1,21 @@
+import os
+import sys
+import threading
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from sqlite_connections import ThreadLocalConnection
+
+
+def test_one_connection_per_thread(tmp_path):
+    """Each thread reuses its own connection, opened in WAL mode."""
+    connection = ThreadLocalConnection(str(tmp_path / "data.sqlite3"))
+    assert connection() is connection()
+    assert connection().execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not connection()
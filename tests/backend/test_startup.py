@@ -0,0 +1,89 @@
+import glob
+import json
+import os
+import subprocess
+import sys
+
+# Add the parent directory to the Python path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from import_time import eager_heavy_modules, import_once, parse_importtime
+
+
+def run_python(code, **env):
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True,
+                          env={**os.environ, **env}).stdout
+
+
+def test_heavy_modules_load_on_first_use():
+    """Importing the app, as every cold start does, leaves matplotlib, NumPy and BeautifulSoup unloaded."""
+    assert eager_heavy_modules(import_once("app")) == []
+
+
+def test_first_use_from_several_threads():
+    """Threads that race to use a lazily imported module all see it fully imported."""
+    output = run_python(
+        "import threading; from products import ProductTable\n"
+        "errors = []\n"
+        "def work():\n"
+        "    try:\n"
+        "        ProductTable([1, 2], ['a', 'b'], [None, None]).cheapest()\n"
+        "    except Exception as e:\n"
+        "        errors.append(repr(e))\n"
+        "threads = [threading.Thread(target=work) for _ in range(8)]\n"
+        "[thread.start() for thread in threads]\n"
+        "[thread.join() for thread in threads]\n"
+        "print(errors)"
+    )
+    assert output.strip() == "[]"
+
+
+def test_parse_importtime():
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   json.decoder\n"
+        "import time:       300 |        420 | json\n"
+    )
+    assert parse_importtime(output) == {"json.decoder": (120, 120), "json": (300, 420)}
+
+
+def test_prewarmed_font_cache_is_reused(tmp_path):
+    prewarmed, config_dir = tmp_path / "prewarmed", tmp_path / "config"
+    run_python(f"import charts; charts.prewarm_font_cache({str(prewarmed)!r})")
+    [font_cache] = glob.glob(str(prewarmed / "fontlist-*.json"))
+
+    # Tag the prewarmed cache so a rebuilt one can be told apart
+    with open(font_cache) as f:
+        fonts = json.load(f)
+    with open(font_cache, "w") as f:
+        json.dump({**fonts, "prewarmed": True}, f)
+
+    # A cold start copies the cache into its empty MPLCONFIGDIR before matplotlib loads, instead of rebuilding it
+    output = run_python(
+        "import charts; charts.render_histogram([1], [0, 1], 't', 'x', []); "
+        "from matplotlib import font_manager; print(getattr(font_manager.fontManager, 'prewarmed', False))",
+        CHART_FONT_CACHE=str(prewarmed), MPLCONFIGDIR=str(config_dir),
+    )
+    assert output.strip() == "True"
+
+
+def test_dotenv_settings_reach_every_module(tmp_path):
+    """Settings in .env apply to the modules that read them on import, not only to app itself."""
+    for path in glob.glob(os.path.join(ROOT, "*.py")):
+        with open(path, "rb") as src, open(tmp_path / os.path.basename(path), "wb") as dst:
+            dst.write(src.read())
+    font_cache = tmp_path / "fonts"
+    (tmp_path / ".env").write_text(
+        "HTTP_READ_TIMEOUT=7\nHTML_PARSER=lxml\nCHART_FORMAT=svg\nCHART_DPI=150\n"
+        f"CHART_FONT_CACHE={font_cache}\nEXCHANGE_RATE_FILE=\n"
+    )
+    env = {key: value for key, value in os.environ.items()
+           if key not in ("HTTP_READ_TIMEOUT", "HTML_PARSER", "CHART_FORMAT", "CHART_DPI", "CHART_FONT_CACHE")}
+    output = subprocess.run(
+        [sys.executable, "-c", "import app, charts, http_client, parsers; print(http_client.READ_TIMEOUT, "
+                               "parsers.HTML_PARSER, charts.CHART_FORMAT, charts.CHART_DPI, charts.CHART_FONT_CACHE)"],
+        cwd=tmp_path, capture_output=True, text=True, check=True, env=env,
+    ).stdout
+    assert output.split() == ["7.0", "lxml", "svg", "150", str(font_cache)]
@@ -0,0 +1,129 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from stats import SketchStats, StreamingStats, compute_stats
+
+PRICES = [100000, 150000, 200000, 120000, 130000, 125000, 140000, 110000, 135000, 145000,
+          128000, 132000, 138000, 142000, 118000, 5000000]
+
+
+def test_summary_matches_numpy():
+    stats = compute_stats(PRICES, percentiles=(25, 75))
+
+    assert stats.count == len(PRICES)
+    assert stats.median == pytest.approx(np.median(PRICES))
+    assert stats.mean == pytest.approx(np.mean(PRICES))
+    assert stats.std == pytest.approx(np.std(PRICES))
+    assert stats.min == min(PRICES)
+    assert stats.max == max(PRICES)
+    assert stats.percentile(25) == pytest.approx(np.percentile(PRICES, 25))
+    assert stats.percentile(75) == pytest.approx(np.percentile(PRICES, 75))
+
+
+def test_outlier_split():
+    """Prices beyond threshold standard deviations of the mean are outliers."""
+    stats = compute_stats(PRICES, threshold=3)
+    mean, std = np.mean(PRICES), np.std(PRICES)
+
+    assert stats.outliers.tolist() == [p for p in PRICES if abs(p - mean) > 3 * std] == [5000000]
+    assert stats.non_outliers.tolist() == [p for p in PRICES if p != 5000000]
+    # Integer prices stay integers for JSON
+    assert all(isinstance(p, int) for p in stats.non_outliers.tolist())
+
+
+def test_histogram_covers_non_outliers():
+    stats = compute_stats(PRICES, threshold=3, bins=20)
+    counts, edges = np.histogram(stats.non_outliers, bins=20)
+
+    assert stats.histogram_counts.tolist() == counts.tolist()
+    assert stats.histogram_edges.tolist() == edges.tolist()
+
+
+def test_without_threshold_nothing_is_an_outlier():
+    stats = compute_stats(PRICES, threshold=None)
+    assert stats.outliers.size == 0
+    assert stats.histogram_counts.sum() == len(PRICES)
+
+
+def test_result_is_immutable():
+    stats = compute_stats(PRICES)
+    with pytest.raises(AttributeError):
+        stats.median = 0
+    with pytest.raises(ValueError):
+        stats.prices[0] = 0
+    with pytest.raises(TypeError):
+        stats.percentiles[50] = 0
+
+
+def test_to_dict_is_json_serializable():
+    data = json.loads(json.dumps(compute_stats(PRICES).to_dict()))
+    assert data["percentiles"]["25"] == pytest.approx(np.percentile(PRICES, 25))
+    assert data["outliers"] == 1
+    assert sum(data["histogram"]["counts"]) == len(PRICES) - 1
+
+
+def test_empty_prices():
+    with pytest.raises(ValueError):
+        compute_stats([])
+
+
+def _streamed(prices, page_size=4, **kwargs):
+    streaming = StreamingStats(**kwargs)
+    for i in range(0, len(prices), page_size):
+        streaming.add(prices[i:i + page_size])
+    return streaming
+
+
+def test_streaming_stats_match_compute_stats():
+    exact = compute_stats(PRICES, threshold=3)
+    sketched = _streamed(PRICES).finish(threshold=3, sample=PRICES[:8])
+
+    for name in ("count", "mean", "std", "min", "max", "lower_bound", "upper_bound"):
+        assert getattr(sketched, name) == pytest.approx(getattr(exact, name))
+    assert sketched.median == pytest.approx(exact.median, rel=0.01)
+    assert sketched.percentile(25) == pytest.approx(exact.percentile(25), rel=0.01)
+    assert sketched.outliers.tolist() == [5000000]
+    assert sketched.outlier_count == 1
+    assert sketched.histogram_counts.sum() == len(PRICES) - 1
+    assert sketched.histogram_edges[[0, -1]].tolist() == exact.histogram_edges[[0, -1]].tolist()
+    assert sketched.non_outliers.tolist() == PRICES[:8]
+
+
+def test_streaming_stats_beyond_the_kept_extremes():
+    """With more outliers on a side than are kept, the sketch counts the rest."""
+    prices = [100] * 2000 + [100000] * 5
+    stats = _streamed(prices, page_size=50, extremes=3).finish(threshold=3)
+
+    assert stats.outliers.tolist() == [100000] * 3
+    assert stats.outlier_count == 5
+
+
+def test_streaming_stats_in_cents():
+    stats = _streamed([1999, 2999, 4999]).finish(divisor=100, sample=[19.99])
+
+    assert (stats.min, stats.max) == (19.99, 49.99)
+    assert stats.mean == pytest.approx(33.323333)
+    assert stats.median == pytest.approx(29.99, rel=0.01)
+
+
+def test_sketch_stats_round_trip_json():
+    stats = _streamed(PRICES).finish(threshold=3, sample=PRICES[:8])
+    data = json.loads(json.dumps(stats.to_dict()))
+    restored = SketchStats.from_state(json.loads(json.dumps(stats.to_state())))
+
+    assert data["approximate"] is True
+    assert data["outliers"] == 1
+    assert restored.to_state() == stats.to_state()
+    assert restored.percentile(25) == stats.percentile(25)
+
+
+def test_empty_streaming_stats():
+    with pytest.raises(ValueError):
+        StreamingStats().finish()
@@ -0,0 +1,89 @@
+import os
+import sys
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from warming import CacheWarmer, QueryStats
+
+
+def test_top_searches_follow_recent_traffic():
+    stats = QueryStats()
+    for _ in range(5):
+        stats.record("iphone")
+    for _ in range(3):
+        stats.record("notebook")
+    stats.record("mate")
+
+    assert stats.top(2) == ["iphone", "notebook"]
+
+    # Old popularity fades: after decaying, newer searches can overtake it
+    stats.decay()
+    for _ in range(3):
+        stats.record("mate")
+    assert stats.top(1) == ["mate"]
+    # Searches whose count fades below one half are dropped
+    stats.decay()
+    stats.decay()
+    assert "notebook" not in stats.top(10)
+
+
+def test_query_stats_are_bounded():
+    stats = QueryStats(max_keys=10)
+    for i in range(25):
+        stats.record(i)
+    assert len(stats) <= 10
+
+
+def test_warming_stops_at_the_request_budget():
+    """Warming never pushes the requests of the last minute, live traffic included, past the budget."""
+    stats = QueryStats()
+    for key, count in (("a", 3), ("b", 2), ("c", 1)):
+        for _ in range(count):
+            stats.record(key)
+    warmed = []
+    requests_made = [7]  # Live traffic in the last minute
+
+    def warm(key):
+        warmed.append(key)
+        requests_made[0] += 2
+
+    warmer = CacheWarmer(stats, warm, cost=lambda key: 2, recent_requests=lambda: requests_made[0], request_budget=12)
+
+    assert warmer.run_once() == 2
+    assert warmed == ["a", "b"]
+
+
+def test_warming_survives_failures():
+    stats = QueryStats()
+    stats.record("a")
+    stats.record("b")
+    cycles = []
+
+    def warm(key):
+        if key == "a":
+            raise RuntimeError("upstream down")
+
+    def before_cycle():
+        cycles.append(1)
+        raise RuntimeError("exchange rate API down")
+
+    warmer = CacheWarmer(stats, warm, cost=lambda key: 1, recent_requests=lambda: 0, before_cycle=before_cycle)
+
+    assert warmer.run_once() == 1
+    assert cycles == [1]
+
+
+def test_only_one_process_warms(tmp_path):
+    """Warmers sharing a lock file leave the cycles to the first one that takes it."""
+    lock_path = str(tmp_path / "warm.lock")
+    first = CacheWarmer(QueryStats(), warm=None, cost=None, recent_requests=None, lock_path=lock_path)
+    second = CacheWarmer(QueryStats(), warm=None, cost=None, recent_requests=None, lock_path=lock_path)
+
+    assert first.holds_lock()
+    assert not second.holds_lock()
+    assert first.holds_lock()
+
+    # The holder exiting releases the lock
+    first._lock_file.close()
+    assert second.holds_lock()
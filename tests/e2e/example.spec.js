@@ -112,7 +112,7 @@ test.describe('Mercadix Application End-to-End Tests', () => {
     // Click would trigger download in a real browser, we just verify the button has an href attribute
     const hrefValue = await downloadButton.getAttribute('href');
     expect(hrefValue).toBeTruthy();
-    expect(hrefValue).toContain('data:image/png;base64');
+    expect(hrefValue).toContain('/plot/');
   });
 
   // Test responsive design
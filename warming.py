@@ -0,0 +1,143 @@
+"""Keep the most popular searches cached before anyone asks for them.
+
+QueryStats counts how often each search is made; CacheWarmer periodically
+re-runs the most popular ones so their prices (and charts) are already cached
+when the next user searches. Warming only spends what is left of a per-minute
+budget of upstream requests after live traffic, so it never competes with it.
+
+Every worker process counts its own searches and starts a warmer, but only
+the one holding the warming lock file runs the cycles, so the budget is
+spent once per host rather than once per worker.
+"""
+import logging
+import threading
+from collections import Counter
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock, every process warms
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Thread-safe, decaying popularity counts of searches."""
+
+    def __init__(self, max_keys=1000):
+        self.max_keys = max_keys
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, key):
+        with self._lock:
+            self._counts[key] += 1
+            if len(self._counts) > self.max_keys:
+                # Forget the least popular searches rather than growing without bound
+                for unpopular, _ in self._counts.most_common()[self.max_keys // 2:]:
+                    del self._counts[unpopular]
+
+    def top(self, n):
+        """The `n` most popular searches, most popular first."""
+        with self._lock:
+            return [key for key, _ in self._counts.most_common(n)]
+
+    def decay(self, factor=0.5):
+        """Scale every count down so popularity follows recent traffic; drops searches that fade out."""
+        with self._lock:
+            for key in list(self._counts):
+                count = self._counts[key] * factor
+                if count < 0.5:
+                    del self._counts[key]
+                else:
+                    self._counts[key] = count
+
+    def __len__(self):
+        with self._lock:
+            return len(self._counts)
+
+
+class CacheWarmer:
+    """Re-run the `top_n` most popular searches every cycle within an upstream request budget.
+
+    `warm(key)` refreshes one search; `cost(key)` estimates beforehand the
+    number of upstream requests that may take. A cycle stops as soon as the
+    next search could push the requests made in the last minute
+    (`recent_requests()`, live traffic included) past `request_budget`.
+    `before_cycle`, if given, runs first in every cycle.
+
+    With a `lock_path`, the cycles started by start() only run in the
+    process holding an exclusive lock on that file; the others take over
+    once it exits.
+    """
+
+    def __init__(self, query_stats, warm, cost, recent_requests, top_n=10, request_budget=60, before_cycle=None,
+                 lock_path=None):
+        self.query_stats = query_stats
+        self.warm = warm
+        self.cost = cost
+        self.recent_requests = recent_requests
+        self.top_n = top_n
+        self.request_budget = request_budget
+        self.before_cycle = before_cycle
+        self.lock_path = lock_path
+        self._lock_file = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def run_once(self):
+        """Run one warming cycle and return the number of searches warmed."""
+        if self.before_cycle is not None:
+            try:
+                self.before_cycle()
+            except Exception as e:
+                logger.error(f"Cache warming setup failed: {e}")
+
+        warmed = 0
+        for key in self.query_stats.top(self.top_n):
+            if self.recent_requests() + self.cost(key) > self.request_budget:
+                logger.info(f"Upstream request budget reached; warmed {warmed} searches.")
+                break
+            try:
+                self.warm(key)
+                warmed += 1
+            except Exception as e:
+                logger.error(f"Failed to warm {key!r}: {e}")
+        self.query_stats.decay()
+        return warmed
+
+    def holds_lock(self):
+        """Whether this process is the one warming, taking the lock over if its last holder has exited."""
+        if self.lock_path is None or fcntl is None or self._lock_file is not None:
+            return True
+        try:
+            lock_file = open(self.lock_path, "a")
+        except OSError as e:
+            logger.error(f"Cannot open the cache warming lock {self.lock_path}: {e}")
+            return True
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file  # Kept open, and locked, until the process exits
+        return True
+
+    def start(self, interval):
+        """Run a cycle every `interval` seconds in a daemon thread."""
+        if self._thread is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                if self.holds_lock():
+                    self.run_once()
+                else:
+                    # Another process warms; keep this one's counts following recent traffic in case it takes over
+                    self.query_stats.decay()
+
+        self._thread = threading.Thread(target=loop, name="cache-warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()